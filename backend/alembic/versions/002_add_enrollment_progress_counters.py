@@ -0,0 +1,51 @@
+"""add progress counters to enrollments
+
+Revision ID: 002_enrollment_progress
+Revises: 001_add_enrollment_code
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+
+revision = '002_enrollment_progress'
+down_revision = '001_add_enrollment_code'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if 'enrollments' not in inspector.get_table_names():
+        return
+
+    columns = [col['name'] for col in inspector.get_columns('enrollments')]
+
+    if 'completed_chapters' not in columns:
+        op.add_column('enrollments', sa.Column('completed_chapters', sa.Integer(), nullable=False, server_default='0'))
+    if 'total_chapters' not in columns:
+        op.add_column('enrollments', sa.Column('total_chapters', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from the existing chapters and progress rows
+    connection.execute(text("""
+        UPDATE enrollments SET
+            total_chapters = (
+                SELECT COUNT(*) FROM chapters
+                WHERE chapters.course_id = enrollments.course_id
+            ),
+            completed_chapters = (
+                SELECT COUNT(DISTINCT user_progress.chapter_id) FROM user_progress
+                WHERE user_progress.user_id = enrollments.user_id
+                  AND user_progress.course_id = enrollments.course_id
+                  AND user_progress.completed = true
+            )
+    """))
+
+
+def downgrade() -> None:
+    op.drop_column('enrollments', 'total_chapters')
+    op.drop_column('enrollments', 'completed_chapters')
@@ -0,0 +1,32 @@
+"""add version to courses
+
+Revision ID: 003_course_version
+Revises: 002_enrollment_progress
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '003_course_version'
+down_revision = '002_enrollment_progress'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if 'courses' not in inspector.get_table_names():
+        return
+
+    columns = [col['name'] for col in inspector.get_columns('courses')]
+
+    if 'version' not in columns:
+        op.add_column('courses', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    op.drop_column('courses', 'version')
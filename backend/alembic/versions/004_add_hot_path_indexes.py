@@ -0,0 +1,114 @@
+"""add hot path indexes and uniqueness for enrollments and progress
+
+Revision ID: 004_hot_path_indexes
+Revises: 003_course_version
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+
+revision = '004_hot_path_indexes'
+down_revision = '003_course_version'
+branch_labels = None
+depends_on = None
+
+
+# (table, index name, columns, unique)
+INDEXES = [
+    ('chapters', 'ix_chapters_course_id_order', ['course_id', 'order'], False),
+    ('quizzes', 'ix_quizzes_chapter_id', ['chapter_id'], False),
+    ('enrollments', 'uq_enrollments_user_id_course_id', ['user_id', 'course_id'], True),
+    ('enrollments', 'ix_enrollments_course_id', ['course_id'], False),
+    ('user_progress', 'uq_user_progress_user_id_chapter_id', ['user_id', 'chapter_id'], True),
+    ('user_progress', 'ix_user_progress_user_id_course_id_completed', ['user_id', 'course_id', 'completed'], False),
+    ('user_progress', 'ix_user_progress_chapter_id', ['chapter_id'], False),
+    ('user_progress', 'ix_user_progress_course_id', ['course_id'], False),
+]
+
+
+def deduplicate_progress(connection) -> None:
+    """Fold duplicate (user_id, chapter_id) rows into the one with the smallest id"""
+    connection.execute(text("""
+        UPDATE user_progress SET
+            completed = CASE WHEN EXISTS (
+                SELECT 1 FROM user_progress p
+                WHERE p.user_id = user_progress.user_id
+                  AND p.chapter_id = user_progress.chapter_id
+                  AND p.completed = true
+            ) THEN true ELSE false END,
+            quiz_score = (
+                SELECT MAX(p.quiz_score) FROM user_progress p
+                WHERE p.user_id = user_progress.user_id
+                  AND p.chapter_id = user_progress.chapter_id
+            ),
+            completed_at = (
+                SELECT MIN(p.completed_at) FROM user_progress p
+                WHERE p.user_id = user_progress.user_id
+                  AND p.chapter_id = user_progress.chapter_id
+                  AND p.completed = true
+            )
+        WHERE id IN (
+            SELECT MIN(id) FROM user_progress
+            GROUP BY user_id, chapter_id
+            HAVING COUNT(*) > 1
+        )
+    """))
+    connection.execute(text("""
+        DELETE FROM user_progress
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM user_progress
+            GROUP BY user_id, chapter_id
+        )
+    """))
+
+
+def deduplicate_enrollments(connection) -> None:
+    """Keep one enrollment per (user_id, course_id) and recompute its counters"""
+    connection.execute(text("""
+        DELETE FROM enrollments
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM enrollments
+            GROUP BY user_id, course_id
+        )
+    """))
+    connection.execute(text("""
+        UPDATE enrollments SET
+            total_chapters = (
+                SELECT COUNT(*) FROM chapters
+                WHERE chapters.course_id = enrollments.course_id
+            ),
+            completed_chapters = (
+                SELECT COUNT(DISTINCT user_progress.chapter_id) FROM user_progress
+                WHERE user_progress.user_id = enrollments.user_id
+                  AND user_progress.course_id = enrollments.course_id
+                  AND user_progress.completed = true
+            )
+    """))
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    tables = inspector.get_table_names()
+
+    if 'user_progress' in tables:
+        deduplicate_progress(connection)
+    if 'enrollments' in tables:
+        deduplicate_enrollments(connection)
+
+    # Unique indexes rather than ALTER TABLE ... ADD CONSTRAINT so the same
+    # migration runs on SQLite; ON CONFLICT (user_id, chapter_id) can target them.
+    for table, name, columns, unique in INDEXES:
+        if table not in tables:
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table)}
+        if name not in existing:
+            op.create_index(name, table, columns, unique=unique)
+
+
+def downgrade() -> None:
+    for table, name, columns, unique in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
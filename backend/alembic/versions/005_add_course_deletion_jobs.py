@@ -0,0 +1,47 @@
+"""add soft delete to courses and course deletion jobs
+
+Revision ID: 005_course_deletion_jobs
+Revises: 004_hot_path_indexes
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '005_course_deletion_jobs'
+down_revision = '004_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    tables = inspector.get_table_names()
+
+    if 'courses' in tables:
+        columns = [col['name'] for col in inspector.get_columns('courses')]
+        if 'deleted_at' not in columns:
+            op.add_column('courses', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+
+    if 'course_deletion_jobs' not in tables:
+        op.create_table(
+            'course_deletion_jobs',
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('course_id', sa.String(), nullable=False),
+            sa.Column('course_title', sa.String(), nullable=True),
+            sa.Column('status', sa.String(), nullable=False, server_default='pending'),
+            sa.Column('deleted', sa.JSON(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index('ix_course_deletion_jobs_course_id', 'course_deletion_jobs', ['course_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_course_deletion_jobs_course_id', table_name='course_deletion_jobs')
+    op.drop_table('course_deletion_jobs')
+    op.drop_column('courses', 'deleted_at')
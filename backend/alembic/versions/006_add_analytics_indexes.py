@@ -0,0 +1,56 @@
+"""cover course analytics aggregates with progress and enrollment indexes
+
+Revision ID: 006_analytics_indexes
+Revises: 005_course_deletion_jobs
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '006_analytics_indexes'
+down_revision = '005_course_deletion_jobs'
+branch_labels = None
+depends_on = None
+
+
+# (table, new index, columns, index it replaces, its columns). The analytics
+# aggregates read only the new indexes' columns, so they are answered from the
+# index alone; course_id stays the leading column, which makes the plain
+# course_id indexes redundant.
+INDEXES = [
+    (
+        'user_progress', 'ix_user_progress_course_id_chapter_id_completed_quiz_score',
+        ['course_id', 'chapter_id', 'completed', 'quiz_score'],
+        'ix_user_progress_course_id', ['course_id']
+    ),
+    (
+        'enrollments', 'ix_enrollments_course_id_counters',
+        ['course_id', 'completed_chapters', 'total_chapters'],
+        'ix_enrollments_course_id', ['course_id']
+    ),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+    for table, name, columns, replaced, _ in INDEXES:
+        if table not in tables:
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table)}
+        if name not in existing:
+            op.create_index(name, table, columns)
+        if replaced in existing:
+            op.drop_index(replaced, table_name=table)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table, name, _, replaced, replaced_columns in reversed(INDEXES):
+        existing = {index['name'] for index in inspector.get_indexes(table)}
+        if replaced not in existing:
+            op.create_index(replaced, table, replaced_columns)
+        if name in existing:
+            op.drop_index(name, table_name=table)
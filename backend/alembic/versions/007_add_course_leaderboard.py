@@ -0,0 +1,50 @@
+"""add course leaderboard summary table
+
+Revision ID: 007_course_leaderboard
+Revises: 006_analytics_indexes
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '007_course_leaderboard'
+down_revision = '006_analytics_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if 'course_leaderboard' not in inspector.get_table_names():
+        op.create_table(
+            'course_leaderboard',
+            sa.Column('course_id', sa.String(), sa.ForeignKey('courses.id'), primary_key=True),
+            sa.Column('user_id', sa.String(), sa.ForeignKey('users.id'), primary_key=True),
+            sa.Column('total_score', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('quizzes', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index(
+            'ix_course_leaderboard_course_id_total_score_user_id_quizzes',
+            'course_leaderboard',
+            ['course_id', 'total_score', 'user_id', 'quizzes']
+        )
+        # Backfill the totals from the progress rows
+        op.execute(
+            """
+            INSERT INTO course_leaderboard (course_id, user_id, total_score, quizzes)
+            SELECT course_id, user_id, SUM(quiz_score), COUNT(quiz_score)
+            FROM user_progress
+            WHERE quiz_score IS NOT NULL
+            GROUP BY course_id, user_id
+            """
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_course_leaderboard_course_id_total_score_user_id_quizzes', table_name='course_leaderboard')
+    op.drop_table('course_leaderboard')
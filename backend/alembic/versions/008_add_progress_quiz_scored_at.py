@@ -0,0 +1,32 @@
+"""add quiz_scored_at to user progress
+
+Revision ID: 008_progress_quiz_scored_at
+Revises: 007_course_leaderboard
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '008_progress_quiz_scored_at'
+down_revision = '007_course_leaderboard'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if 'user_progress' not in inspector.get_table_names():
+        return
+
+    columns = [col['name'] for col in inspector.get_columns('user_progress')]
+
+    if 'quiz_scored_at' not in columns:
+        op.add_column('user_progress', sa.Column('quiz_scored_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('user_progress', 'quiz_scored_at')
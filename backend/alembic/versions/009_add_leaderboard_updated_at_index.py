@@ -0,0 +1,32 @@
+"""index course leaderboard rows by course and update time
+
+Revision ID: 009_leaderboard_updated_at
+Revises: 008_progress_quiz_scored_at
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '009_leaderboard_updated_at'
+down_revision = '008_progress_quiz_scored_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if 'course_leaderboard' not in inspector.get_table_names():
+        return
+    existing = {index['name'] for index in inspector.get_indexes('course_leaderboard')}
+    if 'ix_course_leaderboard_course_id_updated_at' not in existing:
+        op.create_index(
+            'ix_course_leaderboard_course_id_updated_at',
+            'course_leaderboard',
+            ['course_id', 'updated_at']
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_course_leaderboard_course_id_updated_at', table_name='course_leaderboard')
@@ -1,12 +1,26 @@
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app.db.database import get_db
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, status
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload, undefer
+from typing import List, Optional
+from app.db.database import async_engine, engine, get_async_db, get_db
+from app.db.pool import pool_status
 from app.db import models
 from app.schemas import course as course_schema
 from app.core.security import get_admin_user
+from app.core.password_pool import password_pool
+from app.core.principal_cache import principal_cache
+from app.services import catalog
+from app.services.analytics import course_analytics
+from app.services.answer_keys import answer_keys
+from app.services.course_cache import course_cache
+from app.services.course_deletion import course_deleter, serialize_job
+from app.services.course_import import DEFAULT_BATCH_SIZE, CourseImport, iter_lines
+from app.services.course_update import apply_course_update
+from app.services.leaderboard import leaderboards
+from app.services.progress_buffer import progress_buffer
 
 router = APIRouter()
 
@@ -46,25 +60,7 @@ def create_course(
     db.commit()
     db.refresh(db_course)
     
-    formatted_chapters = []
-    for chapter in db_course.chapters:
-        formatted_quizzes = [
-            {
-                "id": quiz.id,
-                "question": quiz.question,
-                "options": quiz.options,
-                "correctOption": quiz.correct_option
-            }
-            for quiz in chapter.quizzes
-        ]
-        
-        formatted_chapters.append({
-            "id": chapter.id,
-            "title": chapter.title,
-            "content": chapter.content,
-            "quiz": formatted_quizzes,
-            "completed": False
-        })
+    formatted_chapters = [catalog.serialize_chapter(chapter) for chapter in db_course.chapters]
     
     return {
         "id": db_course.id,
@@ -77,125 +73,106 @@ def create_course(
         "enrollmentCode": db_course.enrollment_code
     }
 
-@router.put("/courses/{course_id}", response_model=course_schema.CourseResponse)
+@router.post("/courses/import", response_model=course_schema.CourseImportReport)
+async def import_courses(
+    request: Request,
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=5000),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_admin_user)
+):
+    # NDJSON body, one CourseCreate per line, read and inserted batch by batch
+    course_import = CourseImport(batch_size)
+    async for line in iter_lines(request.stream()):
+        batch = course_import.feed(line)
+        if batch:
+            await db.run_sync(course_import.insert, batch)
+    await db.run_sync(course_import.insert, course_import.take())
+    
+    return course_import.report()
+
+@router.get("/courses/{course_id}", response_model=course_schema.CourseDetail)
+def get_course_detail(
+    course_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_admin_user)
+):
+    # The editor needs every chapter body, which the course tree leaves out
+    db_course = db.query(models.Course).filter(
+        models.Course.id == course_id,
+        models.Course.deleted_at.is_(None)
+    ).first()
+    if not db_course:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
+    
+    chapters = (
+        db.query(models.Chapter)
+        .options(undefer(models.Chapter.content), selectinload(models.Chapter.quizzes))
+        .filter(models.Chapter.course_id == course_id)
+        .order_by(models.Chapter.order)
+        .all()
+    )
+    
+    return {
+        "id": db_course.id,
+        "title": db_course.title,
+        "description": db_course.description,
+        "imageUrl": db_course.image_url,
+        "chapters": [catalog.serialize_chapter_detail(chapter) for chapter in chapters],
+        "progress": 0,
+        "enrolled": False,
+        "enrollmentCode": db_course.enrollment_code
+    }
+
+@router.put("/courses/{course_id}", response_model=course_schema.CourseUpdateResponse)
 def update_course(
     course_id: str,
     course_update: course_schema.CourseUpdate,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_admin_user)
 ):
-    db_course = db.query(models.Course).filter(models.Course.id == course_id).first()
+    db_course = db.query(models.Course).filter(
+        models.Course.id == course_id,
+        models.Course.deleted_at.is_(None)
+    ).first()
     if not db_course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Course not found"
         )
 
-    db_course.title = course_update.title
-    db_course.description = course_update.description
-    db_course.image_url = course_update.imageUrl
-
-    existing_chapters = {str(ch.id): ch for ch in db_course.chapters}
-
-    updated_chapter_ids = []
-
-    for i, chapter_data in enumerate(course_update.chapters):
-        chapter_id = getattr(chapter_data, "id", None)
-
-        if chapter_id and chapter_id in existing_chapters:
-            db_chapter = existing_chapters[chapter_id]
-            db_chapter.title = chapter_data.title
-            db_chapter.content = chapter_data.content
-            db_chapter.order = i
-
-            existing_quizzes = {str(q.id): q for q in db_chapter.quizzes}
-            updated_quiz_ids = []
-
-            for quiz_data in chapter_data.quiz:
-                quiz_id = getattr(quiz_data, "id", None)
-
-                if quiz_id and quiz_id in existing_quizzes:
-                    db_quiz = existing_quizzes[quiz_id]
-                    db_quiz.question = quiz_data.question
-                    db_quiz.options = quiz_data.options
-                    db_quiz.correct_option = quiz_data.correctOption
-                else:
-                    # New quiz
-                    db_quiz = models.Quiz(
-                        chapter_id=db_chapter.id,
-                        question=quiz_data.question,
-                        options=quiz_data.options,
-                        correct_option=quiz_data.correctOption
-                    )
-                    db.add(db_quiz)
-
-                if quiz_id:
-                    updated_quiz_ids.append(quiz_id)
-
-        else:
-            # New chapter
-            db_chapter = models.Chapter(
-                course_id=db_course.id,
-                title=chapter_data.title,
-                content=chapter_data.content,
-                order=i
-            )
-            db.add(db_chapter)
-            db.flush()
-
-            for quiz_data in chapter_data.quiz:
-                db_quiz = models.Quiz(
-                    chapter_id=db_chapter.id,
-                    question=quiz_data.question,
-                    options=quiz_data.options,
-                    correct_option=quiz_data.correctOption
-                )
-                db.add(db_quiz)
-
-        if chapter_id:
-            updated_chapter_ids.append(chapter_id)
-
-    for chapter_id, chapter in existing_chapters.items():
-        if chapter_id not in updated_chapter_ids:
-            db.query(models.UserProgress).filter(models.UserProgress.chapter_id == chapter.id).delete()
-            db.delete(chapter)
-
+    changes = apply_course_update(db, db_course, course_update)
     db.commit()
-    db.refresh(db_course)
+    if changes["changed"]:
+        course_cache.invalidate(course_id)
+        answer_keys.invalidate(course_id)
+        course_analytics.invalidate(course_id)
+        leaderboards.invalidate(course_id)
 
-    formatted_chapters = []
-    for chapter in db_course.chapters:
-        formatted_quizzes = [
-            {
-                "id": quiz.id,
-                "question": quiz.question,
-                "options": quiz.options,
-                "correctOption": quiz.correct_option
-            }
-            for quiz in chapter.quizzes
-        ]
-        formatted_chapters.append({
-            "id": chapter.id,
-            "title": chapter.title,
-            "content": chapter.content,
-            "quiz": formatted_quizzes,
-            "completed": False
-        })
+    structure = catalog.get_structures(db, [db_course])[course_id]
 
     return {
-        "id": db_course.id,
-        "title": db_course.title,
-        "description": db_course.description,
-        "imageUrl": db_course.image_url,
-        "chapters": formatted_chapters,
+        "id": structure["id"],
+        "title": structure["title"],
+        "description": structure["description"],
+        "imageUrl": structure["imageUrl"],
+        "chapters": structure["chapters"],
         "progress": 0,
         "enrolled": False,
-        "enrollmentCode": db_course.enrollment_code
+        "enrollmentCode": structure["enrollmentCode"],
+        "changes": changes
     }
 
-@router.delete("/courses/{course_id}")
+@router.delete(
+    "/courses/{course_id}",
+    response_model=course_schema.CourseDeletionJob,
+    status_code=status.HTTP_202_ACCEPTED
+)
 def delete_course(
     course_id: str,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_admin_user)
 ):
@@ -206,7 +183,107 @@ def delete_course(
             detail="Course not found"
         )
     
-    db.delete(db_course)
+    job = db.query(models.CourseDeletionJob).filter(
+        models.CourseDeletionJob.course_id == course_id
+    ).order_by(models.CourseDeletionJob.created_at.desc()).first()
+    
+    if db_course.deleted_at is not None and job is not None:
+        # Already being deleted: report the job, restarting it if it died
+        if course_deleter.needs_restart(job):
+            job.status = "pending"
+            db.commit()
+            background_tasks.add_task(course_deleter.run, job.id)
+        return serialize_job(job)
+    
+    # Hide the course right away, the rows go in the background
+    db_course.deleted_at = func.now()
+    job = models.CourseDeletionJob(course_id=course_id, course_title=db_course.title, deleted={})
+    db.add(job)
     db.commit()
+    db.refresh(job)
+    course_cache.invalidate(course_id)
+    answer_keys.invalidate(course_id)
+    course_analytics.invalidate(course_id)
+    leaderboards.invalidate(course_id)
+    background_tasks.add_task(course_deleter.run, job.id)
     
-    return {"message": "Course deleted successfully"}
+    return serialize_job(job)
+
+@router.get("/courses/{course_id}/analytics", response_model=course_schema.CourseAnalytics)
+def get_course_analytics(
+    course_id: str,
+    refresh: str = Query("auto", pattern="^(auto|incremental|full)$"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_admin_user)
+):
+    db_course = db.query(models.Course).filter(
+        models.Course.id == course_id,
+        models.Course.deleted_at.is_(None)
+    ).first()
+    if not db_course:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
+    
+    report, mode = course_analytics.get(db, db_course, refresh)
+    return {**report, "refresh": mode}
+
+@router.post("/leaderboards/rebuild", response_model=course_schema.LeaderboardRebuild)
+def rebuild_leaderboards(
+    course_id: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_admin_user)
+):
+    if course_id is not None and not db.query(models.Course.id).filter(models.Course.id == course_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
+    
+    return leaderboards.rebuild(db, course_id)
+
+@router.get("/courses/deletions/{job_id}", response_model=course_schema.CourseDeletionJob)
+def get_course_deletion_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_admin_user)
+):
+    job = db.query(models.CourseDeletionJob).filter(models.CourseDeletionJob.id == job_id).first()
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deletion job not found"
+        )
+    
+    return serialize_job(job)
+
+@router.get("/cache/stats")
+def get_cache_stats(current_user: models.User = Depends(get_admin_user)):
+    return {
+        "courseStructure": course_cache.stats(),
+        "answerKeys": answer_keys.stats(),
+        "leaderboards": leaderboards.stats(),
+        "principal": principal_cache.stats()
+    }
+
+
+@router.get("/db/pool")
+def get_pool_status(current_user: models.User = Depends(get_admin_user)):
+    return {
+        "sync": pool_status(engine.pool),
+        "async": pool_status(async_engine.sync_engine.pool)
+    }
+
+@router.get("/auth/hashing")
+def get_password_hashing_stats(current_user: models.User = Depends(get_admin_user)):
+    return password_pool.stats()
+
+@router.get("/progress/write-behind")
+def get_progress_write_behind_stats(current_user: models.User = Depends(get_admin_user)):
+    return progress_buffer.stats()
+
+@router.post("/progress/write-behind/flush")
+async def flush_progress_write_behind(current_user: models.User = Depends(get_admin_user)):
+    flushed = await progress_buffer.flush()
+    return {"flushed": flushed}
@@ -2,14 +2,15 @@ import logging
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.db import models
 from app.schemas import user as user_schema
 from app.core.security import (
-    get_password_hash, 
-    verify_password, 
+    get_password_hash_async,
+    verify_password_async,
     create_access_token, 
     ACCESS_TOKEN_EXPIRE_MINUTES,
     get_current_active_user
@@ -18,9 +19,9 @@ from app.core.security import (
 router = APIRouter()
 
 @router.post("/register", response_model=user_schema.Token)
-def register(user_data: user_schema.UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: user_schema.UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if user already exists
-    db_user = db.query(models.User).filter(models.User.email == user_data.email).first()
+    db_user = await db.scalar(select(models.User).where(models.User.email == user_data.email))
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -28,15 +29,15 @@ def register(user_data: user_schema.UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     db_user = models.User(
         email=user_data.email,
         name=user_data.name,
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -51,9 +52,9 @@ def register(user_data: user_schema.UserCreate, db: Session = Depends(get_db)):
     }
 
 @router.post("/login", response_model=user_schema.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(models.User).where(models.User.email == form_data.username))
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -72,5 +73,5 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     }
 
 @router.get("/me", response_model=user_schema.UserResponse)
-def get_current_user_info(current_user: models.User = Depends(get_current_active_user)):
+async def get_current_user_info(current_user: models.User = Depends(get_current_active_user)):
     return current_user
@@ -1,22 +1,53 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from app.db.database import get_db
+from typing import List, Optional
+from app.db.database import get_async_db
 from app.db import models
 from app.schemas import course as course_schema
 from app.core.security import get_current_active_user
-from sqlalchemy import func
+from app.core.responses import ResponseSerializer
+from app.core.etag import CACHE_CONTROL, etag_matches, not_modified, set_etag
+from app.services import catalog
+from app.services.chapter_body import chapter_body
+from app.services.answer_keys import answer_keys
+from app.services.leaderboard import leaderboards
+from app.services.progress import refresh_enrollment_counters, save_progress
+from app.services.progress_buffer import progress_buffer
 
 router = APIRouter()
 
+# Read routes return payloads built by the catalog service in their schema's
+# shape; these render them with orjson instead of validating them again.
+course_list_json = ResponseSerializer(List[course_schema.CourseResponse])
+course_page_json = ResponseSerializer(course_schema.CourseSummaryPage)
+course_json = ResponseSerializer(course_schema.CourseResponse)
+chapter_json = ResponseSerializer(course_schema.ChapterResponse)
+leaderboard_json = ResponseSerializer(course_schema.Leaderboard)
+
+# Routes are async and run their ORM code through AsyncSession.run_sync, so a
+# request waiting on the database holds a pool connection, not a worker thread.
+
 @router.post("/{course_id}/enroll", response_model=course_schema.EnrollmentResponse)
-def enroll_in_course(
+async def enroll_in_course(
     course_id: str,
     enrollment_request: course_schema.EnrollmentCodeRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    course = db.query(models.Course).filter(models.Course.id == course_id).first()
+    return await db.run_sync(_enroll_in_course, course_id, enrollment_request, current_user)
+
+def _enroll_in_course(
+    db: Session,
+    course_id: str,
+    enrollment_request: course_schema.EnrollmentCodeRequest,
+    current_user: models.User
+):
+    course = db.query(models.Course).filter(
+        models.Course.id == course_id,
+        models.Course.deleted_at.is_(None)
+    ).first()
     if not course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -45,6 +76,8 @@ def enroll_in_course(
         course_id=course.id
     )
     db.add(new_enrollment)
+    db.flush()
+    refresh_enrollment_counters(db, course.id, current_user.id)
     db.commit()
     
     return {
@@ -53,150 +86,127 @@ def enroll_in_course(
     }
 
 @router.get("/", response_model=List[course_schema.CourseResponse])
-def get_all_courses(
-    db: Session = Depends(get_db),
+async def get_all_courses(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    courses = db.query(models.Course).all()
-    
-    result = []
-    for course in courses:
-        enrollment = db.query(models.Enrollment).filter(
-            models.Enrollment.user_id == current_user.id,
-            models.Enrollment.course_id == course.id
-        ).first()
-        
-        progress = 0
-        if enrollment:
-            total_chapters = len(course.chapters)
-            if total_chapters > 0:
-                completed_chapters = db.query(models.UserProgress).filter(
-                    models.UserProgress.user_id == current_user.id,
-                    models.UserProgress.course_id == course.id,
-                    models.UserProgress.completed == True
-                ).count()
-                progress = int((completed_chapters / total_chapters) * 100)
-        
-        formatted_chapters = []
-        for chapter in course.chapters:
-            chapter_completed = db.query(models.UserProgress).filter(
-                models.UserProgress.user_id == current_user.id,
-                models.UserProgress.chapter_id == chapter.id,
-                models.UserProgress.completed == True
-            ).first() is not None
-            
-            formatted_quizzes = [
-                {
-                    "id": quiz.id,
-                    "question": quiz.question,
-                    "options": quiz.options,
-                    "correctOption": quiz.correct_option
-                }
-                for quiz in chapter.quizzes
-            ]
-            
-            formatted_chapters.append({
-                "id": chapter.id,
-                "title": chapter.title,
-                "content": chapter.content,
-                "quiz": formatted_quizzes,
-                "completed": chapter_completed
-            })
-        
-        result.append({
-            "id": course.id,
-            "title": course.title,
-            "description": course.description,
-            "imageUrl": course.image_url,
-            "chapters": formatted_chapters,
-            "progress": progress,
-            "enrolled": enrollment is not None,
-            "enrollmentCode": course.enrollment_code if current_user.role == "admin" else None
-        })
+    return course_list_json.response(await db.run_sync(_get_all_courses, request, response, current_user), response)
+
+def _get_all_courses(
+    db: Session,
+    request: Request,
+    response: Response,
+    current_user: models.User
+):
+    courses = db.query(models.Course).filter(models.Course.deleted_at.is_(None)).all()
+    enrollments = catalog.load_enrollments(db, current_user.id)
     
-    return result
+    etag = catalog.catalog_etag(current_user, courses, enrollments)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
+    return catalog.load_catalog(db, current_user, courses, enrollments)
 
 @router.get("/user", response_model=List[course_schema.CourseResponse])
-def get_user_courses(
-    db: Session = Depends(get_db),
+async def get_user_courses(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    return get_all_courses(db, current_user)
+    return course_list_json.response(await db.run_sync(_get_all_courses, request, response, current_user), response)
+
+@router.get("/summary", response_model=course_schema.CourseSummaryPage)
+async def get_course_summaries(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    enrolled: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    return course_page_json.response(
+        await db.run_sync(_get_course_summaries, limit, cursor, enrolled, current_user)
+    )
+
+def _get_course_summaries(
+    db: Session,
+    limit: int,
+    cursor: Optional[str],
+    enrolled: bool,
+    current_user: models.User
+):
+    try:
+        return catalog.load_catalog_page(db, current_user, limit, cursor, enrolled)
+    except catalog.InvalidCursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
 
 @router.get("/{course_id}", response_model=course_schema.CourseResponse)
-def get_course(
+async def get_course(
     course_id: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    course = db.query(models.Course).filter(models.Course.id == course_id).first()
+    return course_json.response(await db.run_sync(_get_course, course_id, request, response, current_user), response)
+
+def _get_course(
+    db: Session,
+    course_id: str,
+    request: Request,
+    response: Response,
+    current_user: models.User
+):
+    course = db.query(models.Course).filter(
+        models.Course.id == course_id,
+        models.Course.deleted_at.is_(None)
+    ).first()
     if not course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Course not found"
         )
     
-    enrollment = db.query(models.Enrollment).filter(
-        models.Enrollment.user_id == current_user.id,
-        models.Enrollment.course_id == course.id
-    ).first()
+    enrollment = catalog.load_enrollments(db, current_user.id, [course.id]).get(course.id)
     
-    progress = 0
-    if enrollment:
-        total_chapters = len(course.chapters)
-        if total_chapters > 0:
-            completed_chapters = db.query(models.UserProgress).filter(
-                models.UserProgress.user_id == current_user.id,
-                models.UserProgress.course_id == course.id,
-                models.UserProgress.completed == True
-            ).count()
-            progress = int((completed_chapters / total_chapters) * 100)
-    
-    formatted_chapters = []
-    for chapter in course.chapters:
-        chapter_completed = db.query(models.UserProgress).filter(
-            models.UserProgress.user_id == current_user.id,
-            models.UserProgress.chapter_id == chapter.id,
-            models.UserProgress.completed == True
-        ).first() is not None
-        
-        formatted_quizzes = [
-            {
-                "id": quiz.id,
-                "question": quiz.question,
-                "options": quiz.options,
-                "correctOption": quiz.correct_option
-            }
-            for quiz in chapter.quizzes
-        ]
-        
-        formatted_chapters.append({
-            "id": chapter.id,
-            "title": chapter.title,
-            "content": chapter.content,
-            "quiz": formatted_quizzes,
-            "completed": chapter_completed
-        })
+    etag = catalog.course_etag(current_user, course, enrollment)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     
-    return {
-        "id": course.id,
-        "title": course.title,
-        "description": course.description,
-        "imageUrl": course.image_url,
-        "chapters": formatted_chapters,
-        "progress": progress,
-        "enrolled": enrollment is not None,
-        "enrollmentCode": course.enrollment_code if current_user.role == "admin" else None
-    }
+    return catalog.load_course(db, course, current_user, enrollment)
 
 @router.get("/{course_id}/chapters/{chapter_id}", response_model=course_schema.ChapterResponse)
-def get_chapter(
+async def get_chapter(
     course_id: str,
     chapter_id: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    course = db.query(models.Course).filter(models.Course.id == course_id).first()
+    return chapter_json.response(
+        await db.run_sync(_get_chapter, course_id, chapter_id, request, response, current_user), response
+    )
+
+def _get_chapter(
+    db: Session,
+    course_id: str,
+    chapter_id: str,
+    request: Request,
+    response: Response,
+    current_user: models.User
+):
+    course = db.query(models.Course).filter(
+        models.Course.id == course_id,
+        models.Course.deleted_at.is_(None)
+    ).first()
     if not course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -214,10 +224,14 @@ def get_chapter(
             detail="You must be enrolled in this course to access chapters"
         )
     
-    chapter = db.query(models.Chapter).filter(
-        models.Chapter.id == chapter_id,
-        models.Chapter.course_id == course_id
-    ).first()
+    chapter_completed = db.query(models.UserProgress).filter(
+        models.UserProgress.user_id == current_user.id,
+        models.UserProgress.chapter_id == chapter_id,
+        models.UserProgress.completed == True
+    ).first() is not None or chapter_id in progress_buffer.pending_completed(current_user.id).get(course_id, ())
+    
+    structure = catalog.get_structures(db, [course])[course.id]
+    chapter = catalog.find_chapter(structure, chapter_id)
     
     if not chapter:
         raise HTTPException(
@@ -225,36 +239,53 @@ def get_chapter(
             detail="Chapter not found"
         )
     
-    chapter_completed = db.query(models.UserProgress).filter(
-        models.UserProgress.user_id == current_user.id,
-        models.UserProgress.chapter_id == chapter.id,
-        models.UserProgress.completed == True
-    ).first() is not None
-    
-    formatted_quizzes = [
-        {
-            "id": quiz.id,
-            "question": quiz.question,
-            "options": quiz.options,
-            "correctOption": quiz.correct_option
-        }
-        for quiz in chapter.quizzes
-    ]
+    # Validators are compared only once the chapter is known to exist, so a
+    # replayed ETag of a missing chapter still gets its 404
+    etag = catalog.chapter_etag(current_user, course, chapter_id, chapter_completed)
+    if etag_matches(request, etag):
+        return not_modified(etag)
     
-    return {
-        "id": chapter.id,
-        "title": chapter.title,
-        "content": chapter.content,
-        "quiz": formatted_quizzes,
-        "completed": chapter_completed
-    }
+    head = chapter_body.head(db, chapter_id, course.version)
+    if head is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chapter not found"
+        )
+    length, first_chunk = head
+    metadata = {**chapter, "completed": chapter_completed}
+    
+    if length <= len(first_chunk):
+        set_etag(response, etag)
+        # The body depends only on the chapter and whether it is completed,
+        # so its compressed bytes are shared by every enrolled user
+        request.state.compression_key = course.id
+        return {**metadata, "content": first_chunk}
+    
+    # Long bodies are streamed in chunks; the validator stays the same, so
+    # clients can still revalidate with If-None-Match
+    return StreamingResponse(
+        chapter_body.stream(metadata, chapter_id, course.version, first_chunk, length),
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    )
 
 @router.post("/{course_id}/chapters/{chapter_id}/complete")
-def complete_chapter(
+async def complete_chapter(
     course_id: str,
     chapter_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
+):
+    await db.run_sync(_check_chapter_access, course_id, chapter_id, current_user)
+    await _record_progress(db, current_user.id, course_id, {"chapter_id": chapter_id, "completed": True})
+    
+    return {"message": "Chapter marked as completed"}
+
+def _check_chapter_access(
+    db: Session,
+    course_id: str,
+    chapter_id: str,
+    current_user: models.User
 ):
     # Check if user is enrolled
     enrollment = db.query(models.Enrollment).filter(
@@ -268,9 +299,10 @@ def complete_chapter(
             detail="You must be enrolled in this course"
         )
     
-    chapter = db.query(models.Chapter).filter(
+    chapter = db.query(models.Chapter.id, models.Course.version).join(models.Course).filter(
         models.Chapter.id == chapter_id,
-        models.Chapter.course_id == course_id
+        models.Chapter.course_id == course_id,
+        models.Course.deleted_at.is_(None)
     ).first()
     
     if not chapter:
@@ -279,35 +311,66 @@ def complete_chapter(
             detail="Chapter not found"
         )
     
-    progress = db.query(models.UserProgress).filter(
-        models.UserProgress.user_id == current_user.id,
-        models.UserProgress.chapter_id == chapter_id
-    ).first()
-    
-    if progress:
-        progress.completed = True
-        progress.completed_at = func.now()
+    return chapter.version
+
+async def _record_progress(db: AsyncSession, user_id: str, course_id: str, entry: dict):
+    # With write-behind enabled the event is acknowledged once it is in the
+    # local WAL; otherwise it is upserted right away
+    if progress_buffer.enabled:
+        await progress_buffer.record(user_id, course_id, entry)
     else:
-        progress = models.UserProgress(
-            user_id=current_user.id,
-            course_id=course_id,
-            chapter_id=chapter_id,
-            completed=True,
-            completed_at=func.now()
-        )
-        db.add(progress)
-    
-    db.commit()
-    
-    return {"message": "Chapter marked as completed"}
+        await db.run_sync(save_progress, [{**entry, "user_id": user_id, "course_id": course_id}])
 
 @router.post("/{course_id}/chapters/{chapter_id}/quiz", response_model=course_schema.QuizResult)
-def submit_quiz(
+async def submit_quiz(
+    course_id: str,
+    chapter_id: str,
+    submission: course_schema.QuizSubmission,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    result = await db.run_sync(_grade_quiz, course_id, chapter_id, submission, current_user)
+    await _record_progress(db, current_user.id, course_id, {
+        "chapter_id": chapter_id,
+        "completed": result["passed"],
+        "quiz_score": result["score"]
+    })
+    
+    return result
+
+def _grade_quiz(
+    db: Session,
     course_id: str,
     chapter_id: str,
     submission: course_schema.QuizSubmission,
-    db: Session = Depends(get_db),
+    current_user: models.User
+):
+    version = _check_chapter_access(db, course_id, chapter_id, current_user)
+    
+    # Answer keys come from the in-memory index, not a quiz query
+    answer_key = answer_keys.key(db, course_id, version, chapter_id)
+    if not answer_key:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No quizzes found for this chapter"
+        )
+    
+    return answer_key.grade(submission.answers)
+
+@router.post("/{course_id}/quiz/batch", response_model=course_schema.BatchQuizResult)
+async def submit_quiz_batch(
+    course_id: str,
+    submission: course_schema.BatchQuizSubmission,
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_active_user)
+):
+    return await db.run_sync(_submit_quiz_batch, course_id, submission, current_user)
+
+def _submit_quiz_batch(
+    db: Session,
+    course_id: str,
+    submission: course_schema.BatchQuizSubmission,
+    current_user: models.User
 ):
     enrollment = db.query(models.Enrollment).filter(
         models.Enrollment.user_id == current_user.id,
@@ -320,60 +383,95 @@ def submit_quiz(
             detail="You must be enrolled in this course"
         )
     
-    chapter = db.query(models.Chapter).filter(
-        models.Chapter.id == chapter_id,
-        models.Chapter.course_id == course_id
+    chapter_ids = list(submission.chapters)
+    course = db.query(models.Course.version).filter(
+        models.Course.id == course_id,
+        models.Course.deleted_at.is_(None)
     ).first()
-    
-    if not chapter:
+    # Every answer key of the course, from the in-memory index
+    keys = answer_keys.get(db, course_id, course.version) if course else {}
+    missing = [chapter_id for chapter_id in chapter_ids if chapter_id not in keys]
+    if missing:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Chapter not found"
+            detail=f"Chapter not found: {missing[0]}"
         )
     
-    quizzes = db.query(models.Quiz).filter(models.Quiz.chapter_id == chapter_id).all()
-    if not quizzes:
+    empty = [chapter_id for chapter_id in chapter_ids if not keys[chapter_id]]
+    if empty:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="No quizzes found for this chapter"
+            detail=f"No quizzes found for chapter {empty[0]}"
         )
     
-    total_questions = len(quizzes)
-    correct_answers = 0
+    results = {
+        chapter_id: keys[chapter_id].grade(answers)
+        for chapter_id, answers in submission.chapters.items()
+    }
     
-    for quiz in quizzes:
-        if quiz.id in submission.answers and submission.answers[quiz.id] == quiz.correct_option:
-            correct_answers += 1
+    save_progress(db, [
+        {
+            "user_id": current_user.id,
+            "course_id": course_id,
+            "chapter_id": chapter_id,
+            "completed": result["passed"],
+            "quiz_score": result["score"]
+        }
+        for chapter_id, result in results.items()
+    ])
     
-    score = int((correct_answers / total_questions) * 100) if total_questions > 0 else 0
-    passed = score >= 70  # 70% is passing score
+    return {"results": results}
+
+@router.get("/{course_id}/leaderboard", response_model=course_schema.Leaderboard)
+async def get_leaderboard(
+    course_id: str,
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    return leaderboard_json.response(await db.run_sync(_get_leaderboard, course_id, limit, offset, current_user))
+
+def _get_leaderboard(
+    db: Session,
+    course_id: str,
+    limit: int,
+    offset: int,
+    current_user: models.User
+):
+    course = db.query(models.Course.id).filter(
+        models.Course.id == course_id,
+        models.Course.deleted_at.is_(None)
+    ).first()
+    if not course:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
     
-    progress = db.query(models.UserProgress).filter(
-        models.UserProgress.user_id == current_user.id,
-        models.UserProgress.chapter_id == chapter_id
+    enrollment = db.query(models.Enrollment.id).filter(
+        models.Enrollment.user_id == current_user.id,
+        models.Enrollment.course_id == course_id
     ).first()
     
-    if progress:
-        progress.quiz_score = score
-        if passed:
-            progress.completed = True
-            progress.completed_at = func.now()
-    else:
-        progress = models.UserProgress(
-            user_id=current_user.id,
-            course_id=course_id,
-            chapter_id=chapter_id,
-            quiz_score=score,
-            completed=passed,
-            completed_at=func.now() if passed else None
+    if not enrollment:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You must be enrolled in this course"
         )
-        db.add(progress)
     
-    db.commit()
+    # Ranks come from the in-memory board; only the page's names are queried
+    students, entries = leaderboards.top(db, course_id, limit, offset)
+    me = leaderboards.rank(db, course_id, current_user.id)
+    user_ids = {entry["userId"] for entry in entries}
+    names = dict(
+        db.query(models.User.id, models.User.name).filter(models.User.id.in_(user_ids))
+    ) if user_ids else {}
+    names[current_user.id] = current_user.name
     
     return {
-        "score": score,
-        "passed": passed,
-        "correctAnswers": correct_answers,
-        "totalQuestions": total_questions
+        "courseId": course_id,
+        "students": students,
+        "entries": [{**entry, "name": names.get(entry["userId"], "")} for entry in entries],
+        "me": {**me, "name": current_user.name} if me else None
     }
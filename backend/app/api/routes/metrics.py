@@ -0,0 +1,21 @@
+import os
+
+from fastapi import APIRouter, HTTPException, Request, Response, status
+
+from app.core.request_metrics import request_metrics
+
+router = APIRouter()
+
+# Optional shared secret for the scraper; the endpoint is open when unset
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics(request: Request):
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token"
+        )
+    
+    return Response(request_metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,212 @@
+import hashlib
+import os
+import zlib
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+MINIMUM_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+# Bodies (or stream chunks) at least this large are compressed on the threadpool
+OFFLOAD_SIZE = int(os.getenv("COMPRESSION_OFFLOAD_SIZE", "65536"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def available_encodings() -> tuple:
+    """Supported encodings, most preferred first"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The best supported encoding for an Accept-Encoding header, None for identity"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in available_encodings():
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+            self._compress, self._finish = self._compressor.process, self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._compress, self._finish = self._compressor.compress, self._compressor.flush
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compress(chunk)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing JSON and text responses for clients
+    that accept it: brotli when offered (and installed), otherwise gzip.
+    Bodies under `minimum_size` are left alone, and large bodies or stream
+    chunks are compressed on the threadpool so the event loop keeps serving.
+
+    A route whose body is shared by many users (not per-user payloads,
+    whose entries would rarely be hit again) can name its course in
+    `request.state.compression_key`; the compressed bytes are then kept in
+    `cache` (the course cache) under that course and the digest of the
+    uncompressed body, so the same body is compressed once. ETags of
+    compressed responses are weakened, as the bytes differ from the
+    identity representation.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = MINIMUM_SIZE,
+        gzip_level: int = GZIP_LEVEL,
+        brotli_quality: int = BROTLI_QUALITY,
+        offload_size: int = OFFLOAD_SIZE,
+        cache=None
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.offload_size = offload_size
+        self.cache = cache
+
+    async def _compress(self, body: bytes, encoding: str) -> bytes:
+        if len(body) >= self.offload_size:
+            return await run_in_threadpool(compress, body, encoding, self.gzip_level, self.brotli_quality)
+        return compress(body, encoding, self.gzip_level, self.brotli_quality)
+
+    async def _compress_cached(self, key: Optional[str], body: bytes, encoding: str) -> bytes:
+        if key is None or self.cache is None:
+            return await self._compress(body, encoding)
+        digest = hashlib.sha1(body).hexdigest()
+        compressed = self.cache.get_encoded(key, digest, encoding)
+        if compressed is None:
+            compressed = await self._compress(body, encoding)
+            self.cache.put_encoded(key, digest, encoding, compressed)
+        return compressed
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            async def send_identity(message):
+                # Shared caches must not hand this identity body to clients that accept gzip
+                if message["type"] == "http.response.start" and _varies(message):
+                    MutableHeaders(scope=message).add_vary_header("Accept-Encoding")
+                await send(message)
+
+            await self.app(scope, receive, send_identity)
+            return
+
+        state = {"start": None, "compress": False, "stream": None}
+
+        async def send_compressed(message):
+            if message["type"] == "http.response.start":
+                state["compress"] = message["status"] != 304 and _varies(message)
+                if message["status"] == 304:
+                    headers = MutableHeaders(scope=message)
+                    headers.add_vary_header("Accept-Encoding")
+                    _weaken_etag(headers)
+                if not state["compress"]:
+                    await send(message)
+                else:
+                    state["start"] = message
+                return
+
+            if message["type"] != "http.response.body" or not state["compress"]:
+                await send(message)
+                return
+
+            start = state["start"]
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if state["stream"] is None and not more_body:
+                headers = MutableHeaders(scope=start)
+                headers.add_vary_header("Accept-Encoding")
+                if len(body) >= self.minimum_size:
+                    body = await self._compress_cached(
+                        scope.get("state", {}).get("compression_key"), body, encoding
+                    )
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(body))
+                    _weaken_etag(headers)
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            if state["stream"] is None:
+                # Streamed bodies have no known length; compress them chunk by chunk
+                state["stream"] = _StreamCompressor(encoding, self.gzip_level, self.brotli_quality)
+                headers = MutableHeaders(scope=start)
+                headers.add_vary_header("Accept-Encoding")
+                headers["Content-Encoding"] = encoding
+                if "content-length" in headers:
+                    del headers["content-length"]
+                _weaken_etag(headers)
+                await send(start)
+            stream = state["stream"]
+            if len(body) >= self.offload_size:
+                chunk = await run_in_threadpool(stream.compress, body)
+            else:
+                chunk = stream.compress(body)
+            if not more_body:
+                chunk += stream.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _varies(message) -> bool:
+    """Whether the response's representation depends on Accept-Encoding"""
+    if message["status"] == 304:
+        return True
+    headers = Headers(raw=message["headers"])
+    return (
+        message["status"] != 204
+        and "content-encoding" not in headers
+        and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+def _weaken_etag(headers: MutableHeaders) -> None:
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = f"W/{etag}"
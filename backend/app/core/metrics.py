@@ -0,0 +1,57 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, Sequence
+
+# Millisecond buckets shared by the latency histograms
+DEFAULT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram (cumulative counts on export)"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = {}
+        running = 0
+        for bound, bucket_count in zip(list(self.buckets) + ["+Inf"], counts):
+            running += bucket_count
+            cumulative[str(bound)] = running
+        return {"buckets": cumulative, "count": count, "sum": total}
+
+
+def _labels(labels: Dict[str, str], **extra) -> str:
+    merged = {**labels, **extra}
+    if not merged:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in merged.items()
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def render_histogram(name: str, labels: Dict[str, str], snapshot: dict) -> list:
+    """Prometheus text exposition lines for one labelled histogram snapshot"""
+    lines = [
+        f"{name}_bucket{_labels(labels, le=bound)} {count}"
+        for bound, count in snapshot["buckets"].items()
+    ]
+    lines.append(f"{name}_sum{_labels(labels)} {snapshot['sum']}")
+    lines.append(f"{name}_count{_labels(labels)} {snapshot['count']}")
+    return lines
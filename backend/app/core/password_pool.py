@@ -0,0 +1,84 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from app.core.metrics import Histogram
+
+
+class HashingOverloaded(Exception):
+    """Raised when the hashing queue is full; the caller should answer 503"""
+
+
+class PasswordHashPool:
+    """
+    Size-limited executor for bcrypt work so a burst of logins cannot take
+    over the event loop or Starlette's shared threadpool.
+
+    bcrypt releases the GIL, so threads scale across cores; a process pool
+    is available for deployments that prefer isolation. At most
+    `queue_limit` hashes may be running or waiting at once; beyond that new
+    requests fail fast instead of queueing indefinitely.
+    """
+
+    def __init__(self, workers: int = 4, queue_limit: int = 64, kind: str = "thread"):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.kind = kind
+        self.in_flight = 0
+        self.rejected = 0
+        self.latency_ms = Histogram()
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def run(self, fn: Callable, *args):
+        with self._lock:
+            if self.in_flight >= self.queue_limit:
+                self.rejected += 1
+                raise HashingOverloaded()
+            self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.latency_ms.observe((time.perf_counter() - started) * 1000)
+            with self._lock:
+                self.in_flight -= 1
+
+    def stats(self) -> dict:
+        in_flight = self.in_flight
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queueLimit": self.queue_limit,
+            "inFlight": in_flight,
+            "queueDepth": max(0, in_flight - self.workers),
+            "rejected": self.rejected,
+            "latencyMs": self.latency_ms.snapshot()
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+password_pool = PasswordHashPool(
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", "4")),
+    queue_limit=int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "64")),
+    kind=os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+)
@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class Principal:
+    """
+    The authenticated user as seen by route handlers. It carries only the
+    columns authorization and /auth/me need, so it can outlive the request
+    session and be shared between requests.
+    """
+
+    __slots__ = ("id", "name", "email", "role")
+
+    def __init__(self, id: str, name: str, email: str, role: str):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.role = role
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(id=user.id, name=user.name, email=user.email, role=user.role)
+
+
+class PrincipalCache:
+    """
+    Short-lived cache of token -> Principal. Entries expire after `ttl`
+    seconds or when the token itself expires, whichever comes first, and
+    can be dropped for a user explicitly (see the User mapper events below).
+    """
+
+    def __init__(self, ttl: float = 60, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._tokens_by_user = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[Principal]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    self._remove(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, principal: Principal, token_expires_at: Optional[float] = None) -> None:
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            self._remove(token)
+            self._entries[token] = (principal, expires_at)
+            self._tokens_by_user.setdefault(principal.id, set()).add(token)
+            while len(self._entries) > self.maxsize:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def invalidate_user(self, user_id: str) -> None:
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._remove(token)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def _remove(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_user.get(entry[0].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry[0].id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttlSeconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+principal_cache = PrincipalCache(
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "60")),
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+)
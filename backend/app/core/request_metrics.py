@@ -0,0 +1,191 @@
+import contextvars
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+from app.core.metrics import DEFAULT_BUCKETS_MS, Histogram, render_histogram
+
+SQL_COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+RESPONSE_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_ms")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_ms = 0.0
+
+
+# Stats of the request being handled in the current context; run_sync
+# greenlets and threadpool calls inherit it
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+def _observe(context) -> None:
+    # The start time lives on the statement's execution context, which is
+    # dropped with the statement whether it succeeds or fails
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    context._query_started = None
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_ms += (time.perf_counter() - started) * 1000
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _observe(context)
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute does not fire for failed statements; count them here
+    if exception_context.execution_context is not None:
+        _observe(exception_context.execution_context)
+
+
+def instrument_engine(engine) -> None:
+    """Attribute statements run on `engine` (an Engine, or the Engine class for all) to the current request"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+class RouteMetrics:
+    __slots__ = ("latency_ms", "statements", "db_ms", "response_bytes", "statuses")
+
+    def __init__(self):
+        self.latency_ms = Histogram()
+        self.statements = Histogram(SQL_COUNT_BUCKETS)
+        self.db_ms = Histogram(DEFAULT_BUCKETS_MS)
+        self.response_bytes = Histogram(RESPONSE_SIZE_BUCKETS)
+        self.statuses: Dict[int, int] = {}
+
+
+class RequestMetrics:
+    """Per-route request histograms, keyed by method and route template"""
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self._lock = threading.Lock()
+
+    def observe(
+        self,
+        method: str,
+        route: str,
+        status_code: int,
+        latency_ms: float,
+        statements: int,
+        db_ms: float,
+        size: int
+    ) -> None:
+        key = (method, route)
+        with self._lock:
+            metrics = self._routes.get(key)
+            if metrics is None:
+                metrics = self._routes[key] = RouteMetrics()
+            metrics.statuses[status_code] = metrics.statuses.get(status_code, 0) + 1
+        metrics.latency_ms.observe(latency_ms)
+        metrics.statements.observe(statements)
+        metrics.db_ms.observe(db_ms)
+        metrics.response_bytes.observe(size)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        with self._lock:
+            routes = sorted(self._routes.items())
+            statuses = [(key, dict(metrics.statuses)) for key, metrics in routes]
+
+        families = (
+            ("http_request_duration_milliseconds", "Request latency", "latency_ms"),
+            ("http_request_sql_statements", "SQL statements per request", "statements"),
+            ("http_request_db_duration_milliseconds", "Time spent in SQL per request", "db_ms"),
+            ("http_response_size_bytes", "Response body size", "response_bytes"),
+        )
+        lines = [
+            "# HELP http_requests_total Requests by route and status",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route), counts in statuses:
+            for status_code, count in sorted(counts.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status_code}"}} {count}')
+        for name, help_text, attribute in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (method, route), metrics in routes:
+                lines.extend(render_histogram(
+                    name, {"method": method, "route": route}, getattr(metrics, attribute).snapshot()
+                ))
+        return "\n".join(lines) + "\n"
+
+
+request_metrics = RequestMetrics()
+
+
+class RequestMetricsMiddleware:
+    """
+    Pure ASGI middleware timing each request and counting its SQL. Adds a
+    Server-Timing header (db and app durations) and feeds request_metrics,
+    labelled by the matched route template so ids do not blow up the
+    label set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        outcome = {"status": 500, "size": 0, "latency_ms": None, "statements": 0, "db_ms": 0.0}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                outcome["status"] = message["status"]
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={stats.db_ms:.1f};desc="{stats.statements} queries", app;dur={elapsed_ms:.1f}'
+                )
+            elif message["type"] == "http.response.body":
+                outcome["size"] += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    # Background tasks run after this; keep them out of the numbers
+                    outcome["latency_ms"] = (time.perf_counter() - started) * 1000
+                    outcome["statements"], outcome["db_ms"] = stats.statements, stats.db_ms
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if outcome["latency_ms"] is None:
+                outcome["latency_ms"] = (time.perf_counter() - started) * 1000
+                outcome["statements"], outcome["db_ms"] = stats.statements, stats.db_ms
+            request_metrics.observe(
+                scope["method"],
+                getattr(scope.get("route"), "path", "unmatched"),
+                outcome["status"],
+                outcome["latency_ms"],
+                outcome["statements"],
+                outcome["db_ms"],
+                outcome["size"]
+            )
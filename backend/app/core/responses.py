@@ -0,0 +1,45 @@
+import os
+from typing import Any, Optional
+
+import orjson
+from fastapi import Response
+from pydantic import TypeAdapter
+
+# Trusted payloads are rendered as they are. With RESPONSE_VALIDATION set they
+# go through their schema first, as response_model would (tests, debugging).
+VALIDATE_RESPONSES = os.getenv("RESPONSE_VALIDATION", "").lower() in ("1", "true", "yes")
+
+
+class ResponseSerializer:
+    """
+    Renders dicts that our own code built in a schema's shape. The route
+    keeps its response_model for the OpenAPI schema, but returning a
+    Response makes FastAPI skip validating and re-encoding the payload;
+    orjson writes the dicts directly. The TypeAdapter is built once per
+    schema and only used when validation is switched on.
+    """
+
+    def __init__(self, schema: Any):
+        self.adapter = TypeAdapter(schema)
+
+    def render(self, content: Any) -> bytes:
+        if VALIDATE_RESPONSES:
+            return self.adapter.dump_json(self.adapter.validate_python(content))
+        return orjson.dumps(content)
+
+    def response(self, content: Any, response: Optional[Response] = None) -> Response:
+        """
+        JSON response for `content`, carrying the headers set on the injected
+        `response`. Responses built by the route itself (304s, streams) pass
+        through untouched.
+        """
+        if isinstance(content, Response):
+            return content
+        rendered = Response(self.render(content), media_type="application/json")
+        if response is not None:
+            rendered.headers.raw.extend(
+                (key, value) for key, value in response.headers.raw if key != b"content-length"
+            )
+            if response.status_code:
+                rendered.status_code = response.status_code
+        return rendered
@@ -4,9 +4,13 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from app.db.database import get_async_db
 from app.db import models
+from app.core.password_pool import HashingOverloaded, password_pool
+from app.core.principal_cache import Principal, principal_cache
 import os
 
 # Get secret key from environment or use default (in production, always use env var)
@@ -23,6 +27,22 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def _run_hashing(fn, *args):
+    try:
+        return await password_pool.run(fn, *args)
+    except HashingOverloaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+async def verify_password_async(plain_password, hashed_password):
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await _run_hashing(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -33,12 +53,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+async def get_current_user(db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+    
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
@@ -47,18 +71,47 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
     except JWTError:
         raise credentials_exception
     
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.get(models.User, user_id)
     if user is None:
         raise credentials_exception
-    return user
+    
+    principal = Principal.from_user(user)
+    principal_cache.put(token, principal, payload.get("exp"))
+    return principal
 
-def get_current_active_user(current_user = Depends(get_current_user)):
+async def get_current_active_user(current_user = Depends(get_current_user)):
     return current_user
 
-def get_admin_user(current_user = Depends(get_current_user)):
+async def get_admin_user(current_user = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
     return current_user
+
+# Session.info key of the user ids whose cached principals go on commit
+_CHANGED_USERS = "principal_cache_changed_users"
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _track_changed_principal(mapper, connection, target):
+    # Role, name or email changed (or the user is gone). The cached principals
+    # are dropped after the commit: dropping them at flush time would let a
+    # concurrent request cache the old row again before the change is visible.
+    # Bulk update()/delete() statements bypass mapper events; code issuing
+    # them must call principal_cache.invalidate_user itself.
+    session = object_session(target)
+    if session is None:
+        principal_cache.invalidate_user(target.id)
+        return
+    session.info.setdefault(_CHANGED_USERS, set()).add(target.id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_principals(session):
+    for user_id in session.info.pop(_CHANGED_USERS, ()):
+        principal_cache.invalidate_user(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_principals(session):
+    session.info.pop(_CHANGED_USERS, None)
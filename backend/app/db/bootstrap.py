@@ -0,0 +1,72 @@
+"""
+Schema migration and seed data, run once per deployment through manage.py
+rather than on every API worker start.
+"""
+import os
+from contextlib import contextmanager
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from app.db import models
+
+# Arbitrary key for the Postgres advisory lock serializing concurrent migrations
+MIGRATION_LOCK_KEY = 72_315_001
+
+SEED_USERS = (
+    ("admin@admin.com", "admin", "admin"),
+    ("user@user.com", "user", "user"),
+)
+
+
+@contextmanager
+def _migration_lock(engine):
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+def migrate(engine, alembic_ini: str = "alembic.ini") -> str:
+    """
+    Bring the schema to the latest revision.
+
+    An empty database gets the tables from the models and is stamped at
+    head; an existing one is upgraded through Alembic. Returns which of
+    the two happened.
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(alembic_ini)
+    config.set_main_option("sqlalchemy.url", engine.url.render_as_string(hide_password=False))
+
+    with _migration_lock(engine):
+        if "courses" not in inspect(engine).get_table_names():
+            models.Base.metadata.create_all(bind=engine)
+            command.stamp(config, "head")
+            return "created"
+        command.upgrade(config, "head")
+        # Tables introduced without a migration of their own
+        models.Base.metadata.create_all(bind=engine)
+        return "upgraded"
+
+
+def seed(db: Session, password: str = None) -> list:
+    """Create the default admin and regular user if missing; returns the emails created"""
+    from app.core.security import get_password_hash
+
+    password = password or os.getenv("SEED_PASSWORD", "Start!2345")
+    created = []
+    for email, name, role in SEED_USERS:
+        if db.query(models.User.id).filter(models.User.email == email).first():
+            continue
+        db.add(models.User(email=email, name=name, role=role, hashed_password=get_password_hash(password)))
+        created.append(email)
+    db.commit()
+    return created
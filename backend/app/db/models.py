@@ -1,5 +1,5 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, JSON, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, Text, JSON, DateTime
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from .database import Base
 import uuid
@@ -36,19 +36,27 @@ class Course(Base):
     description = Column(Text, nullable=False)
     image_url = Column(String, nullable=False)
     enrollment_code = Column(String, nullable=False, default=generate_enrollment_code, unique=True, index=True)
+    # Bumped on every structural change; used to validate cached course trees
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Set when a deletion job hides the course; the rows are removed in the background
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
-    chapters = relationship("Chapter", back_populates="course", cascade="all, delete-orphan")
+    chapters = relationship("Chapter", back_populates="course", cascade="all, delete-orphan", order_by="Chapter.order")
     enrollments = relationship("Enrollment", back_populates="course")
 
 class Chapter(Base):
     __tablename__ = "chapters"
+    __table_args__ = (
+        Index("ix_chapters_course_id_order", "course_id", "order"),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid)
     course_id = Column(String, ForeignKey("courses.id"), nullable=False)
     title = Column(String, nullable=False)
-    content = Column(Text, nullable=False)
+    # Unbounded body; only loaded when a single chapter is read
+    content = deferred(Column(Text, nullable=False))
     order = Column(Integer, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -61,7 +69,7 @@ class Quiz(Base):
     __tablename__ = "quizzes"
 
     id = Column(String, primary_key=True, default=generate_uuid)
-    chapter_id = Column(String, ForeignKey("chapters.id"), nullable=False)
+    chapter_id = Column(String, ForeignKey("chapters.id"), nullable=False, index=True)
     question = Column(String, nullable=False)
     options = Column(JSON, nullable=False)  # Store as JSON array
     correct_option = Column(Integer, nullable=False)
@@ -72,17 +80,35 @@ class Quiz(Base):
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
+    __table_args__ = (
+        Index("uq_enrollments_user_id_course_id", "user_id", "course_id", unique=True),
+        # Covers the analytics enrollment totals; also serves lookups by course_id
+        Index("ix_enrollments_course_id_counters", "course_id", "completed_chapters", "total_chapters"),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
     course_id = Column(String, ForeignKey("courses.id"), nullable=False)
     enrolled_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Denormalized progress counters, kept in sync by app.services.progress
+    completed_chapters = Column(Integer, nullable=False, default=0, server_default="0")
+    total_chapters = Column(Integer, nullable=False, default=0, server_default="0")
 
     user = relationship("User", back_populates="enrollments")
     course = relationship("Course", back_populates="enrollments")
 
 class UserProgress(Base):
     __tablename__ = "user_progress"
+    __table_args__ = (
+        Index("uq_user_progress_user_id_chapter_id", "user_id", "chapter_id", unique=True),
+        Index("ix_user_progress_user_id_course_id_completed", "user_id", "course_id", "completed"),
+        Index("ix_user_progress_chapter_id", "chapter_id"),
+        # Covers the analytics GROUP BY; also serves lookups by course_id
+        Index(
+            "ix_user_progress_course_id_chapter_id_completed_quiz_score",
+            "course_id", "chapter_id", "completed", "quiz_score"
+        ),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
@@ -90,7 +116,43 @@ class UserProgress(Base):
     chapter_id = Column(String, ForeignKey("chapters.id"), nullable=False)
     completed = Column(Boolean, default=False)
     quiz_score = Column(Integer, nullable=True)
+    # When quiz_score was recorded; an older score never replaces a newer one
+    quiz_scored_at = Column(DateTime(timezone=True), nullable=True)
     completed_at = Column(DateTime(timezone=True), nullable=True)
 
     user = relationship("User", back_populates="progress")
     chapter = relationship("Chapter", back_populates="progress")
+
+class LeaderboardEntry(Base):
+    """Total quiz score of a student in a course, kept in sync by app.services.leaderboard"""
+    __tablename__ = "course_leaderboard"
+    __table_args__ = (
+        # Covers loading a course's board
+        Index(
+            "ix_course_leaderboard_course_id_total_score_user_id_quizzes",
+            "course_id", "total_score", "user_id", "quizzes"
+        ),
+        # Covers syncing a loaded board with the rows changed since
+        Index("ix_course_leaderboard_course_id_updated_at", "course_id", "updated_at"),
+    )
+
+    course_id = Column(String, ForeignKey("courses.id"), primary_key=True)
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    total_score = Column(Integer, nullable=False, default=0, server_default="0")
+    # Chapters with a quiz score
+    quizzes = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class CourseDeletionJob(Base):
+    __tablename__ = "course_deletion_jobs"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    course_id = Column(String, nullable=False, index=True)
+    course_title = Column(String, nullable=True)
+    status = Column(String, nullable=False, default="pending", server_default="pending")
+    # Rows removed so far, per table
+    deleted = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
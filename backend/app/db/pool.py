@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.metrics import Histogram
+
+
+class PoolStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.waiters = 0
+        self.wait_ms = Histogram()
+        self._lock = threading.Lock()
+
+    def begin_wait(self, blocking: bool) -> float:
+        # Only checkouts made while the pool is exhausted count as waiters
+        if blocking:
+            with self._lock:
+                self.waiters += 1
+        return time.perf_counter()
+
+    def end_wait(self, started: float, blocking: bool, timed_out: bool = False) -> None:
+        self.wait_ms.observe((time.perf_counter() - started) * 1000)
+        with self._lock:
+            if blocking:
+                self.waiters -= 1
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+
+
+class _InstrumentedPoolMixin:
+    """
+    Times every checkout, including the wait for a free connection, and
+    counts the checkouts blocked on an exhausted pool as waiters
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _exhausted(self) -> bool:
+        # A max_overflow of -1 means no limit, so a checkout never blocks
+        return self._max_overflow >= 0 and self.checkedout() >= self.size() + self._max_overflow
+
+    def _do_get(self):
+        blocking = self._exhausted()
+        started = self.stats.begin_wait(blocking)
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.end_wait(started, blocking, timed_out=True)
+            raise
+        except BaseException:
+            self.stats.end_wait(started, blocking)
+            raise
+        self.stats.end_wait(started, blocking)
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+def pool_options(url: str, is_async: bool = False) -> dict:
+    """
+    create_engine keyword arguments for the connection pool, configured from
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE and
+    DB_POOL_PRE_PING. In-memory SQLite keeps SQLAlchemy's default pool.
+    """
+    if url.startswith("sqlite") and (":memory:" in url or "mode=memory" in url):
+        return {}
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+
+
+def pool_status(pool) -> dict:
+    """Live pool occupancy plus checkout wait statistics, if instrumented"""
+    status = {"class": type(pool).__name__}
+    for key, attr in (("size", "size"), ("checkedIn", "checkedin"), ("checkedOut", "checkedout"), ("overflow", "overflow")):
+        if hasattr(pool, attr):
+            status[key] = getattr(pool, attr)()
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update({
+            "waiters": stats.waiters,
+            "checkouts": stats.checkouts,
+            "timeouts": stats.timeouts,
+            "checkoutWaitMs": stats.wait_ms.snapshot()
+        })
+    return status
@@ -38,6 +38,13 @@ class ChapterResponse(ChapterBase):
     class Config:
         from_attributes = True
 
+# Глава в составе курса: без текста, он отдается только эндпоинтом главы
+class ChapterSummary(BaseModel):
+    id: str
+    title: str
+    quiz: List[QuizResponse]
+    completed: Optional[bool] = False
+
 # Базовый класс для курса
 class CourseBase(BaseModel):
     title: str
@@ -52,7 +59,7 @@ class CourseUpdate(CourseBase):
 
 class CourseResponse(CourseBase):
     id: str
-    chapters: List[ChapterResponse]
+    chapters: List[ChapterSummary]
     progress: Optional[int] = 0
     enrolled: Optional[bool] = False
     enrollmentCode: Optional[str] = None
@@ -60,6 +67,24 @@ class CourseResponse(CourseBase):
     class Config:
         from_attributes = True
 
+# Полный курс с текстами глав для редактирования администратором
+class CourseDetail(CourseResponse):
+    chapters: List[ChapterResponse]
+
+# Краткое описание курса для карточек (без содержимого глав и викторин)
+class CourseSummary(CourseBase):
+    id: str
+    chapterCount: int
+    quizCount: int
+    progress: int = 0
+    enrolled: bool = False
+    enrollmentCode: Optional[str] = None
+
+# Страница списка курсов с курсором для следующей страницы
+class CourseSummaryPage(BaseModel):
+    items: List[CourseSummary]
+    nextCursor: Optional[str] = None
+
 # Класс для отправки ответов на викторину
 class QuizSubmission(BaseModel):
     answers: Dict[str, int]  # Словарь, где ключ - id викторины, значение - выбранный вариант ответа
@@ -72,6 +97,14 @@ class QuizResult(BaseModel):
     correctAnswers: int  # Количество правильных ответов
     totalQuestions: int  # Общее количество вопросов
 
+# Ответы сразу на несколько глав курса: id главы -> (id викторины -> вариант ответа)
+class BatchQuizSubmission(BaseModel):
+    chapters: Dict[str, Dict[str, int]]
+
+# Результаты пакетной проверки по каждой главе
+class BatchQuizResult(BaseModel):
+    results: Dict[str, QuizResult]
+
 # Класс для запроса записи на курс с использованием кода
 class EnrollmentCodeRequest(BaseModel):
     enrollmentCode: str
@@ -80,3 +113,106 @@ class EnrollmentCodeRequest(BaseModel):
 class EnrollmentResponse(BaseModel):
     success: bool
     message: str
+
+# Результат импорта одной строки NDJSON
+class CourseImportLineResult(BaseModel):
+    line: int
+    status: str  # "created" или "error"
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+# Отчет о массовом импорте курсов
+class CourseImportReport(BaseModel):
+    created: int
+    failed: int
+    results: List[CourseImportLineResult]
+
+# Количество созданных, измененных и удаленных записей одного типа
+class ChangeCounts(BaseModel):
+    created: int
+    updated: int
+    deleted: int
+
+# Что изменилось при обновлении курса
+class CourseChanges(BaseModel):
+    changed: bool
+    course: List[str]  # измененные поля курса
+    chapters: ChangeCounts
+    quizzes: ChangeCounts
+    progressDeleted: int
+
+# Ответ на обновление курса: курс и список изменений
+class CourseUpdateResponse(CourseResponse):
+    changes: CourseChanges
+
+# Фоновая задача удаления курса
+class CourseDeletionJob(BaseModel):
+    id: str
+    courseId: str
+    courseTitle: Optional[str] = None
+    status: str  # pending, running, completed или failed
+    deleted: Dict[str, int]  # удалено строк по таблицам
+    error: Optional[str] = None
+    createdAt: Optional[datetime] = None
+    updatedAt: Optional[datetime] = None
+    finishedAt: Optional[datetime] = None
+
+# Записи на курс в аналитике
+class EnrollmentAnalytics(BaseModel):
+    total: int
+    completedCourse: int  # прошли все главы
+    averageProgress: float  # средний прогресс, %
+
+# Шаг воронки: сколько студентов завершили главу
+class ChapterFunnelStep(BaseModel):
+    chapterId: str
+    title: str
+    order: int
+    completed: int
+    completionRate: float  # доля от всех записавшихся
+    quizAttempts: int
+    averageScore: Optional[float] = None
+
+# Столбец гистограммы баллов
+class ScoreBucket(BaseModel):
+    min: int
+    max: int
+    count: int
+
+# Распределение баллов за викторины по курсу
+class QuizScoreDistribution(BaseModel):
+    count: int
+    mean: Optional[float] = None
+    histogram: List[ScoreBucket]
+    percentiles: Dict[str, Optional[int]]
+
+# Аналитика курса для администратора
+class CourseAnalytics(BaseModel):
+    courseId: str
+    title: str
+    enrollments: EnrollmentAnalytics
+    funnel: List[ChapterFunnelStep]
+    quizScores: QuizScoreDistribution
+    computedAt: datetime
+    refresh: str  # cached, stale, incremental или full
+
+# Строка таблицы лидеров курса
+class LeaderboardEntry(BaseModel):
+    rank: int  # студенты с одинаковой суммой делят место
+    userId: str
+    name: str
+    totalScore: int  # сумма баллов за викторины
+    quizzes: int  # глав с пройденной викториной
+
+# Таблица лидеров: страница лучших и место текущего студента
+class Leaderboard(BaseModel):
+    courseId: str
+    students: int  # студентов в рейтинге
+    entries: List[LeaderboardEntry]
+    me: Optional[LeaderboardEntry] = None
+
+# Результат пересборки таблиц лидеров
+class LeaderboardRebuild(BaseModel):
+    courseId: Optional[str] = None
+    students: int
+    durationMs: float
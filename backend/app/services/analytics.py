@@ -0,0 +1,310 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from app.db import models
+
+logger = logging.getLogger(__name__)
+
+HISTOGRAM_BUCKET = 10
+PERCENTILES = (25, 50, 75, 90)
+
+
+class ChapterStats:
+    """Aggregates of one chapter's progress rows"""
+
+    __slots__ = ("completed", "attempts", "scores")
+
+    def __init__(self):
+        self.completed = 0
+        self.attempts = 0
+        # quiz score -> number of rows with that score
+        self.scores: Dict[int, int] = {}
+
+
+class _Entry:
+    __slots__ = ("version", "chapters", "enrollments", "stats", "computed_at", "refreshed_at", "report")
+
+    def __init__(
+        self,
+        version: int,
+        chapters: List[tuple],
+        enrollments: dict,
+        stats: Dict[str, ChapterStats],
+        computed_at: float
+    ):
+        self.version = version
+        self.chapters = chapters
+        self.enrollments = enrollments
+        self.stats = stats
+        # Time of the last full computation; the TTL runs from here
+        self.computed_at = computed_at
+        self.refreshed_at = datetime.now(timezone.utc)
+        self.report: Optional[dict] = None
+
+
+def _load_chapter_stats(db: Session, course_id: str, chapter_ids: Optional[Iterable[str]] = None) -> Dict[str, ChapterStats]:
+    """
+    Per-chapter completion and score counts from one GROUP BY over the
+    course's progress rows (or only the given chapters'). The result has at
+    most chapters x 2 x 101 rows, whatever the number of students.
+    """
+    query = db.query(
+        models.UserProgress.chapter_id,
+        models.UserProgress.completed,
+        models.UserProgress.quiz_score,
+        func.count()
+    ).filter(models.UserProgress.course_id == course_id)
+    if chapter_ids is not None:
+        query = query.filter(models.UserProgress.chapter_id.in_(list(chapter_ids)))
+    query = query.group_by(
+        models.UserProgress.chapter_id, models.UserProgress.completed, models.UserProgress.quiz_score
+    )
+
+    stats: Dict[str, ChapterStats] = {}
+    for chapter_id, completed, quiz_score, count in query:
+        chapter = stats.get(chapter_id)
+        if chapter is None:
+            chapter = stats[chapter_id] = ChapterStats()
+        if completed:
+            chapter.completed += count
+        if quiz_score is not None:
+            chapter.attempts += count
+            chapter.scores[quiz_score] = chapter.scores.get(quiz_score, 0) + count
+    return stats
+
+
+def _load_enrollments(db: Session, course_id: str) -> dict:
+    finished = case(
+        (
+            (models.Enrollment.total_chapters > 0)
+            & (models.Enrollment.completed_chapters >= models.Enrollment.total_chapters),
+            1
+        ),
+        else_=0
+    )
+    progress = case(
+        (
+            models.Enrollment.total_chapters > 0,
+            models.Enrollment.completed_chapters * 100.0 / models.Enrollment.total_chapters
+        ),
+        else_=0
+    )
+    total, completed, average = db.query(
+        func.count(), func.sum(finished), func.avg(progress)
+    ).filter(models.Enrollment.course_id == course_id).one()
+    return {
+        "total": total,
+        "completedCourse": int(completed or 0),
+        "averageProgress": round(float(average or 0), 1)
+    }
+
+
+def _percentile(scores: List[Tuple[int, int]], count: int, percent: int) -> Optional[int]:
+    # Nearest rank over (score, rows) pairs sorted by score
+    if not count:
+        return None
+    rank = max(1, -(-percent * count // 100))
+    seen = 0
+    for score, rows in scores:
+        seen += rows
+        if seen >= rank:
+            return score
+    return scores[-1][0]
+
+
+def _score_summary(counts: Dict[int, int]) -> dict:
+    scores = sorted(counts.items())
+    count = sum(rows for _, rows in scores)
+    histogram = [0] * (100 // HISTOGRAM_BUCKET)
+    for score, rows in scores:
+        histogram[min(max(score, 0) // HISTOGRAM_BUCKET, len(histogram) - 1)] += rows
+    return {
+        "count": count,
+        "mean": round(sum(score * rows for score, rows in scores) / count, 1) if count else None,
+        "histogram": [
+            {
+                "min": index * HISTOGRAM_BUCKET,
+                "max": 100 if index == len(histogram) - 1 else (index + 1) * HISTOGRAM_BUCKET - 1,
+                "count": rows
+            }
+            for index, rows in enumerate(histogram)
+        ],
+        "percentiles": {f"p{percent}": _percentile(scores, count, percent) for percent in PERCENTILES}
+    }
+
+
+def _build_report(course: models.Course, entry: _Entry) -> dict:
+    enrolled = entry.enrollments["total"]
+    funnel = []
+    course_scores: Dict[int, int] = {}
+    for chapter_id, title, order in entry.chapters:
+        stats = entry.stats.get(chapter_id) or ChapterStats()
+        for score, rows in stats.scores.items():
+            course_scores[score] = course_scores.get(score, 0) + rows
+        funnel.append({
+            "chapterId": chapter_id,
+            "title": title,
+            "order": order,
+            "completed": stats.completed,
+            "completionRate": round(stats.completed / enrolled, 4) if enrolled else 0.0,
+            "quizAttempts": stats.attempts,
+            "averageScore": (
+                round(sum(score * rows for score, rows in stats.scores.items()) / stats.attempts, 1)
+                if stats.attempts else None
+            )
+        })
+    return {
+        "courseId": course.id,
+        "title": course.title,
+        "enrollments": entry.enrollments,
+        "funnel": funnel,
+        "quizScores": _score_summary(course_scores),
+        "computedAt": entry.refreshed_at
+    }
+
+
+class CourseAnalytics:
+    """
+    Admin analytics per course (enrollments, chapter completion funnel and
+    quiz score distribution), computed with GROUP BY aggregates and kept
+    for `ttl` seconds.
+
+    Once an entry expires, "auto" still answers from it and recomputes the
+    course in a background thread (one per course at a time), so only the
+    first request for a course, or for a new Course.version, waits for a
+    full computation.
+
+    Progress writes in this worker mark their chapters dirty. An
+    incremental refresh re-aggregates only those chapters plus the
+    enrollment totals; a full refresh (or an expired entry, since other
+    workers' writes are not tracked here) recomputes every chapter. An
+    entry built for another Course.version is always recomputed in full.
+    """
+
+    def __init__(self, ttl: float = 60.0, maxsize: int = 256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.session_factory: Optional[Callable] = None
+        self._entries: Dict[str, _Entry] = {}
+        self._dirty: Dict[str, Set[str]] = {}
+        self._refreshing: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    def _sessions(self) -> Callable:
+        if self.session_factory is None:
+            from app.db.database import SessionLocal
+            self.session_factory = SessionLocal
+        return self.session_factory
+
+    def mark_dirty(self, rows: Iterable[Tuple[str, str]]) -> None:
+        """Record (course_id, chapter_id) pairs whose progress rows changed"""
+        with self._lock:
+            for course_id, chapter_id in rows:
+                if course_id in self._entries:
+                    self._dirty.setdefault(course_id, set()).add(chapter_id)
+
+    def invalidate(self, course_id: str) -> None:
+        with self._lock:
+            self._entries.pop(course_id, None)
+            self._dirty.pop(course_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._dirty.clear()
+
+    def get(self, db: Session, course: models.Course, refresh: str = "auto") -> Tuple[dict, str]:
+        """
+        Analytics report for `course` and how it was produced: "cached",
+        "stale" (expired, being recomputed in the background),
+        "incremental" or "full". `refresh` is "auto" (from the entry while
+        one exists for this version, else full), "incremental" or "full".
+        """
+        with self._lock:
+            entry = self._entries.get(course.id)
+            if entry is not None and entry.version != course.version:
+                entry = None
+            if refresh == "auto" and entry is not None and entry.report is not None:
+                if time.monotonic() - entry.computed_at < self.ttl:
+                    return entry.report, "cached"
+                if course.id not in self._refreshing:
+                    thread = threading.Thread(
+                        target=self._refresh, args=(course.id,), name="analytics-refresh", daemon=True
+                    )
+                    self._refreshing[course.id] = thread
+                    thread.start()
+                return entry.report, "stale"
+            if refresh == "incremental" and entry is not None:
+                dirty = self._dirty.pop(course.id, set())
+            else:
+                self._dirty.pop(course.id, None)
+                entry = dirty = None
+
+        entry = self._compute(db, course, entry, dirty)
+        self._store(course.id, entry)
+        return entry.report, "full" if dirty is None else "incremental"
+
+    def _compute(self, db: Session, course: models.Course, entry: Optional[_Entry], dirty: Optional[Set[str]]) -> _Entry:
+        # Full when `dirty` is None, else `entry` with the dirty chapters re-aggregated
+        chapters = (
+            db.query(models.Chapter.id, models.Chapter.title, models.Chapter.order)
+            .filter(models.Chapter.course_id == course.id)
+            .order_by(models.Chapter.order)
+            .all()
+        )
+        if dirty is None:
+            computed_at = time.monotonic()
+            stats = _load_chapter_stats(db, course.id)
+        else:
+            computed_at = entry.computed_at
+            stats = dict(entry.stats)
+            if dirty:
+                fresh_stats = _load_chapter_stats(db, course.id, dirty)
+                for chapter_id in dirty:
+                    stats[chapter_id] = fresh_stats.get(chapter_id) or ChapterStats()
+        entry = _Entry(
+            course.version,
+            [tuple(chapter) for chapter in chapters],
+            _load_enrollments(db, course.id),
+            stats,
+            computed_at
+        )
+        entry.report = _build_report(course, entry)
+        return entry
+
+    def _store(self, course_id: str, entry: _Entry) -> None:
+        with self._lock:
+            current = self._entries.get(course_id)
+            # A refresh finishing late must not replace a newer version
+            if current is not None and current.version > entry.version:
+                return
+            self._entries[course_id] = entry
+            while len(self._entries) > self.maxsize:
+                oldest = min(self._entries, key=lambda key: self._entries[key].computed_at)
+                self._entries.pop(oldest)
+                self._dirty.pop(oldest, None)
+
+    def _refresh(self, course_id: str) -> None:
+        db = self._sessions()()
+        try:
+            course = db.get(models.Course, course_id)
+            if course is not None and course.deleted_at is None:
+                with self._lock:
+                    self._dirty.pop(course_id, None)
+                self._store(course_id, self._compute(db, course, None, None))
+        except Exception:
+            logger.exception("Background analytics refresh of course %s failed", course_id)
+        finally:
+            db.close()
+            with self._lock:
+                self._refreshing.pop(course_id, None)
+
+
+course_analytics = CourseAnalytics(ttl=float(os.getenv("ANALYTICS_TTL", "60")))
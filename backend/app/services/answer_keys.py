@@ -0,0 +1,135 @@
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.services.grading import quiz_result
+
+# Stands in for unanswered questions; never equal to a correct option
+UNANSWERED = -1
+
+
+class AnswerKey:
+    """
+    Answer key of one chapter: quiz ids in a fixed order and their correct
+    options packed into an int array at the same positions.
+    """
+
+    __slots__ = ("quiz_ids", "correct")
+
+    def __init__(self, quiz_ids: Tuple[str, ...], correct: array):
+        self.quiz_ids = quiz_ids
+        self.correct = correct
+
+    def __len__(self) -> int:
+        return len(self.quiz_ids)
+
+    def grade(self, answers: Dict[str, int]) -> dict:
+        return quiz_result(self.correct_counts([answers])[0], len(self.quiz_ids))
+
+    def correct_counts(self, submissions: List[Dict[str, int]]) -> List[int]:
+        """
+        Correct answers per submission, for many submissions (say, a whole
+        class) scored against this key in one call. The key is unpacked once
+        per call; on CPython a plain loop over it measured faster than
+        map/operator.eq over flattened or per-question columns.
+        """
+        pairs = tuple(zip(self.quiz_ids, self.correct))
+        counts = []
+        for answers in submissions:
+            correct = 0
+            for quiz_id, correct_option in pairs:
+                if answers.get(quiz_id, UNANSWERED) == correct_option:
+                    correct += 1
+            counts.append(correct)
+        return counts
+
+    def grade_many(self, submissions: List[Dict[str, int]]) -> List[dict]:
+        total = len(self.quiz_ids)
+        return [quiz_result(correct, total) for correct in self.correct_counts(submissions)]
+
+
+def load_answer_keys(db: Session, course_id: str) -> Dict[str, AnswerKey]:
+    """Answer keys of every chapter of a course, read with one query"""
+    rows = (
+        db.query(models.Chapter.id, models.Quiz.id, models.Quiz.correct_option)
+        .outerjoin(models.Quiz, models.Quiz.chapter_id == models.Chapter.id)
+        .filter(models.Chapter.course_id == course_id)
+        .order_by(models.Chapter.id, models.Quiz.id)
+    )
+    grouped: Dict[str, Tuple[list, array]] = {}
+    for chapter_id, quiz_id, correct_option in rows:
+        quiz_ids, correct = grouped.setdefault(chapter_id, ([], array("i")))
+        if quiz_id is not None:
+            quiz_ids.append(quiz_id)
+            correct.append(correct_option)
+    return {chapter_id: AnswerKey(tuple(quiz_ids), correct) for chapter_id, (quiz_ids, correct) in grouped.items()}
+
+
+class AnswerKeyIndex:
+    """
+    Bounded LRU of per-course answer keys, so grading a submission needs
+    no quiz query. A course's keys are loaded together on the first
+    submission and remember the Course.version they were built from, like
+    the course structure cache: admin edits invalidate the course here, and
+    a bump made by another worker is a miss on the next lookup.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, db: Session, course_id: str, version: int) -> Dict[str, AnswerKey]:
+        """Answer keys of the course at `version`, keyed by chapter id"""
+        with self._lock:
+            entry = self._entries.get(course_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(course_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        keys = load_answer_keys(db, course_id)
+        if self.maxsize > 0:
+            with self._lock:
+                self._entries[course_id] = (version, keys)
+                self._entries.move_to_end(course_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return keys
+
+    def key(self, db: Session, course_id: str, version: int, chapter_id: str) -> Optional[AnswerKey]:
+        return self.get(db, course_id, version).get(chapter_id)
+
+    def invalidate(self, course_id: str) -> None:
+        with self._lock:
+            if self._entries.pop(course_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "courses": len(self._entries),
+                "chapters": sum(len(keys) for _, keys in self._entries.values()),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hitRatio": self.hits / lookups if lookups else 0.0
+            }
+
+
+answer_keys = AnswerKeyIndex(int(os.getenv("ANSWER_KEY_INDEX_SIZE", "1024")))
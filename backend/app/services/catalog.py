@@ -0,0 +1,348 @@
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.etag import make_etag
+from app.db import models
+from app.services.course_cache import course_cache
+from app.services.progress import progress_percent
+from app.services.progress_buffer import progress_buffer
+
+
+def serialize_quiz(quiz: models.Quiz) -> dict:
+    return {
+        "id": quiz.id,
+        "question": quiz.question,
+        "options": quiz.options,
+        "correctOption": quiz.correct_option
+    }
+
+
+def serialize_chapter(chapter: models.Chapter, completed: bool = False) -> dict:
+    """Chapter metadata; the body is served separately by the chapter endpoint"""
+    return {
+        "id": chapter.id,
+        "title": chapter.title,
+        "quiz": [serialize_quiz(quiz) for quiz in chapter.quizzes],
+        "completed": completed
+    }
+
+
+def serialize_chapter_detail(chapter: models.Chapter) -> dict:
+    """Chapter with its body; content must be loaded (undeferred) by the caller"""
+    return {**serialize_chapter(chapter), "content": chapter.content}
+
+
+def load_enrollments(db: Session, user_id: str, course_ids: Optional[List[str]] = None) -> Dict[str, models.Enrollment]:
+    """The user's enrollments keyed by course id, fetched with a single query"""
+    query = db.query(models.Enrollment).filter(models.Enrollment.user_id == user_id)
+    if course_ids is not None:
+        query = query.filter(models.Enrollment.course_id.in_(course_ids))
+    return {enrollment.course_id: enrollment for enrollment in query}
+
+
+def load_completed_chapter_ids(db: Session, user_id: str, course_ids: Optional[List[str]] = None) -> Set[str]:
+    """
+    Chapter ids the user has completed, fetched with a single query and
+    merged with completions still waiting in the write-behind buffer
+    """
+    query = db.query(models.UserProgress.chapter_id).filter(
+        models.UserProgress.user_id == user_id,
+        models.UserProgress.completed == True
+    )
+    if course_ids is not None:
+        query = query.filter(models.UserProgress.course_id.in_(course_ids))
+    completed = {chapter_id for (chapter_id,) in query}
+    for course_id, chapter_ids in progress_buffer.pending_completed(user_id).items():
+        if course_ids is None or course_id in course_ids:
+            completed |= chapter_ids
+    return completed
+
+
+def build_structure(course: models.Course, chapters: List[models.Chapter]) -> dict:
+    """User-independent part of a course response, suitable for caching"""
+    return {
+        "id": course.id,
+        "title": course.title,
+        "description": course.description,
+        "imageUrl": course.image_url,
+        "enrollmentCode": course.enrollment_code,
+        "chapters": [serialize_chapter(chapter) for chapter in chapters]
+    }
+
+
+# Course trees missing from the cache are loaded this many courses at a time
+STRUCTURE_BATCH_SIZE = 500
+
+
+def _load_chapters(db: Session, course_ids: List[str]) -> Dict[str, List[models.Chapter]]:
+    """
+    Chapters with their quizzes, grouped by course: one chapter query and one
+    quiz query per STRUCTURE_BATCH_SIZE courses, however many chapters they have
+    """
+    grouped = {course_id: [] for course_id in course_ids}
+    for start in range(0, len(course_ids), STRUCTURE_BATCH_SIZE):
+        batch = course_ids[start:start + STRUCTURE_BATCH_SIZE]
+        chapters = (
+            db.query(models.Chapter)
+            .filter(models.Chapter.course_id.in_(batch))
+            .order_by(models.Chapter.course_id, models.Chapter.order)
+            .all()
+        )
+        quizzes = {chapter.id: [] for chapter in chapters}
+        for quiz in (
+            db.query(models.Quiz)
+            .join(models.Chapter, models.Chapter.id == models.Quiz.chapter_id)
+            .filter(models.Chapter.course_id.in_(batch))
+        ):
+            quizzes[quiz.chapter_id].append(quiz)
+        for chapter in chapters:
+            set_committed_value(chapter, "quizzes", quizzes[chapter.id])
+            grouped[chapter.course_id].append(chapter)
+    return grouped
+
+
+def get_structures(db: Session, courses: List[models.Course]) -> Dict[str, dict]:
+    """
+    Course trees for the given courses keyed by id, served from the
+    structure cache when the cached version matches. Misses are loaded
+    together, with one chapter query and one quiz query per
+    STRUCTURE_BATCH_SIZE courses.
+    """
+    structures = {}
+    missing = []
+    for course in courses:
+        structure = course_cache.get(course.id, course.version)
+        if structure is None:
+            missing.append(course)
+        else:
+            structures[course.id] = structure
+
+    if missing:
+        chapters = _load_chapters(db, [course.id for course in missing])
+        for course in missing:
+            structure = build_structure(course, chapters[course.id])
+            course_cache.put(course.id, course.version, structure)
+            structures[course.id] = structure
+
+    return structures
+
+
+def find_chapter(structure: dict, chapter_id: str) -> Optional[dict]:
+    return next((chapter for chapter in structure["chapters"] if chapter["id"] == chapter_id), None)
+
+
+def build_course_response(
+    structure: dict,
+    user: models.User,
+    enrollment: Optional[models.Enrollment],
+    completed_chapter_ids: Set[str],
+    recount: bool = False
+) -> dict:
+    """
+    Merge the per-user state on top of a cached course tree. Progress comes
+    from the enrollment counters unless `recount` asks for it to be derived
+    from the completed flags (the counters lag behind buffered writes).
+    """
+    chapters = [
+        {**chapter, "completed": chapter["id"] in completed_chapter_ids}
+        for chapter in structure["chapters"]
+    ]
+    progress = progress_percent(enrollment)
+    if recount and enrollment is not None and chapters:
+        done = sum(1 for chapter in chapters if chapter["completed"])
+        progress = min(100, int((done / len(chapters)) * 100))
+    return {
+        "id": structure["id"],
+        "title": structure["title"],
+        "description": structure["description"],
+        "imageUrl": structure["imageUrl"],
+        "chapters": chapters,
+        "progress": progress,
+        "enrolled": enrollment is not None,
+        "enrollmentCode": structure["enrollmentCode"] if user.role == "admin" else None
+    }
+
+
+def load_catalog(
+    db: Session,
+    user: models.User,
+    courses: Optional[List[models.Course]] = None,
+    enrollments: Optional[Dict[str, models.Enrollment]] = None
+) -> List[dict]:
+    """
+    Build the full course listing for a user.
+
+    With the structure cache warm the number of statements does not depend
+    on the number of courses or chapters: course rows are fetched with one
+    SELECT, chapter and quiz trees come from the structure cache (misses
+    cost two queries per STRUCTURE_BATCH_SIZE courses), then the user's
+    enrollments and completed chapters are fetched with one query apiece
+    and merged in memory.
+    Callers that already hold the course rows or enrollments (for example
+    to compute an ETag) can pass them in.
+    """
+    if courses is None:
+        courses = db.query(models.Course).filter(models.Course.deleted_at.is_(None)).all()
+    if enrollments is None:
+        enrollments = load_enrollments(db, user.id)
+    structures = get_structures(db, courses)
+    completed_ids = load_completed_chapter_ids(db, user.id)
+    pending = progress_buffer.pending_completed(user.id)
+
+    return [
+        build_course_response(
+            structures[course.id], user, enrollments.get(course.id), completed_ids, course.id in pending
+        )
+        for course in courses
+    ]
+
+
+def load_course(
+    db: Session,
+    course: models.Course,
+    user: models.User,
+    enrollment: Optional[models.Enrollment]
+) -> dict:
+    """Build a single course response for an already fetched course row"""
+    structure = get_structures(db, [course])[course.id]
+    completed_ids = load_completed_chapter_ids(db, user.id, [course.id])
+    recount = course.id in progress_buffer.pending_completed(user.id)
+    return build_course_response(structure, user, enrollment, completed_ids, recount)
+
+
+def _user_state(user: models.User, enrollment: Optional[models.Enrollment], pending: Set[str] = frozenset()) -> tuple:
+    if enrollment is None:
+        return (user.id, user.role, None)
+    return (user.id, user.role, enrollment.completed_chapters, enrollment.total_chapters, sorted(pending))
+
+
+def catalog_etag(
+    user: models.User,
+    courses: List[models.Course],
+    enrollments: Dict[str, models.Enrollment]
+) -> str:
+    """
+    Validator for the course listing. Course trees only change together
+    with Course.version and completed flags only change together with the
+    enrollment counters (or the user's buffered completions), so these
+    determine the whole response.
+    """
+    pending = progress_buffer.pending_completed(user.id)
+    return make_etag(
+        "catalog", user.id, user.role,
+        *(
+            (course.id, course.version, _user_state(user, enrollments.get(course.id), pending.get(course.id, ())))
+            for course in courses
+        )
+    )
+
+
+def course_etag(user: models.User, course: models.Course, enrollment: Optional[models.Enrollment]) -> str:
+    pending = progress_buffer.pending_completed(user.id).get(course.id, ())
+    return make_etag("course", course.id, course.version, _user_state(user, enrollment, pending))
+
+
+def chapter_etag(user: models.User, course: models.Course, chapter_id: str, completed: bool) -> str:
+    return make_etag("chapter", course.id, course.version, chapter_id, user.id, completed)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at: Optional[datetime], course_id: str) -> str:
+    key = [created_at.isoformat() if created_at else None, course_id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], str]:
+    try:
+        created_at, course_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return (datetime.fromisoformat(created_at) if created_at else None), str(course_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+
+
+def load_catalog_page(
+    db: Session,
+    user: models.User,
+    limit: int,
+    cursor: Optional[str] = None,
+    enrolled: bool = False
+) -> dict:
+    """
+    Build one page of course summaries without chapter bodies or quizzes,
+    optionally only of the courses the user is enrolled in.
+
+    Pages are keyed by (created_at, id) and the cursor carries both values
+    of the last course of the previous page, so paging goes on when that
+    course has been deleted since. While the course still exists its
+    created_at is read inside the same statement, which keeps the
+    comparison exact whatever the stored timestamp format.
+    """
+    chapter_count = (
+        db.query(func.count(models.Chapter.id))
+        .filter(models.Chapter.course_id == models.Course.id)
+        .correlate(models.Course)
+        .scalar_subquery()
+    )
+    quiz_count = (
+        db.query(func.count(models.Quiz.id))
+        .join(models.Chapter, models.Quiz.chapter_id == models.Chapter.id)
+        .filter(models.Chapter.course_id == models.Course.id)
+        .correlate(models.Course)
+        .scalar_subquery()
+    )
+
+    query = db.query(models.Course, chapter_count, quiz_count).filter(models.Course.deleted_at.is_(None))
+    if enrolled:
+        query = query.join(
+            models.Enrollment,
+            and_(models.Enrollment.course_id == models.Course.id, models.Enrollment.user_id == user.id)
+        )
+
+    if cursor:
+        created_at, course_id = decode_cursor(cursor)
+        anchor = func.coalesce(
+            db.query(models.Course.created_at)
+            .filter(models.Course.id == course_id)
+            .scalar_subquery(),
+            created_at
+        )
+        query = query.filter(or_(
+            models.Course.created_at > anchor,
+            and_(models.Course.created_at == anchor, models.Course.id > course_id)
+        ))
+
+    rows = query.order_by(models.Course.created_at, models.Course.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    course_ids = [course.id for course, _, _ in rows]
+    enrollments = load_enrollments(db, user.id, course_ids) if course_ids else {}
+
+    items = []
+    for course, chapters, quizzes in rows:
+        enrollment = enrollments.get(course.id)
+        items.append({
+            "id": course.id,
+            "title": course.title,
+            "description": course.description,
+            "imageUrl": course.image_url,
+            "chapterCount": chapters,
+            "quizCount": quizzes,
+            "progress": progress_percent(enrollment),
+            "enrolled": enrollment is not None,
+            "enrollmentCode": course.enrollment_code if user.role == "admin" else None
+        })
+
+    return {
+        "items": items,
+        "nextCursor": encode_cursor(rows[-1][0].created_at, rows[-1][0].id) if has_more else None
+    }
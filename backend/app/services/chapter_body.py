@@ -0,0 +1,101 @@
+import os
+from typing import AsyncIterator, Callable, Optional, Tuple
+
+import orjson
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.db import models
+
+
+class ChapterChanged(RuntimeError):
+    """The chapter was edited or removed while its body was being streamed"""
+
+
+def _guarded(column, chapter_id: str, version: int):
+    # The version guard keeps a stream from mixing two revisions of the same
+    # chapter: once the course moves on, the query finds no row
+    return (
+        select(column)
+        .join(models.Course, models.Course.id == models.Chapter.course_id)
+        .where(models.Chapter.id == chapter_id, models.Course.version == version)
+    )
+
+
+def _slice(chapter_id: str, version: int, start: int, size: int):
+    # substr counts characters on both SQLite and PostgreSQL, so chunks never
+    # split a multi-byte character
+    return _guarded(func.substr(models.Chapter.content, start, size), chapter_id, version)
+
+
+def _escape(text: str) -> bytes:
+    return orjson.dumps(text)[1:-1]
+
+
+class ChapterBodyStreamer:
+    """
+    Serves chapter bodies, which are deferred on the model and left out of
+    the course tree. The first `chunk_size` characters are read together
+    with the length by the request session; bodies that fit are returned in
+    one piece, longer ones are streamed as a JSON document whose "content"
+    string is filled chunk by chunk from its own session, so neither the
+    worker nor the database ever materialises the whole text at once.
+    """
+
+    def __init__(self, chunk_size: int = 65536):
+        self.chunk_size = chunk_size
+        self.session_factory: Optional[Callable] = None
+
+    def _sessions(self) -> Callable:
+        if self.session_factory is None:
+            from app.db.database import AsyncSessionLocal
+            self.session_factory = AsyncSessionLocal
+        return self.session_factory
+
+    def head(self, db: Session, chapter_id: str, version: int) -> Optional[Tuple[int, str]]:
+        """(length in characters, first chunk) of the chapter body, None if it is gone"""
+        row = db.execute(
+            _slice(chapter_id, version, 1, self.chunk_size).add_columns(func.length(models.Chapter.content))
+        ).first()
+        if row is None:
+            return None
+        return row[1], row[0]
+
+    async def stream(
+        self,
+        metadata: dict,
+        chapter_id: str,
+        version: int,
+        first_chunk: str,
+        length: int
+    ) -> AsyncIterator[bytes]:
+        """
+        `metadata` serialised as JSON with the body appended as "content", in
+        chunks. Raises ChapterChanged if the chapter no longer matches
+        `version` and `length`, both before the first byte and mid-stream;
+        the response has already started by then, so the server aborts the
+        connection instead of finishing a 200 with a mixed or truncated body.
+        """
+        async with self._sessions()() as session:
+            current = (await session.execute(
+                _guarded(func.length(models.Chapter.content), chapter_id, version)
+            )).scalar()
+            if current != length:
+                raise ChapterChanged(chapter_id)
+
+            yield orjson.dumps(metadata)[:-1] + b',"content":"'
+            yield _escape(first_chunk)
+            start = len(first_chunk) + 1
+            while start <= length:
+                chunk = (await session.execute(_slice(chapter_id, version, start, self.chunk_size))).scalar()
+                # None: the version moved on; empty: the body got shorter
+                if not chunk:
+                    raise ChapterChanged(chapter_id)
+                yield _escape(chunk)
+                start += len(chunk)
+            if start != length + 1:
+                raise ChapterChanged(chapter_id)
+        yield b'"}'
+
+
+chapter_body = ChapterBodyStreamer(chunk_size=int(os.getenv("CHAPTER_CHUNK_SIZE", "65536")))
@@ -0,0 +1,135 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+
+class CourseStructureCache:
+    """
+    Bounded LRU cache of pre-serialized course trees (course fields, chapters
+    and quizzes) keyed by course id.
+
+    Every entry remembers the Course.version it was built from; a lookup with
+    a different version is a miss, so a bump made by another worker process
+    is picked up on the next read even without an explicit invalidation.
+    Cached values are shared between requests and must not be mutated.
+
+    Next to the trees it keeps compressed shared response bodies for a course
+    (see CompressionMiddleware), keyed by the digest of the uncompressed
+    body and the encoding, within a budget of `encoded_bytes`. They are
+    dropped together with their course's tree.
+    """
+
+    def __init__(self, maxsize: int = 512, encoded_bytes: int = 32 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.encoded_bytes = encoded_bytes
+        self._entries = OrderedDict()
+        self._encoded: "OrderedDict[Tuple[str, str, str], bytes]" = OrderedDict()
+        self._encoded_keys: Dict[str, Set[Tuple[str, str, str]]] = {}
+        self._encoded_size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.encoded_hits = 0
+        self.encoded_misses = 0
+
+    def get(self, course_id: str, version: int) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(course_id)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(course_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, course_id: str, version: int, structure: dict) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            previous = self._entries.get(course_id)
+            if previous is not None and previous[0] != version:
+                self._drop_encoded(course_id)
+            self._entries[course_id] = (version, structure)
+            self._entries.move_to_end(course_id)
+            while len(self._entries) > self.maxsize:
+                evicted, _ = self._entries.popitem(last=False)
+                self._drop_encoded(evicted)
+                self.evictions += 1
+
+    def invalidate(self, course_id: str) -> None:
+        with self._lock:
+            self._drop_encoded(course_id)
+            if self._entries.pop(course_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._encoded.clear()
+            self._encoded_keys.clear()
+            self._encoded_size = 0
+
+    def get_encoded(self, course_id: str, digest: str, encoding: str) -> Optional[bytes]:
+        key = (course_id, digest, encoding)
+        with self._lock:
+            data = self._encoded.get(key)
+            if data is None:
+                self.encoded_misses += 1
+                return None
+            self._encoded.move_to_end(key)
+            self.encoded_hits += 1
+            return data
+
+    def put_encoded(self, course_id: str, digest: str, encoding: str, data: bytes) -> None:
+        if len(data) > self.encoded_bytes:
+            return
+        key = (course_id, digest, encoding)
+        with self._lock:
+            if key in self._encoded:
+                return
+            self._encoded[key] = data
+            self._encoded_keys.setdefault(course_id, set()).add(key)
+            self._encoded_size += len(data)
+            while self._encoded_size > self.encoded_bytes:
+                oldest, _ = next(iter(self._encoded.items()))
+                self._remove_encoded(oldest)
+
+    def _remove_encoded(self, key: Tuple[str, str, str]) -> None:
+        self._encoded_size -= len(self._encoded.pop(key))
+        keys = self._encoded_keys[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._encoded_keys[key[0]]
+
+    def _drop_encoded(self, course_id: str) -> None:
+        for key in list(self._encoded_keys.get(course_id, ())):
+            self._remove_encoded(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hitRatio": self.hits / lookups if lookups else 0.0,
+                "encoded": {
+                    "entries": len(self._encoded),
+                    "bytes": self._encoded_size,
+                    "maxBytes": self.encoded_bytes,
+                    "hits": self.encoded_hits,
+                    "misses": self.encoded_misses
+                }
+            }
+
+
+course_cache = CourseStructureCache(
+    int(os.getenv("COURSE_CACHE_SIZE", "512")),
+    int(os.getenv("COURSE_CACHE_ENCODED_BYTES", str(32 * 1024 * 1024)))
+)
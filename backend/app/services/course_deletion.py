@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import delete, func, select
+
+from app.db import models
+
+logger = logging.getLogger(__name__)
+
+# Tables are emptied in this order so no step leaves dangling foreign keys
+_STEPS = ("leaderboard", "progress", "enrollments", "quizzes", "chapters")
+
+
+def _chunk(step: str, course_id: str, size: int):
+    if step == "leaderboard":
+        ids = select(models.LeaderboardEntry.user_id).where(models.LeaderboardEntry.course_id == course_id)
+        return delete(models.LeaderboardEntry).where(
+            models.LeaderboardEntry.course_id == course_id,
+            models.LeaderboardEntry.user_id.in_(ids.limit(size).scalar_subquery())
+        )
+    if step == "progress":
+        ids = select(models.UserProgress.id).where(models.UserProgress.course_id == course_id)
+        return delete(models.UserProgress).where(models.UserProgress.id.in_(ids.limit(size).scalar_subquery()))
+    if step == "enrollments":
+        ids = select(models.Enrollment.id).where(models.Enrollment.course_id == course_id)
+        return delete(models.Enrollment).where(models.Enrollment.id.in_(ids.limit(size).scalar_subquery()))
+    if step == "quizzes":
+        ids = (
+            select(models.Quiz.id)
+            .join(models.Chapter, models.Chapter.id == models.Quiz.chapter_id)
+            .where(models.Chapter.course_id == course_id)
+        )
+        return delete(models.Quiz).where(models.Quiz.id.in_(ids.limit(size).scalar_subquery()))
+    ids = select(models.Chapter.id).where(models.Chapter.course_id == course_id)
+    return delete(models.Chapter).where(models.Chapter.id.in_(ids.limit(size).scalar_subquery()))
+
+
+def serialize_job(job: models.CourseDeletionJob) -> dict:
+    return {
+        "id": job.id,
+        "courseId": job.course_id,
+        "courseTitle": job.course_title,
+        "status": job.status,
+        "deleted": job.deleted or {},
+        "error": job.error,
+        "createdAt": job.created_at,
+        "updatedAt": job.updated_at,
+        "finishedAt": job.finished_at
+    }
+
+
+class CourseDeleter:
+    """
+    Removes a hidden course and everything that hangs off it in the
+    background: progress, enrollments, quizzes and chapters are deleted
+    `chunk_size` rows per statement, each chunk in its own short
+    transaction, and the job row records how far it got. Every step is
+    idempotent, so a failed or abandoned job can simply be run again.
+    """
+
+    def __init__(self, chunk_size: int = 1000, stale_after: int = 300):
+        self.chunk_size = chunk_size
+        self.stale_after = stale_after
+        self.session_factory: Optional[Callable] = None
+
+    def _sessions(self) -> Callable:
+        if self.session_factory is None:
+            from app.db.database import SessionLocal
+            self.session_factory = SessionLocal
+        return self.session_factory
+
+    def needs_restart(self, job: models.CourseDeletionJob) -> bool:
+        """Failed jobs and jobs that stopped reporting progress are picked up again"""
+        if job.status == "failed":
+            return True
+        if job.status == "completed" or job.updated_at is None:
+            return False
+        updated_at = job.updated_at
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - updated_at > timedelta(seconds=self.stale_after)
+
+    def resume(self) -> list:
+        """
+        Runs the jobs a stopped process left pending or running; returns their
+        ids. Starting workers may all pick up the same job, which is safe
+        because every step is idempotent.
+        """
+        db = self._sessions()()
+        try:
+            job_ids = list(db.scalars(
+                select(models.CourseDeletionJob.id)
+                .where(models.CourseDeletionJob.status.in_(("pending", "running")))
+                .order_by(models.CourseDeletionJob.created_at)
+            ))
+        finally:
+            db.close()
+        for job_id in job_ids:
+            logger.info("Resuming course deletion job %s", job_id)
+            self.run(job_id)
+        return job_ids
+
+    def start(self) -> None:
+        """Resumes unfinished jobs in a background thread, so startup does not wait for them"""
+        threading.Thread(target=self.resume, name="course-deletion-resume", daemon=True).start()
+
+    def run(self, job_id: str) -> None:
+        db = self._sessions()()
+        try:
+            job = db.get(models.CourseDeletionJob, job_id)
+            if job is None or job.status == "completed":
+                return
+            job.status = "running"
+            job.error = None
+            db.commit()
+
+            try:
+                deleted = dict.fromkeys(_STEPS, 0)
+                deleted.update(job.deleted or {})
+                for step in _STEPS:
+                    while True:
+                        removed = db.execute(
+                            _chunk(step, job.course_id, self.chunk_size),
+                            execution_options={"synchronize_session": False}
+                        ).rowcount
+                        deleted[step] += removed
+                        job.deleted = dict(deleted)
+                        job.updated_at = func.now()
+                        db.commit()
+                        if removed < self.chunk_size:
+                            break
+
+                db.execute(
+                    delete(models.Course).where(models.Course.id == job.course_id),
+                    execution_options={"synchronize_session": False}
+                )
+                job.status = "completed"
+                job.finished_at = func.now()
+                db.commit()
+            except Exception as exc:
+                db.rollback()
+                logger.exception("Course deletion job %s failed", job_id)
+                job.status = "failed"
+                job.error = str(exc)
+                db.commit()
+        finally:
+            db.close()
+
+
+course_deleter = CourseDeleter(
+    chunk_size=int(os.getenv("COURSE_DELETE_CHUNK_SIZE", "1000")),
+    stale_after=int(os.getenv("COURSE_DELETE_STALE_AFTER", "300"))
+)
@@ -0,0 +1,142 @@
+from typing import AsyncIterable, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.schemas import course as course_schema
+
+DEFAULT_BATCH_SIZE = 200
+
+
+def _describe(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'line'}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]):
+    """Split a byte stream into lines without reading it all into memory"""
+    # Pieces of the unfinished line; only each new chunk is split, so a long
+    # line costs linear time however many reads it spans
+    pending = []
+    async for chunk in chunks:
+        *lines, tail = chunk.split(b"\n")
+        if lines:
+            pending.append(lines[0])
+            lines[0] = b"".join(pending)
+            pending = []
+            for line in lines:
+                yield line
+        if tail:
+            pending.append(tail)
+    if pending:
+        yield b"".join(pending)
+
+
+class CourseImport:
+    """
+    Bulk import of NDJSON courses, one CourseCreate per line.
+
+    Lines are validated as they are fed in and valid courses are collected
+    into batches of `batch_size`. Ids are generated here, so a batch is
+    written with one executemany INSERT per table and no flushes in
+    between. Each batch commits on its own; if it fails, every line in it
+    is reported as failed and the import goes on with the next batch.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.results = []
+        self._batch: List[Tuple[int, course_schema.CourseCreate]] = []
+        self._line = 0
+
+    def feed(self, raw) -> Optional[List[Tuple[int, course_schema.CourseCreate]]]:
+        """Parse one line; returns a batch once it is full"""
+        self._line += 1
+        if not raw.strip():
+            return None
+        try:
+            course = course_schema.CourseCreate.model_validate_json(raw)
+        except ValidationError as exc:
+            self.results.append({"line": self._line, "status": "error", "error": _describe(exc)})
+            return None
+        self._batch.append((self._line, course))
+        if len(self._batch) >= self.batch_size:
+            return self.take()
+        return None
+
+    def take(self) -> List[Tuple[int, course_schema.CourseCreate]]:
+        batch, self._batch = self._batch, []
+        return batch
+
+    def insert(self, db: Session, batch: List[Tuple[int, course_schema.CourseCreate]]) -> None:
+        if not batch:
+            return
+        course_rows, chapter_rows, quiz_rows = [], [], []
+        for _, course in batch:
+            course_id = models.generate_uuid()
+            course_rows.append({
+                "id": course_id,
+                "title": course.title,
+                "description": course.description,
+                "image_url": course.imageUrl,
+                "enrollment_code": models.generate_enrollment_code(),
+                "version": 1
+            })
+            for order, chapter in enumerate(course.chapters):
+                chapter_id = models.generate_uuid()
+                chapter_rows.append({
+                    "id": chapter_id,
+                    "course_id": course_id,
+                    "title": chapter.title,
+                    "content": chapter.content,
+                    "order": order
+                })
+                quiz_rows.extend(
+                    {
+                        "id": models.generate_uuid(),
+                        "chapter_id": chapter_id,
+                        "question": quiz.question,
+                        "options": quiz.options,
+                        "correct_option": quiz.correctOption
+                    }
+                    for quiz in chapter.quiz
+                )
+
+        try:
+            db.execute(insert(models.Course), course_rows)
+            if chapter_rows:
+                db.execute(insert(models.Chapter), chapter_rows)
+            if quiz_rows:
+                db.execute(insert(models.Quiz), quiz_rows)
+            db.commit()
+        except SQLAlchemyError as exc:
+            db.rollback()
+            error = str(getattr(exc, "orig", None) or exc)
+            self.results.extend({"line": line, "status": "error", "error": error} for line, _ in batch)
+            return
+
+        self.results.extend(
+            {"line": line, "status": "created", "id": row["id"]}
+            for (line, _), row in zip(batch, course_rows)
+        )
+
+    def report(self) -> dict:
+        results = sorted(self.results, key=lambda result: result["line"])
+        created = sum(1 for result in results if result["status"] == "created")
+        return {"created": created, "failed": len(results) - created, "results": results}
+
+
+def import_lines(db: Session, lines, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """Synchronous import of an iterable of NDJSON lines, used by the CLI"""
+    course_import = CourseImport(batch_size)
+    for line in lines:
+        batch = course_import.feed(line)
+        if batch:
+            course_import.insert(db, batch)
+    course_import.insert(db, course_import.take())
+    return course_import.report()
@@ -0,0 +1,164 @@
+from typing import Dict, List
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.schemas import course as course_schema
+from app.services.leaderboard import rebuild_leaderboard_totals
+from app.services.progress import refresh_enrollment_counters
+
+_COURSE_FIELDS = (("title", "title"), ("description", "description"), ("image_url", "imageUrl"))
+_QUIZ_FIELDS = (("question", "question"), ("options", "options"), ("correct_option", "correctOption"))
+
+
+def _changed(row, payload, fields) -> dict:
+    return {
+        column: getattr(payload, attribute)
+        for column, attribute in fields
+        if getattr(row, column) != getattr(payload, attribute)
+    }
+
+
+def _new_quiz(chapter_id: str, quiz: course_schema.QuizCreate) -> dict:
+    return {
+        "id": models.generate_uuid(),
+        "chapter_id": chapter_id,
+        "question": quiz.question,
+        "options": quiz.options,
+        "correct_option": quiz.correctOption
+    }
+
+
+def apply_course_update(db: Session, course: models.Course, payload: course_schema.CourseUpdate) -> dict:
+    """
+    Bring the stored course tree in line with `payload` using as few
+    statements as possible and return a summary of what changed.
+
+    The stored chapters and quizzes are read as plain rows (two queries)
+    and compared with the payload. Chapters and quizzes are matched by id
+    within their parent; unknown ids are treated as new. Only changed
+    columns are updated, new rows are inserted with one executemany per
+    table, and removed chapters, their quizzes and progress as well as
+    quizzes dropped from a kept chapter are deleted in bulk. The course
+    version is bumped only when something changed, and the leaderboard
+    totals are rebuilt whenever progress or quizzes were deleted. Does not
+    commit.
+    """
+    chapters = {
+        row.id: row for row in db.query(
+            models.Chapter.id, models.Chapter.title, models.Chapter.content, models.Chapter.order
+        ).filter(models.Chapter.course_id == course.id)
+    }
+    quizzes: Dict[str, Dict[str, object]] = {chapter_id: {} for chapter_id in chapters}
+    if chapters:
+        for row in db.query(
+            models.Quiz.id, models.Quiz.chapter_id, models.Quiz.question,
+            models.Quiz.options, models.Quiz.correct_option
+        ).filter(models.Quiz.chapter_id.in_(list(chapters))):
+            quizzes[row.chapter_id][row.id] = row
+
+    chapter_inserts: List[dict] = []
+    chapter_updates: List[dict] = []
+    quiz_inserts: List[dict] = []
+    quiz_updates: List[dict] = []
+    removed_quizzes: List[str] = []
+    kept = set()
+
+    for order, chapter_data in enumerate(payload.chapters):
+        stored = chapters.get(chapter_data.id)
+        if stored is None or chapter_data.id in kept:
+            chapter_id = models.generate_uuid()
+            chapter_inserts.append({
+                "id": chapter_id,
+                "course_id": course.id,
+                "title": chapter_data.title,
+                "content": chapter_data.content,
+                "order": order
+            })
+            quiz_inserts.extend(_new_quiz(chapter_id, quiz) for quiz in chapter_data.quiz)
+            continue
+
+        kept.add(stored.id)
+        values = {
+            column: value for column, value in (
+                ("title", chapter_data.title), ("content", chapter_data.content), ("order", order)
+            ) if getattr(stored, column) != value
+        }
+        if values:
+            chapter_updates.append({"id": stored.id, **values})
+
+        stored_quizzes = quizzes[stored.id]
+        seen = set()
+        for quiz_data in chapter_data.quiz:
+            stored_quiz = stored_quizzes.get(quiz_data.id)
+            if stored_quiz is None or quiz_data.id in seen:
+                quiz_inserts.append(_new_quiz(stored.id, quiz_data))
+                continue
+            seen.add(stored_quiz.id)
+            values = _changed(stored_quiz, quiz_data, _QUIZ_FIELDS)
+            if values:
+                quiz_updates.append({"id": stored_quiz.id, **values})
+        removed_quizzes.extend(quiz_id for quiz_id in stored_quizzes if quiz_id not in seen)
+
+    removed_chapters = [chapter_id for chapter_id in chapters if chapter_id not in kept]
+    removed_quizzes.extend(quiz_id for chapter_id in removed_chapters for quiz_id in quizzes[chapter_id])
+    course_values = _changed(course, payload, _COURSE_FIELDS)
+
+    progress_deleted = 0
+    if removed_chapters:
+        progress_deleted = db.execute(
+            delete(models.UserProgress).where(models.UserProgress.chapter_id.in_(removed_chapters)),
+            execution_options={"synchronize_session": False}
+        ).rowcount
+    if removed_quizzes:
+        db.execute(
+            delete(models.Quiz).where(models.Quiz.id.in_(removed_quizzes)),
+            execution_options={"synchronize_session": False}
+        )
+    if removed_chapters:
+        db.execute(
+            delete(models.Chapter).where(models.Chapter.id.in_(removed_chapters)),
+            execution_options={"synchronize_session": False}
+        )
+    if chapter_updates:
+        db.execute(update(models.Chapter), chapter_updates)
+    if quiz_updates:
+        db.execute(update(models.Quiz), quiz_updates)
+    if chapter_inserts:
+        db.execute(insert(models.Chapter), chapter_inserts)
+    if quiz_inserts:
+        db.execute(insert(models.Quiz), quiz_inserts)
+
+    changed = bool(
+        course_values or chapter_inserts or chapter_updates or removed_chapters
+        or quiz_inserts or quiz_updates or removed_quizzes
+    )
+    if changed:
+        db.execute(
+            update(models.Course)
+            .where(models.Course.id == course.id)
+            .values(version=models.Course.version + 1, **course_values),
+            execution_options={"synchronize_session": False}
+        )
+        db.expire(course)
+    if chapter_inserts or removed_chapters:
+        refresh_enrollment_counters(db, course.id)
+    if progress_deleted or removed_quizzes:
+        rebuild_leaderboard_totals(db, course.id)
+
+    return {
+        "changed": changed,
+        "course": sorted(attribute for column, attribute in _COURSE_FIELDS if column in course_values),
+        "chapters": {
+            "created": len(chapter_inserts),
+            "updated": len(chapter_updates),
+            "deleted": len(removed_chapters)
+        },
+        "quizzes": {
+            "created": len(quiz_inserts),
+            "updated": len(quiz_updates),
+            "deleted": len(removed_quizzes)
+        },
+        "progressDeleted": progress_deleted
+    }
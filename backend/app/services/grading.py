@@ -0,0 +1,33 @@
+from typing import Dict, Iterable, Tuple
+
+PASSING_SCORE = 70  # 70% is passing score
+
+
+def grade(answer_key: Iterable[Tuple[str, int]], answers: Dict[str, int]) -> dict:
+    """
+    Grade one chapter's submission against its (quiz_id, correct_option)
+    pairs and return a QuizResult-shaped dict.
+
+    Reference implementation: request handlers grade through the cached
+    AnswerKey (app.services.answer_keys), whose grade, grade_many and
+    correct_counts must score exactly like this; the tests and
+    benchmarks/grading.py check them against it.
+    """
+    total_questions = 0
+    correct_answers = 0
+    for quiz_id, correct_option in answer_key:
+        total_questions += 1
+        if quiz_id in answers and answers[quiz_id] == correct_option:
+            correct_answers += 1
+
+    return quiz_result(correct_answers, total_questions)
+
+
+def quiz_result(correct_answers: int, total_questions: int) -> dict:
+    score = int((correct_answers / total_questions) * 100) if total_questions > 0 else 0
+    return {
+        "score": score,
+        "passed": score >= PASSING_SCORE,
+        "correctAnswers": correct_answers,
+        "totalQuestions": total_questions
+    }
@@ -0,0 +1,482 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, text, tuple_
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.database import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for the Postgres advisory lock serializing leaderboard rebuilds
+REBUILD_LOCK_KEY = 72_315_002
+
+
+class SortedKeys:
+    """
+    Sorted list kept as sublists of up to 2 * `load` keys, with a Fenwick
+    tree over the sublist lengths. Adding or removing a key shifts one
+    sublist and updates O(log n) tree nodes; the position of a key and the
+    key at a position are found with binary searches, so a rank or the
+    start of a page costs O(log n) at any size.
+    """
+
+    def __init__(self, keys: Iterable = (), load: int = 512):
+        self.load = load
+        self._lists: List[list] = []
+        self._maxes: list = []
+        self._tree: List[int] = [0]
+        self._len = 0
+        keys = sorted(keys)
+        if keys:
+            self._lists = [keys[start:start + load] for start in range(0, len(keys), load)]
+            self._maxes = [sublist[-1] for sublist in self._lists]
+            self._len = len(keys)
+            self._reindex()
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self):
+        for sublist in self._lists:
+            yield from sublist
+
+    def _reindex(self) -> None:
+        tree = [0] + [len(sublist) for sublist in self._lists]
+        for index in range(1, len(tree)):
+            parent = index + (index & -index)
+            if parent < len(tree):
+                tree[parent] += tree[index]
+        self._tree = tree
+
+    def _grow(self, index: int, delta: int) -> None:
+        index += 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def _prefix(self, index: int) -> int:
+        # Keys in the sublists before `index`
+        total = 0
+        while index:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def _locate(self, position: int) -> Tuple[int, int]:
+        # (sublist, offset) of the key at `position`
+        index = 0
+        bit = 1 << (len(self._tree) - 1).bit_length()
+        while bit:
+            candidate = index + bit
+            if candidate < len(self._tree) and self._tree[candidate] <= position:
+                index = candidate
+                position -= self._tree[candidate]
+            bit >>= 1
+        return index, position
+
+    def add(self, key) -> None:
+        if not self._lists:
+            self._lists, self._maxes, self._tree, self._len = [[key]], [key], [0, 1], 1
+            return
+        index = bisect_left(self._maxes, key)
+        if index == len(self._maxes):
+            index -= 1
+            self._lists[index].append(key)
+            self._maxes[index] = key
+        else:
+            insort(self._lists[index], key)
+        self._len += 1
+
+        sublist = self._lists[index]
+        if len(sublist) > 2 * self.load:
+            self._lists[index:index + 1] = [sublist[:self.load], sublist[self.load:]]
+            self._maxes[index:index + 1] = [sublist[self.load - 1], sublist[-1]]
+            self._reindex()
+        else:
+            self._grow(index, 1)
+
+    def remove(self, key) -> None:
+        """Remove one occurrence of `key`; ValueError if it is not there"""
+        index = bisect_left(self._maxes, key)
+        if index == len(self._maxes):
+            raise ValueError(f"{key!r} not in list")
+        sublist = self._lists[index]
+        offset = bisect_left(sublist, key)
+        if sublist[offset] != key:
+            raise ValueError(f"{key!r} not in list")
+        del sublist[offset]
+        self._len -= 1
+        if sublist:
+            self._maxes[index] = sublist[-1]
+            self._grow(index, -1)
+        else:
+            del self._lists[index]
+            del self._maxes[index]
+            self._reindex()
+
+    def position(self, key) -> int:
+        """Number of keys smaller than `key`"""
+        index = bisect_left(self._maxes, key)
+        if index == len(self._maxes):
+            return self._len
+        return self._prefix(index) + bisect_left(self._lists[index], key)
+
+    def page(self, start: int, count: int) -> list:
+        """Up to `count` keys from position `start` on"""
+        keys = []
+        if start >= self._len or count <= 0:
+            return keys
+        index, offset = self._locate(start)
+        while index < len(self._lists) and len(keys) < count:
+            keys.extend(self._lists[index][offset:offset + count - len(keys)])
+            index += 1
+            offset = 0
+        return keys
+
+
+class _Board:
+    """Leaderboard of one course: totals per student and their ranking keys"""
+
+    __slots__ = ("totals", "keys", "loaded_at", "synced_to")
+
+    def __init__(self, rows: Iterable[Tuple[str, int, int, object]], loaded_at: float):
+        # user_id -> (total_score, quizzes)
+        self.totals: Dict[str, Tuple[int, int]] = {}
+        # Latest course_leaderboard.updated_at read so far (database time)
+        self.synced_to = None
+        for user_id, total_score, quizzes, updated_at in rows:
+            self.totals[user_id] = (total_score, quizzes)
+            self._seen(updated_at)
+        # (-total_score, user_id): ascending order is rank order
+        self.keys = SortedKeys((-total_score, user_id) for user_id, (total_score, _) in self.totals.items())
+        self.loaded_at = loaded_at
+
+    def _seen(self, updated_at) -> None:
+        if updated_at is not None and (self.synced_to is None or updated_at > self.synced_to):
+            self.synced_to = updated_at
+
+    def sync(self, rows: Iterable[Tuple[str, int, int, object]], synced_at: float) -> None:
+        """Apply stored rows changed since the last load or sync"""
+        for user_id, total_score, quizzes, updated_at in rows:
+            self.set(user_id, total_score, quizzes)
+            self._seen(updated_at)
+        self.loaded_at = synced_at
+
+    def set(self, user_id: str, total_score: int, quizzes: int) -> None:
+        previous = self.totals.get(user_id)
+        if previous is None or previous[0] != total_score:
+            if previous is not None:
+                self.keys.remove((-previous[0], user_id))
+            self.keys.add((-total_score, user_id))
+        self.totals[user_id] = (total_score, quizzes)
+
+    def rank(self, total_score: int) -> int:
+        # Students with the same total share a rank
+        return self.keys.position((-total_score,)) + 1
+
+
+_COLUMNS = ["course_id", "user_id", "total_score", "quizzes"]
+
+
+def _totals(*criteria):
+    """Total quiz score of every (course, student) matching `criteria`, from user_progress"""
+    progress = models.UserProgress
+    return (
+        select(
+            progress.course_id,
+            progress.user_id,
+            func.sum(progress.quiz_score),
+            func.count(progress.quiz_score)
+        )
+        .where(progress.quiz_score.isnot(None), *criteria)
+        .group_by(progress.course_id, progress.user_id)
+    )
+
+
+def _upsert_totals(db: Session, *criteria):
+    """
+    INSERT ... SELECT ... ON CONFLICT DO UPDATE writing the totals matching
+    `criteria` into course_leaderboard, or None on databases without
+    ON CONFLICT
+    """
+    insert_ = dialect_insert(db)
+    if insert_ is None:
+        return None
+    table = models.LeaderboardEntry.__table__
+    stmt = insert_(table).from_select(_COLUMNS, _totals(*criteria))
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.course_id, table.c.user_id],
+        set_={
+            "total_score": stmt.excluded.total_score,
+            "quizzes": stmt.excluded.quizzes,
+            "updated_at": func.now()
+        }
+    )
+
+
+def refresh_leaderboard_totals(db: Session, pairs: Iterable[Tuple[str, str]]) -> list:
+    """
+    Recompute the leaderboard totals of many (user_id, course_id) pairs in
+    the current transaction. Call this after writing quiz scores, before
+    committing, and pass the returned rows to Leaderboards.apply after it.
+    """
+    pairs = list(set(pairs))
+    if not pairs:
+        return []
+    table = models.LeaderboardEntry.__table__
+    columns = (table.c.course_id, table.c.user_id, table.c.total_score, table.c.quizzes)
+    criterion = tuple_(models.UserProgress.user_id, models.UserProgress.course_id).in_(pairs)
+    stmt = _upsert_totals(db, criterion)
+    if stmt is not None:
+        return db.execute(stmt.returning(*columns)).all()
+
+    # Without ON CONFLICT the pairs' rows are replaced. Not atomic: a
+    # concurrent refresh of the same pair fails on the primary key.
+    stored = tuple_(table.c.user_id, table.c.course_id).in_(pairs)
+    db.execute(delete(table).where(stored))
+    db.execute(insert(table).from_select(_COLUMNS, _totals(criterion)))
+    return db.execute(select(*columns).where(stored)).all()
+
+
+def rebuild_leaderboard_totals(db: Session, course_id: Optional[str] = None) -> int:
+    """
+    Replace the leaderboard totals of one course (or every course) with
+    totals aggregated from user_progress, in the current transaction.
+    Returns the number of students ranked.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        # Workers rebuilding at startup take turns
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": REBUILD_LOCK_KEY})
+    stmt = delete(models.LeaderboardEntry)
+    criteria = ()
+    if course_id is not None:
+        stmt = stmt.where(models.LeaderboardEntry.course_id == course_id)
+        criteria = (models.UserProgress.course_id == course_id,)
+    db.execute(stmt, execution_options={"synchronize_session": False})
+    # The upsert merges with totals a concurrent quiz submission wrote after
+    # the delete; a plain insert is the fallback without ON CONFLICT
+    upsert = _upsert_totals(db, *criteria)
+    if upsert is None:
+        upsert = insert(models.LeaderboardEntry.__table__).from_select(_COLUMNS, _totals(*criteria))
+    return db.execute(upsert).rowcount
+
+
+class Leaderboards:
+    """
+    Per-course leaderboards of students by total quiz score.
+
+    The totals live in course_leaderboard, which save_progress keeps
+    current in the same transaction as the quiz scores, so the table can
+    always rebuild the in-memory boards. A course's board is loaded from it
+    on first use and then updated in place with the totals this worker
+    writes. Writes made by other workers only reach the board through the
+    table, so once a board is `ttl` seconds old it is synced: only the rows
+    whose updated_at is at or after the latest one the board has seen,
+    less `sync_margin` seconds for transactions that committed late, are
+    read and applied to the sorted keys. A row count that disagrees with
+    the board afterwards means rows were deleted (a rebuild), and the board
+    is loaded in full instead. While one request syncs or loads a board the
+    current one keeps serving, and totals written meanwhile are replayed
+    onto the result. Pages of the top students and a student's own rank are
+    binary searches over the board's sorted keys.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 30.0,
+        maxsize: int = 256,
+        rebuild_on_startup: bool = False,
+        sync_margin: float = 60.0
+    ):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.rebuild_on_startup = rebuild_on_startup
+        self.sync_margin = sync_margin
+        self.session_factory: Optional[Callable] = None
+        self._boards: Dict[str, _Board] = {}
+        # course_id -> totals applied during each load in progress
+        self._loading: Dict[str, List[list]] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.syncs = 0
+        self.updates = 0
+        self.rebuilds = 0
+
+    def _sessions(self) -> Callable:
+        if self.session_factory is None:
+            from app.db.database import SessionLocal
+            self.session_factory = SessionLocal
+        return self.session_factory
+
+    def _board(self, db: Session, course_id: str) -> _Board:
+        with self._lock:
+            board = self._boards.get(course_id)
+            if board is not None and (
+                time.monotonic() - board.loaded_at < self.ttl or course_id in self._loading
+            ):
+                return board
+            applied = []
+            self._loading.setdefault(course_id, []).append(applied)
+
+        entry = models.LeaderboardEntry
+        query = db.query(entry.user_id, entry.total_score, entry.quizzes, entry.updated_at).filter(
+            entry.course_id == course_id
+        )
+        try:
+            loaded_at = time.monotonic()
+            if board is None:
+                board = _Board(query.all(), loaded_at)
+                synced = None
+            else:
+                stored = db.query(func.count()).filter(entry.course_id == course_id).scalar()
+                if board.synced_to is not None:
+                    query = query.filter(entry.updated_at >= board.synced_to - timedelta(seconds=self.sync_margin))
+                synced = query.all()
+        finally:
+            with self._lock:
+                loads = self._loading.get(course_id, [])
+                # Gone when the course was invalidated meanwhile
+                registered = any(load is applied for load in loads)
+                loads[:] = [load for load in loads if load is not applied]
+                if not loads:
+                    self._loading.pop(course_id, None)
+
+        if synced is not None:
+            with self._lock:
+                if self._boards.get(course_id) is board:
+                    board.sync(synced, loaded_at)
+                    for row in applied:
+                        board.set(*row)
+                    self.syncs += 1
+                    if len(board.totals) == stored:
+                        return board
+                    # Rows were deleted; only a full load drops them
+                    self._boards.pop(course_id, None)
+            return self._board(db, course_id)
+
+        with self._lock:
+            for row in applied:
+                board.set(*row)
+            self.loads += 1
+            current = self._boards.get(course_id)
+            if registered and (current is None or current.loaded_at < loaded_at):
+                self._boards[course_id] = board
+                while len(self._boards) > self.maxsize:
+                    oldest = min(self._boards, key=lambda key: self._boards[key].loaded_at)
+                    self._boards.pop(oldest)
+        return board
+
+    def apply(self, rows: Iterable[Tuple[str, str, int, int]]) -> None:
+        """Apply committed (course_id, user_id, total_score, quizzes) rows to the loaded boards"""
+        with self._lock:
+            for course_id, user_id, total_score, quizzes in rows:
+                for applied in self._loading.get(course_id, ()):
+                    applied.append((user_id, total_score, quizzes))
+                board = self._boards.get(course_id)
+                if board is not None:
+                    board.set(user_id, total_score, quizzes)
+                    self.updates += 1
+
+    def top(self, db: Session, course_id: str, limit: int, offset: int = 0) -> Tuple[int, List[dict]]:
+        """Number of ranked students and the page of them from `offset` on, best first"""
+        board = self._board(db, course_id)
+        with self._lock:
+            keys = board.keys.page(offset, limit)
+            entries = []
+            rank = None
+            for position, (negative_score, user_id) in enumerate(keys, start=offset):
+                if rank is None or entries[-1]["totalScore"] != -negative_score:
+                    rank = board.rank(-negative_score) if rank is None else position + 1
+                entries.append({
+                    "rank": rank,
+                    "userId": user_id,
+                    "totalScore": -negative_score,
+                    "quizzes": board.totals[user_id][1]
+                })
+            return len(board.keys), entries
+
+    def rank(self, db: Session, course_id: str, user_id: str) -> Optional[dict]:
+        """A student's entry on the course leaderboard, None if they have no quiz score yet"""
+        board = self._board(db, course_id)
+        with self._lock:
+            totals = board.totals.get(user_id)
+            if totals is None:
+                return None
+            return {
+                "rank": board.rank(totals[0]),
+                "userId": user_id,
+                "totalScore": totals[0],
+                "quizzes": totals[1]
+            }
+
+    def rebuild(self, db: Session, course_id: Optional[str] = None) -> dict:
+        """Rebuild the totals of one course (or all) from user_progress and reload the boards"""
+        started = time.perf_counter()
+        students = rebuild_leaderboard_totals(db, course_id)
+        db.commit()
+        if course_id is None:
+            self.clear()
+        else:
+            self.invalidate(course_id)
+        self.rebuilds += 1
+        return {
+            "courseId": course_id,
+            "students": students,
+            "durationMs": round((time.perf_counter() - started) * 1000, 3)
+        }
+
+    def start(self) -> None:
+        """
+        Rebuild every course's totals when the worker starts, if enabled.
+        Off by default: every worker would redo the whole rebuild on every
+        boot; run `python manage.py rebuild-leaderboards` once instead.
+        """
+        if not self.rebuild_on_startup:
+            return
+        db = self._sessions()()
+        try:
+            result = self.rebuild(db)
+            logger.info("Rebuilt leaderboards for %d students in %.1f ms", result["students"], result["durationMs"])
+        except Exception:
+            db.rollback()
+            logger.exception("Leaderboard rebuild on startup failed; boards load from the stored totals")
+        finally:
+            db.close()
+
+    def invalidate(self, course_id: str) -> None:
+        with self._lock:
+            self._boards.pop(course_id, None)
+            self._loading.pop(course_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._boards.clear()
+            self._loading.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "courses": len(self._boards),
+                "students": sum(len(board.totals) for board in self._boards.values()),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "loads": self.loads,
+                "syncs": self.syncs,
+                "updates": self.updates,
+                "rebuilds": self.rebuilds
+            }
+
+
+leaderboards = Leaderboards(
+    ttl=float(os.getenv("LEADERBOARD_TTL", "30")),
+    maxsize=int(os.getenv("LEADERBOARD_MAX_COURSES", "256")),
+    rebuild_on_startup=os.getenv("LEADERBOARD_REBUILD_ON_STARTUP", "0").lower() in ("1", "true", "yes"),
+    sync_margin=float(os.getenv("LEADERBOARD_SYNC_MARGIN", "60"))
+)
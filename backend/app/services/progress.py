@@ -0,0 +1,217 @@
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, case, distinct, func, insert, or_, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.database import dialect_insert
+from app.services.analytics import course_analytics
+from app.services.leaderboard import leaderboards, refresh_leaderboard_totals
+
+
+def progress_percent(enrollment: Optional[models.Enrollment]) -> int:
+    if enrollment is None or not enrollment.total_chapters:
+        return 0
+    return min(100, int((enrollment.completed_chapters / enrollment.total_chapters) * 100))
+
+
+def refresh_enrollment_counters(db: Session, course_id: str, user_id: Optional[str] = None) -> None:
+    """
+    Recompute completed_chapters/total_chapters for the course's enrollments
+    (or a single user's enrollment) with one UPDATE in the current transaction.
+
+    Call this after any write that changes a user's completed chapters or the
+    course's chapter list, before committing.
+    """
+    completed = (
+        select(func.count(distinct(models.UserProgress.chapter_id)))
+        .where(
+            models.UserProgress.user_id == models.Enrollment.user_id,
+            models.UserProgress.course_id == models.Enrollment.course_id,
+            models.UserProgress.completed == True
+        )
+        .scalar_subquery()
+    )
+    total = (
+        select(func.count(models.Chapter.id))
+        .where(models.Chapter.course_id == models.Enrollment.course_id)
+        .scalar_subquery()
+    )
+
+    stmt = update(models.Enrollment).where(models.Enrollment.course_id == course_id)
+    if user_id is not None:
+        stmt = stmt.where(models.Enrollment.user_id == user_id)
+
+    db.execute(
+        stmt.values(completed_chapters=completed, total_chapters=total),
+        execution_options={"synchronize_session": False}
+    )
+
+
+def refresh_enrollment_counters_for(db: Session, pairs: Iterable[Tuple[str, str]]) -> None:
+    """refresh_enrollment_counters for many (user_id, course_id) pairs in one UPDATE"""
+    pairs = list(set(pairs))
+    if not pairs:
+        return
+    completed = (
+        select(func.count(distinct(models.UserProgress.chapter_id)))
+        .where(
+            models.UserProgress.user_id == models.Enrollment.user_id,
+            models.UserProgress.course_id == models.Enrollment.course_id,
+            models.UserProgress.completed == True
+        )
+        .scalar_subquery()
+    )
+    total = (
+        select(func.count(models.Chapter.id))
+        .where(models.Chapter.course_id == models.Enrollment.course_id)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(models.Enrollment)
+        .where(tuple_(models.Enrollment.user_id, models.Enrollment.course_id).in_(pairs))
+        .values(completed_chapters=completed, total_chapters=total),
+        execution_options={"synchronize_session": False}
+    )
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands timezone-aware columns back naive
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def upsert_progress(db: Session, entries: List[dict]) -> list:
+    """
+    Write progress for several chapters with a single
+    INSERT ... ON CONFLICT (user_id, chapter_id) DO UPDATE ... RETURNING.
+
+    Each entry has user_id, course_id, chapter_id, completed and optionally
+    quiz_score, scored_at (when the score was recorded, default now) and
+    completed_at. Entries must not repeat a (user_id, chapter_id) pair. A
+    chapter never goes back to not completed, the first completion time is
+    kept, and a missing quiz_score or one recorded before the stored score
+    leaves the stored score alone, so repeating or replaying a request is
+    harmless. Returns the
+    resulting (user_id, course_id, chapter_id, completed, quiz_score) rows.
+
+    Databases without ON CONFLICT get the same result from
+    _upsert_progress_portable.
+    """
+    upsert = dialect_insert(db)
+    if upsert is None:
+        return _upsert_progress_portable(db, entries)
+
+    now = datetime.now(timezone.utc)
+    table = models.UserProgress.__table__
+    stmt = upsert(table).values([
+        {
+            "id": models.generate_uuid(),
+            "user_id": entry["user_id"],
+            "course_id": entry["course_id"],
+            "chapter_id": entry["chapter_id"],
+            "completed": entry["completed"],
+            "quiz_score": entry.get("quiz_score"),
+            "quiz_scored_at": (entry.get("scored_at") or now) if entry.get("quiz_score") is not None else None,
+            "completed_at": (entry.get("completed_at") or func.now()) if entry["completed"] else None
+        }
+        for entry in entries
+    ])
+    newer_score = and_(
+        stmt.excluded.quiz_score.isnot(None),
+        or_(table.c.quiz_scored_at.is_(None), stmt.excluded.quiz_scored_at >= table.c.quiz_scored_at)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.chapter_id],
+        set_={
+            "quiz_score": case((newer_score, stmt.excluded.quiz_score), else_=table.c.quiz_score),
+            "quiz_scored_at": case((newer_score, stmt.excluded.quiz_scored_at), else_=table.c.quiz_scored_at),
+            "completed": or_(func.coalesce(table.c.completed, False), stmt.excluded.completed),
+            "completed_at": case(
+                (table.c.completed == True, table.c.completed_at),
+                else_=stmt.excluded.completed_at
+            )
+        }
+    ).returning(table.c.user_id, table.c.course_id, table.c.chapter_id, table.c.completed, table.c.quiz_score)
+
+    return db.execute(stmt).all()
+
+
+def _upsert_progress_portable(db: Session, entries: List[dict]) -> list:
+    """
+    upsert_progress by reading the existing rows, then inserting and
+    updating with the same merge rules. Not atomic: a concurrent insert of
+    the same (user_id, chapter_id) fails on the unique index instead of
+    merging.
+    """
+    progress = models.UserProgress
+    keys = [(entry["user_id"], entry["chapter_id"]) for entry in entries]
+    existing = {
+        (row.user_id, row.chapter_id): row
+        for row in db.execute(
+            select(
+                progress.id, progress.user_id, progress.chapter_id, progress.completed, progress.completed_at,
+                progress.quiz_scored_at
+            )
+            .where(tuple_(progress.user_id, progress.chapter_id).in_(keys))
+        )
+    }
+
+    now = datetime.now(timezone.utc)
+    inserts, updates = [], []
+    for entry in entries:
+        completed_at = (entry.get("completed_at") or now) if entry["completed"] else None
+        scored_at = (entry.get("scored_at") or now) if entry.get("quiz_score") is not None else None
+        row = existing.get((entry["user_id"], entry["chapter_id"]))
+        if row is None:
+            inserts.append({
+                "user_id": entry["user_id"],
+                "course_id": entry["course_id"],
+                "chapter_id": entry["chapter_id"],
+                "completed": entry["completed"],
+                "quiz_score": entry.get("quiz_score"),
+                "quiz_scored_at": scored_at,
+                "completed_at": completed_at
+            })
+            continue
+        values = {
+            "id": row.id,
+            "completed": bool(row.completed) or entry["completed"],
+            "completed_at": row.completed_at if row.completed else completed_at
+        }
+        if scored_at is not None and (
+            row.quiz_scored_at is None or _as_utc(scored_at) >= _as_utc(row.quiz_scored_at)
+        ):
+            values["quiz_score"] = entry["quiz_score"]
+            values["quiz_scored_at"] = scored_at
+        updates.append(values)
+
+    if inserts:
+        db.execute(insert(progress), inserts)
+    if updates:
+        db.execute(update(progress), updates)
+
+    return db.execute(
+        select(progress.user_id, progress.course_id, progress.chapter_id, progress.completed, progress.quiz_score)
+        .where(tuple_(progress.user_id, progress.chapter_id).in_(keys))
+    ).all()
+
+
+def save_progress(db: Session, entries: List[dict], chunk_size: int = 1000) -> list:
+    """
+    Upsert progress entries, refresh the affected enrollment counters and
+    leaderboard totals and commit
+    """
+    rows = []
+    for start in range(0, len(entries), chunk_size):
+        rows.extend(upsert_progress(db, entries[start:start + chunk_size]))
+    refresh_enrollment_counters_for(db, [(row.user_id, row.course_id) for row in rows if row.completed])
+    totals = refresh_leaderboard_totals(
+        db, [(entry["user_id"], entry["course_id"]) for entry in entries if entry.get("quiz_score") is not None]
+    )
+    db.commit()
+    course_analytics.mark_dirty((row.course_id, row.chapter_id) for row in rows)
+    leaderboards.apply(totals)
+    return rows
@@ -0,0 +1,374 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.services.progress import save_progress
+
+logger = logging.getLogger(__name__)
+
+DEAD_LETTER_FILE = "dead-letter.jsonl"
+# Errors caused by the events themselves rather than by the database being
+# unavailable; a batch failing with one of these is split to find the culprits
+EVENT_ERRORS = (IntegrityError, DataError, KeyError, TypeError, ValueError)
+# Scores in WAL files written before events carried scored_at lose to any stored score
+LEGACY_SCORED_AT = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _merge(existing: Optional[dict], event: dict) -> dict:
+    """
+    Fold two events for the same (user, chapter) the way upsert_progress
+    would. Replayed WAL files are not in recording order, so the score
+    recorded last wins rather than the event folded last.
+    """
+    if existing is None:
+        return event
+    scored = event
+    if event["quiz_score"] is None or (
+        existing["quiz_score"] is not None and
+        (existing.get("scored_at") or "") > (event.get("scored_at") or "")
+    ):
+        scored = existing
+    return {
+        **event,
+        "completed": existing["completed"] or event["completed"],
+        "quiz_score": scored["quiz_score"],
+        "scored_at": scored.get("scored_at"),
+        "completed_at": existing["completed_at"] if existing["completed"] else event["completed_at"]
+    }
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _write_events(db: Session, events: List[dict]) -> None:
+    # Chapters deleted since the event was recorded would fail the foreign key
+    chapter_ids = {event["chapter_id"] for event in events}
+    existing = {
+        chapter_id for (chapter_id,) in
+        db.query(models.Chapter.id).filter(models.Chapter.id.in_(chapter_ids))
+    }
+    entries = [
+        {
+            **event,
+            "completed_at": datetime.fromisoformat(event["completed_at"]) if event["completed_at"] else None,
+            "scored_at": (
+                datetime.fromisoformat(event["scored_at"]) if event.get("scored_at") else LEGACY_SCORED_AT
+            ) if event["quiz_score"] is not None else None
+        }
+        for event in events if event["chapter_id"] in existing
+    ]
+    if entries:
+        save_progress(db, entries)
+    else:
+        db.commit()
+
+
+class ProgressWriteBehind:
+    """
+    Opt-in write-behind buffer for chapter progress.
+
+    A progress event is acknowledged once it is appended (and fsynced) to a
+    per-process WAL file; events are folded per (user, chapter) in memory
+    and written to user_progress in batched upserts every `flush_interval`
+    seconds or as soon as `flush_size` events are waiting. The WAL is
+    rotated into a segment before each flush and the segment is removed
+    once the batch has committed, so a crash replays at most the unflushed
+    events. Segments left behind by dead processes are picked up on start.
+
+    A batch the database rejects because of its data is split in halves and
+    retried until the offending events are isolated; those are appended to
+    `dead-letter.jsonl` in the WAL directory and the rest are written. Any
+    other error (the database being down, say) keeps the whole batch for
+    the next flush.
+
+    Unflushed completions are only visible to the process that accepted
+    them, so multi-worker deployments should keep the interval short or
+    route a user to the same worker.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        wal_dir: str = "progress-wal",
+        flush_interval: float = 1.0,
+        flush_size: int = 500,
+        fsync: bool = True
+    ):
+        self.enabled = enabled
+        self.wal_dir = wal_dir
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.fsync = fsync
+        self.session_factory: Optional[Callable] = None
+        # user_id -> chapter_id -> event, for accepted and in-flight events
+        self._pending: Dict[str, Dict[str, dict]] = {}
+        self._flushing: Dict[str, Dict[str, dict]] = {}
+        self._pending_count = 0
+        self._segments: List[str] = []
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wal = None
+        self._prefix = None
+        self._sequence = 0
+        self.appended = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failures = 0
+        self.dead_lettered = 0
+        self.last_flush_ms = None
+
+    def _open_wal(self) -> None:
+        os.makedirs(self.wal_dir, exist_ok=True)
+        self._prefix = os.path.join(self.wal_dir, f"progress-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        self._wal = open(f"{self._prefix}.wal", "a", encoding="utf-8")
+
+    def _write(self, events: List[dict]) -> None:
+        self._wal.write("".join(json.dumps(event) + "\n" for event in events))
+        self._wal.flush()
+        if self.fsync:
+            os.fsync(self._wal.fileno())
+
+    def _add(self, event: dict) -> None:
+        chapters = self._pending.setdefault(event["user_id"], {})
+        if event["chapter_id"] not in chapters:
+            self._pending_count += 1
+        chapters[event["chapter_id"]] = _merge(chapters.get(event["chapter_id"]), event)
+
+    def append(self, event: dict) -> int:
+        """Durably record one event; returns the number of events waiting"""
+        with self._lock:
+            if self._wal is None:
+                self._open_wal()
+            self._write([event])
+            self._add(event)
+            self.appended += 1
+            return self._pending_count
+
+    async def record(self, user_id: str, course_id: str, entry: dict) -> None:
+        now = datetime.now(timezone.utc).isoformat()
+        event = {
+            "user_id": user_id,
+            "course_id": course_id,
+            "chapter_id": entry["chapter_id"],
+            "completed": entry["completed"],
+            "quiz_score": entry.get("quiz_score"),
+            "scored_at": now if entry.get("quiz_score") is not None else None,
+            "completed_at": now if entry["completed"] else None
+        }
+        loop = asyncio.get_running_loop()
+        waiting = await loop.run_in_executor(None, self.append, event)
+        if waiting >= self.flush_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def pending_completed(self, user_id: str) -> Dict[str, Set[str]]:
+        """Completed chapter ids not yet written to the database, keyed by course id"""
+        completed = {}
+        with self._lock:
+            for source in (self._flushing, self._pending):
+                for event in source.get(user_id, {}).values():
+                    if event["completed"]:
+                        completed.setdefault(event["course_id"], set()).add(event["chapter_id"])
+        return completed
+
+    def _rotate(self) -> List[dict]:
+        """Move waiting events into the in-flight set and start a new WAL segment"""
+        with self._lock:
+            if self._pending:
+                for user_id, chapters in self._pending.items():
+                    flushing = self._flushing.setdefault(user_id, {})
+                    for chapter_id, event in chapters.items():
+                        flushing[chapter_id] = _merge(flushing.get(chapter_id), event)
+                self._pending = {}
+                self._pending_count = 0
+                self._wal.close()
+                self._sequence += 1
+                segment = f"{self._prefix}.{self._sequence}.flushing"
+                os.replace(f"{self._prefix}.wal", segment)
+                self._segments.append(segment)
+                self._wal = open(f"{self._prefix}.wal", "a", encoding="utf-8")
+            return [event for chapters in self._flushing.values() for event in chapters.values()]
+
+    async def flush(self) -> int:
+        """Write every waiting event to the database; returns how many were written"""
+        async with self._flush_lock:
+            events = self._rotate()
+            if not events:
+                return 0
+            started = time.perf_counter()
+            try:
+                rejected = await self._write_batch(events)
+            except Exception:
+                self.failures += 1
+                raise
+            with self._lock:
+                self._flushing = {}
+                segments, self._segments = self._segments, []
+            for segment in segments:
+                os.remove(segment)
+            self.flushed += len(events) - rejected
+            self.flushes += 1
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 3)
+            return len(events) - rejected
+
+    async def _write_batch(self, events: List[dict]) -> int:
+        """
+        Write events in one transaction, bisecting on errors caused by the
+        events; returns how many were dead-lettered. Halves that committed
+        before a later half fails for another reason are simply rewritten
+        by the next flush.
+        """
+        try:
+            async with self._sessions()() as session:
+                await session.run_sync(_write_events, events)
+            return 0
+        except EVENT_ERRORS as exc:
+            if len(events) == 1:
+                self._dead_letter(events[0], exc)
+                return 1
+            middle = len(events) // 2
+            return await self._write_batch(events[:middle]) + await self._write_batch(events[middle:])
+
+    def _dead_letter(self, event: dict, error: Exception) -> None:
+        path = os.path.join(self.wal_dir, DEAD_LETTER_FILE)
+        record = {
+            "event": event,
+            "error": f"{type(error).__name__}: {error}",
+            "failedAt": datetime.now(timezone.utc).isoformat()
+        }
+        with open(path, "a", encoding="utf-8") as dead_letter:
+            dead_letter.write(json.dumps(record, default=str) + "\n")
+            dead_letter.flush()
+            if self.fsync:
+                os.fsync(dead_letter.fileno())
+        self.dead_lettered += 1
+        logger.error(
+            "Dead-lettered progress event for user %s, chapter %s to %s: %s",
+            event.get("user_id"), event.get("chapter_id"), path, record["error"]
+        )
+
+    def _sessions(self) -> Callable:
+        if self.session_factory is None:
+            from app.db.database import AsyncSessionLocal
+            self.session_factory = AsyncSessionLocal
+        return self.session_factory
+
+    def recover(self) -> int:
+        """Adopt WAL files of processes that are gone; returns the number of events replayed"""
+        with self._lock:
+            if self._wal is None:
+                self._open_wal()
+            own = os.path.basename(self._prefix)
+            paths = sorted(
+                glob.glob(os.path.join(self.wal_dir, "progress-*.wal")) +
+                glob.glob(os.path.join(self.wal_dir, "progress-*.flushing"))
+            )
+            orphaned = []
+            for path in paths:
+                name = os.path.basename(path)
+                if name.startswith(own + "."):
+                    continue
+                try:
+                    pid = int(name.split("-")[1])
+                except (IndexError, ValueError):
+                    continue
+                if pid == os.getpid() or not _pid_alive(pid):
+                    orphaned.append(path)
+
+            events = []
+            for path in orphaned:
+                with open(path, encoding="utf-8") as wal:
+                    for line in wal:
+                        try:
+                            events.append(json.loads(line))
+                        except ValueError:
+                            # Torn final line from a crash mid-append
+                            continue
+            if events:
+                self._write(events)
+                for event in events:
+                    self._add(event)
+            for path in orphaned:
+                os.remove(path)
+            return len(events)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Progress write-behind flush failed; will retry")
+
+    async def start(self) -> None:
+        if not self.enabled or self._task is not None:
+            return
+        replayed = self.recover()
+        if replayed:
+            logger.info("Replayed %d progress events from orphaned WAL files", replayed)
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.enabled:
+            await self.flush()
+        with self._lock:
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = sum(len(chapters) for chapters in self._flushing.values())
+            return {
+                "enabled": self.enabled,
+                "pending": self._pending_count,
+                "inFlight": in_flight,
+                "appended": self.appended,
+                "flushed": self.flushed,
+                "flushes": self.flushes,
+                "failures": self.failures,
+                "deadLettered": self.dead_lettered,
+                "lastFlushMs": self.last_flush_ms,
+                "flushInterval": self.flush_interval,
+                "flushSize": self.flush_size
+            }
+
+
+progress_buffer = ProgressWriteBehind(
+    enabled=os.getenv("PROGRESS_WRITE_BEHIND", "0").lower() in ("1", "true", "yes"),
+    wal_dir=os.getenv("PROGRESS_WAL_DIR", "progress-wal"),
+    flush_interval=float(os.getenv("PROGRESS_FLUSH_INTERVAL", "1.0")),
+    flush_size=int(os.getenv("PROGRESS_FLUSH_SIZE", "500")),
+    fsync=os.getenv("PROGRESS_WAL_FSYNC", "1").lower() in ("1", "true", "yes")
+)
@@ -0,0 +1,98 @@
+"""
+Micro-benchmark of quiz grading.
+
+Per submission: reading the chapter's quizzes from the database and grading
+them (what submit_quiz used to do) against looking the answer key up in the
+in-memory index. Per class: scoring all submissions for one chapter one at a
+time with grading.grade against AnswerKey.grade_many and correct_counts.
+
+Usage (from the backend directory):
+
+    python benchmarks/grading.py --submissions 10000 --quizzes 10
+
+The database part uses a throwaway in-memory SQLite database.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.services.answer_keys import AnswerKeyIndex
+from app.services.grading import grade
+
+
+def measure(run, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--submissions", type=int, default=10000, help="Submissions in the class")
+    parser.add_argument("--quizzes", type=int, default=10, help="Quizzes in the chapter")
+    parser.add_argument("--requests", type=int, default=2000, help="Single submissions graded against the database")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    course = models.Course(title="Bench", description="", image_url="")
+    db.add(course)
+    db.flush()
+    chapter = models.Chapter(course_id=course.id, title="Chapter", content="", order=0)
+    db.add(chapter)
+    db.flush()
+    for i in range(args.quizzes):
+        db.add(models.Quiz(chapter_id=chapter.id, question=f"Q{i}", options=["A", "B", "C", "D"], correct_option=rng.randrange(4)))
+    db.commit()
+
+    index = AnswerKeyIndex()
+    key = index.key(db, course.id, course.version, chapter.id)
+    pairs = list(zip(key.quiz_ids, key.correct))
+    submissions = [
+        {quiz_id: rng.randrange(4) for quiz_id in key.quiz_ids if rng.random() < 0.95}
+        for _ in range(args.submissions)
+    ]
+    assert key.grade_many(submissions) == [grade(pairs, answers) for answers in submissions]
+
+    def queried():
+        for answers in submissions[:args.requests]:
+            quizzes = db.query(models.Quiz).filter(models.Quiz.chapter_id == chapter.id).all()
+            grade([(quiz.id, quiz.correct_option) for quiz in quizzes], answers)
+
+    def indexed():
+        for answers in submissions[:args.requests]:
+            index.key(db, course.id, course.version, chapter.id).grade(answers)
+
+    print(f"{args.quizzes} quizzes per chapter")
+    print(f"{'single submission':<24}{'us/submission':>16}")
+    for name, run in (("quiz query + grade", queried), ("answer-key index", indexed)):
+        print(f"{name:<24}{measure(run, 3) / args.requests * 1e6:>16.1f}")
+
+    print(f"\n{args.submissions} submissions in the class, {args.repeat} runs")
+    print(f"{'class':<24}{'median ms':>16}")
+    for name, run in (
+        ("grade, one by one", lambda: [grade(pairs, answers) for answers in submissions]),
+        ("grade_many", lambda: key.grade_many(submissions)),
+        ("correct_counts", lambda: key.correct_counts(submissions)),
+    ):
+        print(f"{name:<24}{measure(run, args.repeat) * 1000:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
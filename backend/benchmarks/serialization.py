@@ -0,0 +1,120 @@
+"""
+Micro-benchmark of rendering the full course listing.
+
+Builds a catalog payload in memory (no database) the way the catalog service
+does and times three ways of turning it into a response body:
+
+- response_model: what FastAPI does for a returned dict, i.e. validate it
+  against List[CourseResponse], run jsonable_encoder and render with the
+  stdlib json module (fastapi.routing.serialize_response + JSONResponse)
+- validated: the ResponseSerializer with RESPONSE_VALIDATION on, i.e. a
+  pre-built TypeAdapter validating and dumping straight to JSON bytes
+- trusted: the ResponseSerializer default, orjson on the dicts as they are
+
+Usage (from the backend directory):
+
+    python benchmarks/serialization.py --courses 500 --chapters 12 --quizzes 3
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.core import responses
+from app.core.responses import ResponseSerializer
+from app.schemas.course import CourseResponse
+
+
+def build_payload(courses: int, chapters: int, quizzes: int) -> list:
+    payload = []
+    for i in range(courses):
+        payload.append({
+            "id": str(uuid.uuid4()),
+            "title": f"Course {i}",
+            "description": f"Synthetic course {i} " * 4,
+            "imageUrl": f"https://example.com/{i}.png",
+            "chapters": [
+                {
+                    "id": str(uuid.uuid4()),
+                    "title": f"Chapter {order}",
+                    "quiz": [
+                        {
+                            "id": str(uuid.uuid4()),
+                            "question": f"Question {q} of chapter {order}?",
+                            "options": ["Option A", "Option B", "Option C", "Option D"],
+                            "correctOption": q % 4
+                        }
+                        for q in range(quizzes)
+                    ],
+                    "completed": order % 3 == 0
+                }
+                for order in range(chapters)
+            ],
+            "progress": 33,
+            "enrolled": i % 2 == 0,
+            "enrollmentCode": None
+        })
+    return payload
+
+
+def time_it(render, repeat: int) -> tuple:
+    body = render()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        render()
+        timings.append(time.perf_counter() - started)
+    return timings, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=500)
+    parser.add_argument("--chapters", type=int, default=12, help="Chapters per course")
+    parser.add_argument("--quizzes", type=int, default=3, help="Quizzes per chapter")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    payload = build_payload(args.courses, args.chapters, args.quizzes)
+    field = create_response_field(name="Response", type_=List[CourseResponse])
+    serializer = ResponseSerializer(List[CourseResponse])
+    loop = asyncio.new_event_loop()
+
+    def response_model() -> bytes:
+        content = loop.run_until_complete(serialize_response(field=field, response_content=payload, is_coroutine=True))
+        return JSONResponse(content).body
+
+    def validated() -> bytes:
+        responses.VALIDATE_RESPONSES = True
+        try:
+            return serializer.render(payload)
+        finally:
+            responses.VALIDATE_RESPONSES = False
+
+    def trusted() -> bytes:
+        return serializer.render(payload)
+
+    print(f"{args.courses} courses x {args.chapters} chapters x {args.quizzes} quizzes, {args.repeat} runs")
+    results = [(name, *time_it(render, args.repeat)) for name, render in (
+        ("response_model", response_model), ("validated", validated), ("trusted", trusted)
+    )]
+    baseline = statistics.median(results[0][1])
+    print(f"{'path':<16}{'median ms':>12}{'p95 ms':>12}{'bytes':>12}{'speedup':>10}")
+    for name, timings, size in results:
+        median = statistics.median(timings)
+        p95 = sorted(timings)[max(0, int(round(0.95 * len(timings))) - 1)]
+        print(f"{name:<16}{median * 1000:>12.1f}{p95 * 1000:>12.1f}{size:>12}{baseline / median:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+#!/bin/sh
+# Runs the API image. `docker run <image> migrate` (or `seed`) runs that
+# manage.py command as a one-off release step; MIGRATE_ON_START=1 migrates
+# before the server starts, for deployments without a release step.
+set -e
+
+case "$1" in
+    migrate|seed|import-courses|rebuild-leaderboards)
+        exec python manage.py "$@"
+        ;;
+esac
+
+if [ "${MIGRATE_ON_START:-0}" = "1" ]; then
+    python manage.py migrate
+fi
+
+exec "$@"
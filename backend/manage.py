@@ -0,0 +1,104 @@
+"""
+Maintenance commands, run from the backend directory:
+
+    python manage.py migrate
+    python manage.py seed
+    python manage.py import-courses catalog.ndjson [--batch-size 500]
+    python manage.py rebuild-leaderboards [--course-id ID]
+
+The database comes from DATABASE_URL, as for the application.
+"""
+import argparse
+import json
+import sys
+
+
+def migrate(args) -> int:
+    from app.db.bootstrap import migrate as run_migrations
+    from app.db.database import engine
+
+    outcome = run_migrations(engine)
+    print("Created tables and stamped the latest revision." if outcome == "created" else "Migrations completed.")
+    return 0
+
+
+def seed(args) -> int:
+    from app.db.bootstrap import seed as create_seed_users
+    from app.db.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        created = create_seed_users(db)
+    finally:
+        db.close()
+    print(f"Created users: {', '.join(created)}" if created else "Seed users already exist.")
+    return 0
+
+
+def import_courses(args) -> int:
+    from app.db.database import SessionLocal
+    from app.services.course_import import import_lines
+
+    source = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8")
+    db = SessionLocal()
+    try:
+        report = import_lines(db, source, args.batch_size)
+    finally:
+        db.close()
+        if source is not sys.stdin:
+            source.close()
+
+    for result in report["results"]:
+        if result["status"] == "error":
+            print(f"line {result['line']}: {result['error']}", file=sys.stderr)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as out:
+            json.dump(report, out, indent=2)
+    print(f"Imported {report['created']} courses, {report['failed']} failed")
+    return 1 if report["failed"] else 0
+
+
+def rebuild_leaderboards(args) -> int:
+    from app.db.database import SessionLocal
+    from app.services.leaderboard import leaderboards
+
+    db = SessionLocal()
+    try:
+        result = leaderboards.rebuild(db, args.course_id)
+    finally:
+        db.close()
+    print(f"Rebuilt leaderboard totals of {result['students']} students in {result['durationMs']:.0f} ms")
+    return 0
+
+
+def main() -> int:
+    from app.services.course_import import DEFAULT_BATCH_SIZE
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("migrate", help="Create or upgrade the database schema").set_defaults(handler=migrate)
+    commands.add_parser(
+        "seed", help="Create the default admin and user accounts (password from SEED_PASSWORD)"
+    ).set_defaults(handler=seed)
+
+    importer = commands.add_parser("import-courses", help="Bulk import courses from NDJSON")
+    importer.add_argument("path", help="NDJSON file, one course per line, or - for stdin")
+    importer.add_argument(
+        "--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Courses per INSERT batch (default: %(default)s)"
+    )
+    importer.add_argument("--report", help="Write the per-line JSON report to this file")
+    importer.set_defaults(handler=import_courses)
+
+    rebuilder = commands.add_parser(
+        "rebuild-leaderboards", help="Recompute the stored leaderboard totals from user_progress"
+    )
+    rebuilder.add_argument("--course-id", help="Rebuild only this course")
+    rebuilder.set_defaults(handler=rebuild_leaderboards)
+
+    args = parser.parse_args()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
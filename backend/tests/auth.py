@@ -101,3 +101,35 @@ def test_get_current_user_unauthorized(client):
     
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
+
+
+def test_login_hashing_overloaded(client, regular_user, monkeypatch):
+    """Test that login fails fast with 503 when the hashing queue is full"""
+    from app.core.password_pool import password_pool
+
+    monkeypatch.setattr(password_pool, "queue_limit", 0)
+    response = client.post(
+        "/auth/login",
+        data={"username": regular_user.email, "password": "testpass123"}
+    )
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["retry-after"] == "1"
+
+
+def test_principal_cache_invalidated_on_role_change(client, user_token, regular_user, db):
+    """Test that a cached principal is dropped when the user's role changes"""
+    from app.core.principal_cache import principal_cache
+
+    headers = {"Authorization": f"Bearer {user_token}"}
+    assert client.get("/auth/me", headers=headers).json()["role"] == "user"
+    assert principal_cache.get(user_token) is not None
+
+    regular_user.role = "admin"
+    db.flush()
+    # Still cached until the change commits
+    assert principal_cache.get(user_token) is not None
+    db.commit()
+    assert principal_cache.get(user_token) is None
+
+    assert client.get("/auth/me", headers=headers).json()["role"] == "admin"
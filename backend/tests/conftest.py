@@ -1,17 +1,27 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 import os
 
-from app.db.database import Base, get_db
+# Check trusted response payloads against their schemas
+os.environ.setdefault("RESPONSE_VALIDATION", "1")
+
+from app.db.database import Base, get_db, get_async_db, make_async_url
 from app.db import models
 from app.core.security import get_password_hash
+from app.services.analytics import course_analytics
+from app.services.chapter_body import chapter_body
+from app.services.course_deletion import course_deleter
+from app.services.leaderboard import leaderboards
+from app.services.progress_buffer import progress_buffer
 from main import app
 
-# Use in-memory SQLite for testing (or PostgreSQL if DATABASE_URL is set for CI)
-TEST_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///:memory:")
+# Use in-memory SQLite for testing (or PostgreSQL if DATABASE_URL is set for CI).
+# The in-memory database uses a shared cache so the async engine sees the same data.
+TEST_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///file:testdb?mode=memory&cache=shared&uri=true")
 
 # Configure engine based on database type
 if TEST_DATABASE_URL.startswith("sqlite"):
@@ -25,6 +35,13 @@ else:
     engine = create_engine(TEST_DATABASE_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the async routes. NullPool because every TestClient runs its
+# own event loop and async connections cannot be shared between loops.
+async_engine = create_async_engine(make_async_url(TEST_DATABASE_URL), poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 
 @pytest.fixture(scope="function")
 def db():
@@ -43,6 +60,19 @@ def db():
         Base.metadata.drop_all(bind=engine)
 
 
+def _join_analytics_refreshes():
+    with course_analytics._lock:
+        threads = list(course_analytics._refreshing.values())
+    for thread in threads:
+        thread.join()
+
+
+@pytest.fixture
+def join_analytics_refreshes():
+    """Wait for the background analytics refreshes running now"""
+    return _join_analytics_refreshes
+
+
 @pytest.fixture(scope="function")
 def client(db):
     """Create a test client with database override"""
@@ -52,10 +82,28 @@ def client(db):
         finally:
             pass
     
+
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as session:
+            yield session
+    
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    progress_buffer.session_factory = TestingAsyncSessionLocal
+    course_deleter.session_factory = TestingSessionLocal
+    leaderboards.session_factory = TestingSessionLocal
+    course_analytics.session_factory = TestingSessionLocal
+    leaderboards.clear()
+    chapter_body.session_factory = TestingAsyncSessionLocal
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
+    progress_buffer.session_factory = None
+    course_deleter.session_factory = None
+    leaderboards.session_factory = None
+    _join_analytics_refreshes()
+    course_analytics.session_factory = None
+    chapter_body.session_factory = None
 
 
 @pytest.fixture
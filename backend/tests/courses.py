@@ -275,3 +275,1017 @@ def test_submit_quiz_without_enrollment(client, user_token, test_course):
     
     assert response.status_code == status.HTTP_403_FORBIDDEN
 
+
+
+def _add_courses(db, course_count, chapters_per_course):
+    from app.db import models
+
+    for i in range(course_count):
+        course = models.Course(
+            title=f"Course {i}",
+            description="Generated course",
+            image_url="https://example.com/image.jpg"
+        )
+        db.add(course)
+        db.flush()
+        for j in range(chapters_per_course):
+            chapter = models.Chapter(
+                course_id=course.id,
+                title=f"Chapter {j}",
+                content="Chapter content",
+                order=j
+            )
+            db.add(chapter)
+            db.flush()
+            db.add(models.Quiz(
+                chapter_id=chapter.id,
+                question="What is 2+2?",
+                options=["3", "4"],
+                correct_option=1
+            ))
+    db.commit()
+
+
+def _count_statements(db, request):
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # Listen on every engine: routes may run on the sync or the async engine
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = request()
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+
+    assert response.status_code == status.HTTP_200_OK
+    return len(statements)
+
+
+def test_get_all_courses_statement_count_is_constant(monkeypatch, client, user_token, test_course, db):
+    """Test that the course listing issues the same number of queries regardless of catalog size"""
+    from app.services import catalog
+    from app.services.course_cache import course_cache
+
+    monkeypatch.setattr(course_cache, "maxsize", 2000)
+    headers = {"Authorization": f"Bearer {user_token}"}
+    client.post(
+        f"/courses/{test_course.id}/enroll",
+        json={"enrollmentCode": test_course.enrollment_code},
+        headers=headers
+    )
+    client.post(
+        f"/courses/{test_course.id}/chapters/{test_course.chapters[0].id}/complete",
+        headers=headers
+    )
+
+    course_cache.clear()
+    small_cold = _count_statements(db, lambda: client.get("/courses", headers=headers))
+    small_warm = _count_statements(db, lambda: client.get("/courses", headers=headers))
+
+    _add_courses(db, course_count=catalog.STRUCTURE_BATCH_SIZE + 20, chapters_per_course=2)
+    # Cold: two queries per batch of courses, not per chapter or per 500 quizzes
+    course_cache.clear()
+    large_cold = _count_statements(db, lambda: client.get("/courses", headers=headers))
+    assert large_cold == small_cold + 2
+    # Warm: the trees come from the cache
+    large_warm = _count_statements(db, lambda: client.get("/courses", headers=headers))
+    assert large_warm == small_warm
+
+    data = client.get("/courses", headers=headers).json()
+    assert len(data) == catalog.STRUCTURE_BATCH_SIZE + 21
+    enrolled = next(course for course in data if course["id"] == test_course.id)
+    assert enrolled["enrolled"] is True
+    assert enrolled["progress"] == 100
+    assert enrolled["chapters"][0]["completed"] is True
+
+
+def test_get_course_summaries_paginates(client, user_token, test_course, db):
+    """Test walking the summary listing page by page"""
+    headers = {"Authorization": f"Bearer {user_token}"}
+    _add_courses(db, course_count=4, chapters_per_course=2)
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/courses/summary", params=params, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        page = response.json()
+        assert len(page["items"]) <= 2
+        seen.extend(page["items"])
+        cursor = page["nextCursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == 5
+    assert len({item["id"] for item in seen}) == 5
+    assert all("chapters" not in item for item in seen)
+    summary = next(item for item in seen if item["id"] == test_course.id)
+    assert summary["chapterCount"] == 1
+    assert summary["quizCount"] == 1
+    assert summary["enrolled"] is False
+
+    client.post(
+        f"/courses/{test_course.id}/enroll",
+        json={"enrollmentCode": test_course.enrollment_code},
+        headers=headers
+    )
+    page = client.get("/courses/summary", params={"limit": 2, "enrolled": True}, headers=headers).json()
+    assert [item["id"] for item in page["items"]] == [test_course.id]
+    assert page["items"][0]["enrolled"] is True
+    assert page["nextCursor"] is None
+
+
+def test_get_course_summaries_cursor_survives_deleted_course(client, user_token, db):
+    """Test that paging continues after the course a cursor points at is deleted"""
+    from datetime import datetime, timedelta, timezone
+    from app.db import models
+
+    headers = {"Authorization": f"Bearer {user_token}"}
+    _add_courses(db, course_count=4, chapters_per_course=1)
+    started = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    courses = db.query(models.Course).order_by(models.Course.id).all()
+    for i, course in enumerate(courses):
+        course.created_at = started + timedelta(minutes=i)
+    db.commit()
+
+    page = client.get("/courses/summary", params={"limit": 2}, headers=headers).json()
+    assert [item["id"] for item in page["items"]] == [course.id for course in courses[:2]]
+    anchor = courses[1]
+    for chapter in anchor.chapters:
+        db.query(models.Quiz).filter(models.Quiz.chapter_id == chapter.id).delete()
+        db.delete(chapter)
+    db.delete(anchor)
+    db.commit()
+
+    response = client.get("/courses/summary", params={"limit": 2, "cursor": page["nextCursor"]}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert [item["id"] for item in response.json()["items"]] == [course.id for course in courses[2:]]
+
+
+def test_get_course_summaries_invalid_cursor(client, user_token):
+    """Test that an unknown cursor is rejected"""
+    response = client.get(
+        "/courses/summary",
+        params={"cursor": "nonexistent-id"},
+        headers={"Authorization": f"Bearer {user_token}"}
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_enrollment_progress_counters(client, user_token, admin_token, test_course, db):
+    """Test that enrollment progress counters follow completions and course edits"""
+    from app.db import models
+
+    headers = {"Authorization": f"Bearer {user_token}"}
+    client.post(
+        f"/courses/{test_course.id}/enroll",
+        json={"enrollmentCode": test_course.enrollment_code},
+        headers=headers
+    )
+    chapter = test_course.chapters[0]
+    client.post(f"/courses/{test_course.id}/chapters/{chapter.id}/complete", headers=headers)
+
+    enrollment = db.query(models.Enrollment).filter(models.Enrollment.course_id == test_course.id).one()
+    db.refresh(enrollment)
+    assert enrollment.completed_chapters == 1
+    assert enrollment.total_chapters == 1
+
+    response = client.put(
+        f"/admin/courses/{test_course.id}",
+        json={
+            "title": test_course.title,
+            "description": test_course.description,
+            "imageUrl": test_course.image_url,
+            "chapters": [
+                {"id": chapter.id, "title": chapter.title, "content": chapter.content, "quiz": []},
+                {"id": "new-chapter", "title": "Chapter 2", "content": "More content", "quiz": []}
+            ]
+        },
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    db.refresh(enrollment)
+    assert enrollment.completed_chapters == 1
+    assert enrollment.total_chapters == 2
+
+    page = client.get("/courses/summary", headers=headers).json()
+    assert page["items"][0]["progress"] == 50
+
+
+def test_course_structure_cache_invalidated_by_admin_update(client, user_token, admin_token, test_course):
+    """Test that course reads are served from the cache until an admin edits the course"""
+    from app.services.course_cache import course_cache
+
+    headers = {"Authorization": f"Bearer {user_token}"}
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+
+    client.get(f"/courses/{test_course.id}", headers=headers)
+    hits = course_cache.hits
+    response = client.get(f"/courses/{test_course.id}", headers=headers)
+    assert response.json()["chapters"][0]["title"] == "Chapter 1"
+    assert course_cache.hits == hits + 1
+
+    chapter = test_course.chapters[0]
+    client.put(
+        f"/admin/courses/{test_course.id}",
+        json={
+            "title": test_course.title,
+            "description": test_course.description,
+            "imageUrl": test_course.image_url,
+            "chapters": [{"id": chapter.id, "title": "Renamed", "content": chapter.content, "quiz": []}]
+        },
+        headers=admin_headers
+    )
+
+    response = client.get(f"/courses/{test_course.id}", headers=headers)
+    assert response.json()["chapters"][0]["title"] == "Renamed"
+
+    stats = client.get("/admin/cache/stats", headers=admin_headers).json()["courseStructure"]
+    assert stats["invalidations"] >= 1
+
+
+def test_course_etag_not_modified(client, user_token, regular_user, test_course):
+    """Test conditional GET on a course and its invalidation by progress"""
+    headers = {"Authorization": f"Bearer {user_token}"}
+    client.post(
+        f"/courses/{test_course.id}/enroll",
+        json={"enrollmentCode": test_course.enrollment_code},
+        headers=headers
+    )
+
+    response = client.get(f"/courses/{test_course.id}", headers=headers)
+    etag = response.headers["etag"]
+
+    response = client.get(f"/courses/{test_course.id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+    chapter_id = test_course.chapters[0].id
+    client.post(f"/courses/{test_course.id}/chapters/{chapter_id}/complete", headers=headers)
+
+    response = client.get(f"/courses/{test_course.id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+    assert response.json()["chapters"][0]["completed"] is True
+
+    chapter_url = f"/courses/{test_course.id}/chapters/{chapter_id}"
+    chapter_etag = client.get(chapter_url, headers=headers).headers["etag"]
+    response = client.get(chapter_url, headers={**headers, "If-None-Match": chapter_etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # A replayed validator of a chapter that does not exist is no 304
+    from app.services import catalog
+    missing_etag = catalog.chapter_etag(regular_user, test_course, "missing-chapter", False)
+    response = client.get(
+        f"/courses/{test_course.id}/chapters/missing-chapter",
+        headers={**headers, "If-None-Match": missing_etag}
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    listing_etag = client.get("/courses", headers=headers).headers["etag"]
+    response = client.get("/courses", headers={**headers, "If-None-Match": listing_etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+def test_duplicate_progress_rows_rejected(db, regular_user, test_course):
+    """Test the (user_id, chapter_id) uniqueness of progress rows"""
+    from sqlalchemy.exc import IntegrityError
+    from app.db import models
+
+    chapter = test_course.chapters[0]
+    for _ in range(2):
+        db.add(models.UserProgress(
+            user_id=regular_user.id,
+            course_id=test_course.id,
+            chapter_id=chapter.id,
+            completed=True
+        ))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+
+def test_submit_quiz_batch(client, user_token, regular_user, db):
+    """Test grading several chapters of a course in one request"""
+    from app.db import models
+
+    _add_courses(db, course_count=1, chapters_per_course=3)
+    course = db.query(models.Course).one()
+    db.add(models.Enrollment(user_id=regular_user.id, course_id=course.id))
+    db.commit()
+    chapters = course.chapters
+
+    answers = {
+        chapters[0].id: {chapters[0].quizzes[0].id: 1},
+        chapters[1].id: {chapters[1].quizzes[0].id: 0},
+    }
+    response = client.post(
+        f"/courses/{course.id}/quiz/batch",
+        json={"chapters": answers},
+        headers={"Authorization": f"Bearer {user_token}"}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    results = response.json()["results"]
+    assert results[chapters[0].id]["passed"] is True
+    assert results[chapters[1].id]["score"] == 0
+
+    enrollment = db.query(models.Enrollment).filter(models.Enrollment.course_id == course.id).one()
+    db.refresh(enrollment)
+    assert enrollment.completed_chapters == 1
+    assert enrollment.total_chapters == 3
+
+
+def test_submit_quiz_batch_unknown_chapter(client, user_token, test_course):
+    """Test that a batch naming a chapter outside the course is rejected"""
+    headers = {"Authorization": f"Bearer {user_token}"}
+    client.post(
+        f"/courses/{test_course.id}/enroll",
+        json={"enrollmentCode": test_course.enrollment_code},
+        headers=headers
+    )
+
+    response = client.post(
+        f"/courses/{test_course.id}/quiz/batch",
+        json={"chapters": {"nonexistent-id": {}}},
+        headers=headers
+    )
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_progress_upsert_is_idempotent(client, user_token, regular_user, test_course, db):
+    """Test that repeated completions and a later failed quiz keep one completed row"""
+    from app.db import models
+
+    headers = {"Authorization": f"Bearer {user_token}"}
+    client.post(
+        f"/courses/{test_course.id}/enroll",
+        json={"enrollmentCode": test_course.enrollment_code},
+        headers=headers
+    )
+    chapter = test_course.chapters[0]
+    quiz = chapter.quizzes[0]
+
+    for _ in range(2):
+        response = client.post(f"/courses/{test_course.id}/chapters/{chapter.id}/complete", headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+
+    wrong_answer = (quiz.correct_option + 1) % len(quiz.options)
+    response = client.post(
+        f"/courses/{test_course.id}/chapters/{chapter.id}/quiz",
+        json={"answers": {quiz.id: wrong_answer}},
+        headers=headers
+    )
+    assert response.json()["passed"] is False
+
+    rows = db.query(models.UserProgress).filter(models.UserProgress.user_id == regular_user.id).all()
+    assert len(rows) == 1
+    db.refresh(rows[0])
+    assert rows[0].completed is True
+    assert rows[0].quiz_score == 0
+    assert rows[0].completed_at is not None
+
+
+def test_progress_upsert_portable_fallback(monkeypatch, regular_user, db):
+    """Test that databases without ON CONFLICT merge progress like the native upsert"""
+    from app.db import models
+    from app.services import progress
+
+    _add_courses(db, course_count=1, chapters_per_course=2)
+    course = db.query(models.Course).one()
+    first, second = (chapter.id for chapter in course.chapters)
+    monkeypatch.setattr(progress, "dialect_insert", lambda db: None)
+
+    def entry(chapter_id, completed, quiz_score=None):
+        return {
+            "user_id": regular_user.id,
+            "course_id": course.id,
+            "chapter_id": chapter_id,
+            "completed": completed,
+            "quiz_score": quiz_score
+        }
+
+    progress.save_progress(db, [entry(first, True, 100), entry(second, False, 0)])
+    completed_at = db.query(models.UserProgress.completed_at).filter(models.UserProgress.chapter_id == first).scalar()
+    rows = progress.save_progress(db, [entry(first, False), entry(second, True, 100)])
+
+    assert sorted((row.chapter_id, row.completed, row.quiz_score) for row in rows) == sorted([
+        (first, True, 100), (second, True, 100)
+    ])
+    assert db.query(models.UserProgress).count() == 2
+    stored = db.query(models.UserProgress.completed_at).filter(models.UserProgress.chapter_id == first).scalar()
+    assert stored == completed_at
+
+    # A score recorded before the stored one is ignored
+    from datetime import datetime, timezone
+
+    stale = {**entry(first, True, 10), "scored_at": datetime(2020, 1, 1, tzinfo=timezone.utc)}
+    rows = progress.save_progress(db, [stale])
+    assert rows[0].quiz_score == 100
+
+
+def test_progress_write_behind(monkeypatch, tmp_path, client, user_token, admin_token, regular_user, test_course, db):
+    """Test that buffered progress is visible to its user before the flush and persisted by it"""
+    from app.db import models
+    from app.services.progress_buffer import progress_buffer
+
+    monkeypatch.setattr(progress_buffer, "enabled", True)
+    monkeypatch.setattr(progress_buffer, "wal_dir", str(tmp_path))
+
+    headers = {"Authorization": f"Bearer {user_token}"}
+    client.post(
+        f"/courses/{test_course.id}/enroll",
+        json={"enrollmentCode": test_course.enrollment_code},
+        headers=headers
+    )
+    chapter = test_course.chapters[0]
+    etag = client.get(f"/courses/{test_course.id}", headers=headers).headers["etag"]
+
+    response = client.post(f"/courses/{test_course.id}/chapters/{chapter.id}/complete", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert db.query(models.UserProgress).count() == 0
+    assert len(list(tmp_path.glob("*.wal"))[0].read_text().splitlines()) == 1
+
+    # Own writes are merged into reads and change the validators
+    response = client.get(f"/courses/{test_course.id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["chapters"][0]["completed"] is True
+    assert data["progress"] > 0
+    response = client.get(f"/courses/{test_course.id}/chapters/{chapter.id}", headers=headers)
+    assert response.json()["completed"] is True
+
+    response = client.post(
+        "/admin/progress/write-behind/flush",
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.json() == {"flushed": 1}
+    assert not list(tmp_path.glob("*.flushing"))
+
+    row = db.query(models.UserProgress).filter(models.UserProgress.user_id == regular_user.id).one()
+    assert row.completed is True
+    enrollment = db.query(models.Enrollment).filter(models.Enrollment.user_id == regular_user.id).one()
+    db.refresh(enrollment)
+    assert enrollment.completed_chapters == 1
+    assert client.get(f"/courses/{test_course.id}", headers=headers).json()["progress"] == data["progress"]
+
+
+def test_progress_write_behind_dead_letters_rejected_events(monkeypatch, tmp_path, client, admin_token, regular_user, test_course, db):
+    """Test that events the database rejects are dead-lettered while the rest of the batch is written"""
+    import json
+
+    from app.db import models
+    from app.services.progress_buffer import progress_buffer
+
+    monkeypatch.setattr(progress_buffer, "enabled", True)
+    monkeypatch.setattr(progress_buffer, "wal_dir", str(tmp_path))
+    monkeypatch.setattr(progress_buffer, "dead_lettered", 0)
+
+    def event(chapter, course_id):
+        return {
+            "user_id": regular_user.id,
+            "course_id": course_id,
+            "chapter_id": chapter.id,
+            "completed": True,
+            "quiz_score": None,
+            "scored_at": None,
+            "completed_at": "2026-10-17T12:00:00+00:00"
+        }
+
+    first = test_course.chapters[0]
+    second = models.Chapter(course_id=test_course.id, title="Second", content="Body", order=2)
+    db.add(second)
+    db.commit()
+    progress_buffer.append(event(first, test_course.id))
+    # course_id is NOT NULL, so this one fails every write it is part of
+    progress_buffer.append(event(second, None))
+
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    assert client.post("/admin/progress/write-behind/flush", headers=headers).json() == {"flushed": 1}
+    assert not list(tmp_path.glob("*.flushing"))
+    assert client.get("/admin/progress/write-behind", headers=headers).json()["deadLettered"] == 1
+
+    rows = db.query(models.UserProgress.chapter_id).filter(models.UserProgress.user_id == regular_user.id).all()
+    assert rows == [(first.id,)]
+    dead = [json.loads(line) for line in (tmp_path / "dead-letter.jsonl").read_text().splitlines()]
+    assert [record["event"]["chapter_id"] for record in dead] == [second.id]
+    assert dead[0]["error"].startswith("IntegrityError")
+
+    # The next flush is not held up by the rejected event
+    progress_buffer.append(event(second, test_course.id))
+    assert client.post("/admin/progress/write-behind/flush", headers=headers).json() == {"flushed": 1}
+
+
+def test_progress_replay_keeps_newer_score(monkeypatch, tmp_path, client, admin_token, regular_user, test_course, db):
+    """Test that a replayed WAL event does not overwrite a score recorded after it"""
+    import json
+    from datetime import datetime, timedelta, timezone
+
+    from app.db import models
+    from app.services import progress
+    from app.services.progress_buffer import progress_buffer
+
+    monkeypatch.setattr(progress_buffer, "enabled", True)
+    monkeypatch.setattr(progress_buffer, "wal_dir", str(tmp_path))
+
+    chapter = test_course.chapters[0]
+    now = datetime.now(timezone.utc)
+    progress.save_progress(db, [{
+        "user_id": regular_user.id,
+        "course_id": test_course.id,
+        "chapter_id": chapter.id,
+        "completed": True,
+        "quiz_score": 90
+    }])
+
+    def event(score, recorded):
+        return {
+            "user_id": regular_user.id,
+            "course_id": test_course.id,
+            "chapter_id": chapter.id,
+            "completed": True,
+            "quiz_score": score,
+            "scored_at": recorded.isoformat(),
+            "completed_at": recorded.isoformat()
+        }
+
+    # A dead worker's WAL: the later event is listed first
+    wal = tmp_path / "progress-999999999-deadbeef.wal"
+    wal.write_text("".join(json.dumps(event(score, now - timedelta(minutes=minutes))) + "\n" for score, minutes in [
+        (40, 5), (10, 10)
+    ]))
+    assert progress_buffer.recover() == 2
+    response = client.post(
+        "/admin/progress/write-behind/flush",
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.json() == {"flushed": 1}
+
+    row = db.query(models.UserProgress).filter(models.UserProgress.user_id == regular_user.id).one()
+    db.refresh(row)
+    assert row.quiz_score == 90
+
+    # A score recorded later than the stored one still replaces it
+    progress_buffer.append(event(70, now + timedelta(seconds=1)))
+    progress_buffer.append(event(20, now - timedelta(minutes=1)))
+    client.post("/admin/progress/write-behind/flush", headers={"Authorization": f"Bearer {admin_token}"})
+    db.refresh(row)
+    assert row.quiz_score == 70
+
+
+def test_chapter_body_served_separately(monkeypatch, client, user_token, test_course, db):
+    """Test that course responses carry chapter metadata only and long bodies are streamed"""
+    from app.services.chapter_body import chapter_body
+
+    headers = {"Authorization": f"Bearer {user_token}"}
+    client.post(
+        f"/courses/{test_course.id}/enroll",
+        json={"enrollmentCode": test_course.enrollment_code},
+        headers=headers
+    )
+    chapter = test_course.chapters[0]
+    chapter.content = "Глава \"первая\"\n" + "x" * 100 + "\\ конец"
+    db.commit()
+
+    course = client.get(f"/courses/{test_course.id}", headers=headers).json()
+    assert "content" not in course["chapters"][0]
+    assert "content" not in client.get("/courses", headers=headers).json()[0]["chapters"][0]
+
+    url = f"/courses/{test_course.id}/chapters/{chapter.id}"
+    response = client.get(url, headers=headers)
+    assert response.json()["content"] == chapter.content
+
+    monkeypatch.setattr(chapter_body, "chunk_size", 7)
+    response = client.get(url, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/json"
+    assert "content-length" not in response.headers
+    data = response.json()
+    assert data["content"] == chapter.content
+    assert data["id"] == chapter.id
+    assert data["quiz"][0]["question"] == "What is 2+2?"
+
+    response = client.get(url, headers={**headers, "If-None-Match": response.headers["etag"]})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+def test_chapter_stream_aborts_when_chapter_changes(monkeypatch, client, user_token, test_course, db):
+    """Test that a chapter edited before or during streaming aborts the response"""
+    from app.services import chapter_body as chapter_body_module
+    from app.services.chapter_body import ChapterChanged, chapter_body
+
+    headers = {"Authorization": f"Bearer {user_token}"}
+    client.post(
+        f"/courses/{test_course.id}/enroll",
+        json={"enrollmentCode": test_course.enrollment_code},
+        headers=headers
+    )
+    chapter = test_course.chapters[0]
+    chapter.content = "x" * 50
+    db.commit()
+    url = f"/courses/{test_course.id}/chapters/{chapter.id}"
+    monkeypatch.setattr(chapter_body, "chunk_size", 7)
+
+    def assert_aborted():
+        # The middleware task group may wrap the error in an ExceptionGroup
+        with pytest.raises(Exception) as excinfo:
+            client.get(url, headers=headers)
+        error = excinfo.value
+        while isinstance(error, BaseExceptionGroup):
+            error = error.exceptions[0]
+        assert isinstance(error, ChapterChanged)
+
+    # Changed between the head read and the stream: nothing is sent
+    head = chapter_body.head
+    monkeypatch.setattr(chapter_body, "head", lambda *args: (lambda length, first: (length + 1, first))(*head(*args)))
+    assert_aborted()
+    monkeypatch.setattr(chapter_body, "head", head)
+
+    # Changed after a few chunks: the version guard finds no row
+    calls = []
+    original_slice = chapter_body_module._slice
+
+    def edited_slice(chapter_id, version, start, size):
+        calls.append(start)
+        return original_slice(chapter_id, version + (len(calls) > 2), start, size)
+
+    monkeypatch.setattr(chapter_body_module, "_slice", edited_slice)
+    assert_aborted()
+    assert len(calls) == 3
+
+    monkeypatch.setattr(chapter_body_module, "_slice", original_slice)
+    assert client.get(url, headers=headers).json()["content"] == chapter.content
+
+
+def test_trusted_responses_match_schema(monkeypatch, client, user_token, test_course):
+    """Test that course payloads rendered without validation equal their validated form"""
+    from app.core import responses
+
+    headers = {"Authorization": f"Bearer {user_token}"}
+    client.post(
+        f"/courses/{test_course.id}/enroll",
+        json={"enrollmentCode": test_course.enrollment_code},
+        headers=headers
+    )
+    urls = [
+        "/courses",
+        "/courses/summary",
+        f"/courses/{test_course.id}",
+        f"/courses/{test_course.id}/chapters/{test_course.chapters[0].id}"
+    ]
+
+    monkeypatch.setattr(responses, "VALIDATE_RESPONSES", True)
+    validated = [client.get(url, headers=headers) for url in urls]
+    monkeypatch.setattr(responses, "VALIDATE_RESPONSES", False)
+    trusted = [client.get(url, headers=headers) for url in urls]
+
+    for before, after in zip(validated, trusted):
+        assert after.status_code == status.HTTP_200_OK
+        assert after.headers["content-type"] == "application/json"
+        assert after.headers.get("etag") == before.headers.get("etag")
+        assert after.json() == before.json()
+
+
+def test_course_responses_compressed(monkeypatch, client, user_token, admin_token, test_course, db):
+    """Test negotiated compression, weak validators and the compressed course cache"""
+    from app.db import models
+    from app.services.chapter_body import chapter_body
+    from app.services.course_cache import course_cache
+
+    for i in range(1, 20):
+        db.add(models.Chapter(course_id=test_course.id, title=f"Chapter {i + 1}", content="Body " * 400, order=i))
+    test_course.version += 1
+    db.commit()
+    headers = {"Authorization": f"Bearer {user_token}"}
+    client.post(
+        f"/courses/{test_course.id}/enroll",
+        json={"enrollmentCode": test_course.enrollment_code},
+        headers=headers
+    )
+    course_cache.clear()
+    url = f"/courses/{test_course.id}"
+
+    response = client.get(url, headers={**headers, "Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert response.headers["etag"].startswith('W/"')
+    assert len(response.json()["chapters"]) == 20
+
+    again = client.get(url, headers={**headers, "Accept-Encoding": "gzip"})
+    assert again.json() == response.json()
+    # Course bodies carry per-user progress and are not cached compressed
+    assert course_cache.stats()["encoded"]["entries"] == 0
+
+    response = client.get(url, headers={**headers, "Accept-Encoding": "gzip", "If-None-Match": again.headers["etag"]})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["vary"] == "Accept-Encoding"
+
+    response = client.get(url, headers={**headers, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert not response.headers["etag"].startswith("W/")
+    response = client.get("/auth/me", headers={**headers, "Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+    # Chapter bodies are the same for every enrolled user: compressed once
+    chapter_url = f"{url}/chapters/{db.query(models.Chapter).filter(models.Chapter.order == 5).one().id}"
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    client.post(
+        f"/courses/{test_course.id}/enroll",
+        json={"enrollmentCode": test_course.enrollment_code},
+        headers=admin_headers
+    )
+    first = client.get(chapter_url, headers={**headers, "Accept-Encoding": "gzip"})
+    second = client.get(chapter_url, headers={**admin_headers, "Accept-Encoding": "gzip"})
+    assert second.headers["content-encoding"] == "gzip"
+    assert second.json() == first.json()
+    assert course_cache.stats()["encoded"]["hits"] == 1
+
+    # Streamed chapter bodies are compressed chunk by chunk
+    monkeypatch.setattr(chapter_body, "chunk_size", 100)
+    chapter = test_course.chapters[0]
+    response = client.get(f"{url}/chapters/{chapter.id}", headers={**headers, "Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.json()["content"] == "Chapter content"
+    response = client.get(
+        f"{url}/chapters/{db.query(models.Chapter).filter(models.Chapter.order == 5).one().id}",
+        headers={**headers, "Accept-Encoding": "gzip"}
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.json()["content"] == "Body " * 400
+
+
+def test_accept_encoding_negotiation(monkeypatch):
+    """Test that brotli is preferred when offered and q-values are honoured"""
+    from app.core import compression
+
+    monkeypatch.setattr(compression, "brotli", None)
+    assert compression.negotiate("gzip, deflate, br") == "gzip"
+    assert compression.negotiate("br") is None
+    assert compression.negotiate("gzip;q=0, *;q=0.5") is None
+
+    monkeypatch.setattr(compression, "brotli", object())
+    assert compression.negotiate("gzip, deflate, br") == "br"
+    assert compression.negotiate("gzip;q=1.0, br;q=0.5") == "gzip"
+    assert compression.negotiate("*") == "br"
+    assert compression.negotiate("identity") is None
+
+
+def test_brotli_compression(client, user_token, test_course):
+    """Test that clients accepting br get brotli when it is installed"""
+    brotli = pytest.importorskip("brotli")
+    from app.core.compression import compress
+
+    body = b'{"content": "' + b"brotli " * 500 + b'"}'
+    assert brotli.decompress(compress(body, "br")) == body
+    response = client.get("/courses", headers={"Authorization": f"Bearer {user_token}", "Accept-Encoding": "br"})
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_quiz_grading_uses_answer_key_index(client, user_token, admin_token, test_course):
+    """Test that repeat submissions are graded without a quiz query and admin edits reach the index"""
+    from app.services.answer_keys import answer_keys
+
+    headers = {"Authorization": f"Bearer {user_token}"}
+    client.post(
+        f"/courses/{test_course.id}/enroll",
+        json={"enrollmentCode": test_course.enrollment_code},
+        headers=headers
+    )
+    chapter = test_course.chapters[0]
+    quiz = chapter.quizzes[0]
+    url = f"/courses/{test_course.id}/chapters/{chapter.id}/quiz"
+
+    assert client.post(url, json={"answers": {quiz.id: 1}}, headers=headers).json()["score"] == 100
+    hits = answer_keys.hits
+    assert client.post(url, json={"answers": {quiz.id: 2}}, headers=headers).json()["score"] == 0
+    assert answer_keys.hits == hits + 1
+
+    client.put(
+        f"/admin/courses/{test_course.id}",
+        json={
+            "title": test_course.title,
+            "description": test_course.description,
+            "imageUrl": test_course.image_url,
+            "chapters": [{"id": chapter.id, "title": chapter.title, "content": chapter.content, "quiz": [
+                {"id": quiz.id, "question": quiz.question, "options": quiz.options, "correctOption": 2}
+            ]}]
+        },
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert client.post(url, json={"answers": {quiz.id: 2}}, headers=headers).json()["score"] == 100
+
+    response = client.post(
+        f"/courses/{test_course.id}/quiz/batch",
+        json={"chapters": {chapter.id: {quiz.id: 1}}},
+        headers=headers
+    )
+    assert response.json()["results"][chapter.id]["score"] == 0
+
+
+def test_answer_key_grade_many_matches_grade():
+    """Test that single and batched answer-key grading score submissions like the reference grade"""
+    from array import array
+    from app.services.answer_keys import AnswerKey
+    from app.services.grading import grade
+
+    pairs = [("q1", 0), ("q2", 3), ("q3", 1)]
+    key = AnswerKey(tuple(quiz_id for quiz_id, _ in pairs), array("i", (option for _, option in pairs)))
+    submissions = [
+        {"q1": 0, "q2": 3, "q3": 1},
+        {"q1": 0, "q2": 2},
+        {},
+        {"q1": 1, "q2": 3, "q3": 1, "unknown": 0},
+        {"q1": 10 ** 20, "q3": -1}
+    ]
+
+    expected = [grade(pairs, answers) for answers in submissions]
+    assert key.grade_many(submissions) == expected
+    assert [key.grade(answers) for answers in submissions] == expected
+    assert key.correct_counts(submissions) == [result["correctAnswers"] for result in expected]
+    assert AnswerKey((), array("i")).grade_many([{}]) == [grade([], {})]
+
+
+def test_leaderboard(client, user_token, admin_token, regular_user, db):
+    """Test that quiz submissions update the course leaderboard and that it rebuilds from progress"""
+    from app.db import models
+    from app.services.leaderboard import leaderboards
+    from app.services.progress import save_progress
+
+    _add_courses(db, course_count=1, chapters_per_course=3)
+    course = db.query(models.Course).one()
+    chapters = course.chapters
+    others = [models.User(email=f"student{i}@test.com", name=f"Student {i}", hashed_password="x") for i in range(2)]
+    db.add_all(others)
+    db.flush()
+    for user in [regular_user, *others]:
+        db.add(models.Enrollment(user_id=user.id, course_id=course.id))
+    db.commit()
+    save_progress(db, [
+        {"user_id": others[0].id, "course_id": course.id, "chapter_id": chapters[0].id, "completed": True, "quiz_score": 100},
+        {"user_id": others[0].id, "course_id": course.id, "chapter_id": chapters[1].id, "completed": True, "quiz_score": 100},
+        {"user_id": others[1].id, "course_id": course.id, "chapter_id": chapters[0].id, "completed": True, "quiz_score": 100}
+    ])
+
+    headers = {"Authorization": f"Bearer {user_token}"}
+    url = f"/courses/{course.id}/leaderboard"
+    response = client.get(url, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["me"] is None
+
+    client.post(
+        f"/courses/{course.id}/quiz/batch",
+        json={"chapters": {chapters[0].id: {chapters[0].quizzes[0].id: 1}, chapters[1].id: {chapters[1].quizzes[0].id: 0}}},
+        headers=headers
+    )
+    data = client.get(url, params={"limit": 2}, headers=headers).json()
+    assert data["students"] == 3
+    assert [(entry["rank"], entry["name"], entry["totalScore"]) for entry in data["entries"]][0] == (1, "Student 0", 200)
+    assert [entry["rank"] for entry in data["entries"]] == [1, 2]
+    assert data["me"] == {"rank": 2, "userId": regular_user.id, "name": regular_user.name, "totalScore": 100, "quizzes": 2}
+    page = client.get(url, params={"limit": 10, "offset": 2}, headers=headers).json()["entries"]
+    assert [entry["rank"] for entry in page] == [2]
+
+    # Two more correct answers move the student to the top
+    for chapter in chapters[1:]:
+        client.post(
+            f"/courses/{course.id}/chapters/{chapter.id}/quiz",
+            json={"answers": {chapter.quizzes[0].id: 1}},
+            headers=headers
+        )
+    data = client.get(url, headers=headers).json()
+    assert data["me"]["rank"] == 1
+    assert data["me"]["totalScore"] == 300
+    ranking = [(entry["userId"], entry["rank"], entry["totalScore"]) for entry in data["entries"]]
+    assert ranking == [(regular_user.id, 1, 300), (others[0].id, 2, 200), (others[1].id, 3, 100)]
+
+    # The stored totals are rebuilt from user_progress on demand
+    db.query(models.LeaderboardEntry).delete()
+    db.commit()
+    leaderboards.clear()
+    assert client.get(url, headers=headers).json()["students"] == 0
+    response = client.post("/admin/leaderboards/rebuild", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["students"] == 3
+    data = client.get(url, headers=headers).json()
+    assert [(entry["userId"], entry["rank"], entry["totalScore"]) for entry in data["entries"]] == ranking
+
+
+def test_leaderboard_syncs_changed_rows(monkeypatch, client, regular_user, db):
+    """Test that an expired board applies only the rows changed since it was loaded"""
+    from datetime import datetime
+
+    from app.db import models
+    from app.services.leaderboard import leaderboards
+    from app.services.progress import save_progress
+
+    _add_courses(db, course_count=1, chapters_per_course=1)
+    course = db.query(models.Course).one()
+    chapter = course.chapters[0]
+    others = [models.User(email=f"student{i}@test.com", name=f"Student {i}", hashed_password="x") for i in range(2)]
+    db.add_all(others)
+    db.flush()
+    for user in [regular_user, *others]:
+        db.add(models.Enrollment(user_id=user.id, course_id=course.id))
+    db.commit()
+    save_progress(db, [
+        {"user_id": user.id, "course_id": course.id, "chapter_id": chapter.id, "completed": True, "quiz_score": score}
+        for user, score in zip(others, (100, 50))
+    ])
+    monkeypatch.setattr(leaderboards, "ttl", 0)
+    monkeypatch.setattr(leaderboards, "sync_margin", 0)
+
+    def ranking():
+        return [(entry["userId"], entry["totalScore"]) for entry in leaderboards.top(db, course.id, 10)[1]]
+
+    assert ranking() == [(others[0].id, 100), (others[1].id, 50)]
+    loads, syncs = leaderboards.loads, leaderboards.syncs
+
+    entry = models.LeaderboardEntry
+    row = lambda user: db.query(entry).filter(entry.course_id == course.id, entry.user_id == user.id)
+    # Written by another worker: only reaches the board through the table
+    row(others[1]).update({"total_score": 300, "updated_at": datetime(2100, 1, 1)}, synchronize_session=False)
+    # Changed without a newer updated_at, so a sync does not read it
+    row(others[0]).update({"total_score": 10, "updated_at": datetime(2000, 1, 1)}, synchronize_session=False)
+    db.commit()
+    assert ranking() == [(others[1].id, 300), (others[0].id, 100)]
+    assert (leaderboards.loads, leaderboards.syncs) == (loads, syncs + 1)
+
+    # A deleted row shows up as a count mismatch and forces a full load
+    row(others[1]).delete(synchronize_session=False)
+    db.commit()
+    assert ranking() == [(others[0].id, 10)]
+    assert (leaderboards.loads, leaderboards.syncs) == (loads + 1, syncs + 2)
+
+
+def test_leaderboard_totals_portable_fallback(monkeypatch, regular_user, db):
+    """Test that databases without ON CONFLICT store the same leaderboard totals"""
+    from app.db import models
+    from app.services import leaderboard
+    from app.services.progress import save_progress
+
+    _add_courses(db, course_count=1, chapters_per_course=2)
+    course = db.query(models.Course).one()
+    first, second = (chapter.id for chapter in course.chapters)
+    monkeypatch.setattr(leaderboard, "dialect_insert", lambda db: None)
+
+    def entry(chapter_id, quiz_score):
+        return {
+            "user_id": regular_user.id,
+            "course_id": course.id,
+            "chapter_id": chapter_id,
+            "completed": True,
+            "quiz_score": quiz_score
+        }
+
+    save_progress(db, [entry(first, 100)])
+    save_progress(db, [entry(second, 50)])
+    assert leaderboard.refresh_leaderboard_totals(db, [(regular_user.id, course.id)]) == [
+        (course.id, regular_user.id, 150, 2)
+    ]
+    assert db.query(models.LeaderboardEntry.total_score).one() == (150,)
+
+    assert leaderboard.rebuild_leaderboard_totals(db, course.id) == 1
+    assert db.query(models.LeaderboardEntry.total_score, models.LeaderboardEntry.quizzes).one() == (150, 2)
+
+
+def test_sorted_keys_matches_sorted_list():
+    """Test the leaderboard's sorted structure against a plain sorted list"""
+    import random
+    from bisect import bisect_left
+    from app.services.leaderboard import SortedKeys
+
+    rng = random.Random(7)
+    keys = SortedKeys([(rng.randrange(50), i) for i in range(20)], load=4)
+    expected = sorted(keys)
+    for i in range(20, 600):
+        if expected and rng.random() < 0.4:
+            key = expected[rng.randrange(len(expected))]
+            keys.remove(key)
+            expected.remove(key)
+        else:
+            key = (rng.randrange(50), i)
+            keys.add(key)
+            expected.append(key)
+            expected.sort()
+        probe = (rng.randrange(50),)
+        start = rng.randrange(len(expected) + 2)
+        assert len(keys) == len(expected)
+        assert keys.position(probe) == bisect_left(expected, probe)
+        assert keys.page(start, 5) == expected[start:start + 5]
+    assert list(keys) == expected
+    with pytest.raises(ValueError):
+        keys.remove((99, -1))
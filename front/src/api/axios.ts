@@ -1,4 +1,4 @@
-import axios from "axios";
+import axios, { InternalAxiosRequestConfig } from "axios";
 
 const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
 
@@ -7,8 +7,16 @@ const api = axios.create({
   headers: {
     "Content-Type": "application/json",
   },
+  // 304 Not Modified is answered from the ETag cache below
+  validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
 });
 
+// Last ETag and body per GET url, used to send If-None-Match validators
+const etagCache = new Map<string, { etag: string; data: unknown }>();
+
+const etagCacheKey = (config: InternalAxiosRequestConfig) =>
+  `${config.url ?? ""}?${new URLSearchParams(config.params ?? {}).toString()}`;
+
 // Add request interceptor to include auth token in requests
 api.interceptors.request.use(
   (config) => {
@@ -16,6 +24,12 @@ api.interceptors.request.use(
     if (token) {
       config.headers["Authorization"] = `Bearer ${token}`;
     }
+    if ((config.method ?? "get").toLowerCase() === "get") {
+      const cached = etagCache.get(etagCacheKey(config));
+      if (cached) {
+        config.headers["If-None-Match"] = cached.etag;
+      }
+    }
     return config;
   },
   (error) => {
@@ -26,6 +40,18 @@ api.interceptors.request.use(
 // Add response interceptor to handle common errors
 api.interceptors.response.use(
   (response) => {
+    if ((response.config.method ?? "get").toLowerCase() === "get") {
+      const key = etagCacheKey(response.config);
+      if (response.status === 304) {
+        const cached = etagCache.get(key);
+        if (cached) {
+          response.data = cached.data;
+          response.status = 200;
+        }
+      } else if (response.headers["etag"]) {
+        etagCache.set(key, { etag: response.headers["etag"], data: response.data });
+      }
+    }
     return response;
   },
   (error) => {
@@ -33,6 +59,7 @@ api.interceptors.response.use(
     if (error.response && error.response.status === 401) {
       localStorage.removeItem("token");
       localStorage.removeItem("user");
+      etagCache.clear();
       window.location.href = "/login";
     }
     return Promise.reject(error);
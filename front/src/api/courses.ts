@@ -1,5 +1,5 @@
 import api from "./axios";
-import { Course, Chapter, Quiz } from "../types/course";
+import { Course, CourseDetail, Chapter, Quiz, CourseDeletionJob, CourseSummaryPage } from "../types/course";
 
 // Get all courses
 export const getAllCourses = async () => {
@@ -13,6 +13,20 @@ export const getUserCourses = async () => {
   return response.data;
 };
 
+// Get one page of course summaries (no chapter content or quizzes);
+// pass the previous page's nextCursor to get the next one
+export const getCourseSummaries = async (cursor?: string | null, limit = 20, enrolled = false) => {
+  const params: Record<string, string | number | boolean> = { limit };
+  if (cursor) {
+    params.cursor = cursor;
+  }
+  if (enrolled) {
+    params.enrolled = true;
+  }
+  const response = await api.get<CourseSummaryPage>("/courses/summary", { params });
+  return response.data;
+};
+
 // Get a single course by ID
 export const getCourseById = async (id: string) => {
   const response = await api.get<Course>(`/courses/${id}`);
@@ -41,21 +55,33 @@ export const submitQuizAnswers = async (
   return response.data;
 };
 
+// Admin: Get a course with every chapter body, for editing
+export const getCourseDetail = async (id: string) => {
+  const response = await api.get<CourseDetail>(`/admin/courses/${id}`);
+  return response.data;
+};
+
 // Admin: Create a new course
-export const createCourse = async (courseData: Omit<Course, "id">) => {
+export const createCourse = async (courseData: Omit<CourseDetail, "id">) => {
   const response = await api.post<Course>("/admin/courses", courseData);
   return response.data;
 };
 
 // Admin: Update an existing course
-export const updateCourse = async (courseId: string, courseData: Partial<Course>) => {
+export const updateCourse = async (courseId: string, courseData: Partial<CourseDetail>) => {
   const response = await api.put<Course>(`/admin/courses/${courseId}`, courseData);
   return response.data;
 };
 
-// Admin: Delete a course
+// Admin: Delete a course. The course is hidden at once and removed by a background job
 export const deleteCourse = async (courseId: string) => {
-  const response = await api.delete(`/admin/courses/${courseId}`);
+  const response = await api.delete<CourseDeletionJob>(`/admin/courses/${courseId}`);
+  return response.data;
+};
+
+// Admin: Status of a course deletion job
+export const getCourseDeletionJob = async (jobId: string) => {
+  const response = await api.get<CourseDeletionJob>(`/admin/courses/deletions/${jobId}`);
   return response.data;
 };
 
@@ -2,10 +2,10 @@ import React from "react";
 import { Link } from "react-router-dom";
 import { Card, CardBody, CardFooter, Image, Button, Progress } from "@heroui/react";
 import { Icon } from "@iconify/react";
-import { Course } from "../data/courses";
+import { CourseSummary } from "../types/course";
 
 interface CourseCardProps {
-  course: Course;
+  course: Pick<CourseSummary, "id" | "title" | "description" | "imageUrl" | "progress" | "enrolled">;
 }
 
 export const CourseCard: React.FC<CourseCardProps> = ({ course }) => {
@@ -0,0 +1,25 @@
+import React from "react";
+import { Button } from "@heroui/react";
+
+interface LoadMoreButtonProps {
+  pages: {
+    hasMore: boolean;
+    isLoadingMore: boolean;
+    loadMore: () => void;
+  };
+}
+
+// "Load more" under a paged list, shown while there is a next page
+export const LoadMoreButton: React.FC<LoadMoreButtonProps> = ({ pages }) => {
+  if (!pages.hasMore) {
+    return null;
+  }
+
+  return (
+    <div className="flex justify-center mt-6">
+      <Button variant="flat" isLoading={pages.isLoadingMore} onPress={pages.loadMore}>
+        Load more
+      </Button>
+    </div>
+  );
+};
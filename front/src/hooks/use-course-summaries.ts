@@ -0,0 +1,80 @@
+import React from "react";
+import { getCourseSummaries } from "../api/courses";
+import { CourseSummary } from "../types/course";
+
+const COURSE_PAGE_SIZE = 20;
+
+interface CourseSummariesOptions {
+  enrolled?: boolean;
+  enabled?: boolean;
+}
+
+// Course summaries fetched one page at a time: the first page on mount,
+// the next one from its nextCursor each time loadMore is called
+export const useCourseSummaries = ({ enrolled = false, enabled = true }: CourseSummariesOptions = {}) => {
+  const [courses, setCourses] = React.useState<CourseSummary[]>([]);
+  const [nextCursor, setNextCursor] = React.useState<string | null>(null);
+  const [isLoading, setIsLoading] = React.useState(true);
+  const [isLoadingMore, setIsLoadingMore] = React.useState(false);
+  const [error, setError] = React.useState<string | null>(null);
+
+  React.useEffect(() => {
+    if (!enabled) {
+      return;
+    }
+    let cancelled = false;
+
+    const fetchFirstPage = async () => {
+      try {
+        setIsLoading(true);
+        setError(null);
+        const page = await getCourseSummaries(null, COURSE_PAGE_SIZE, enrolled);
+        if (!cancelled) {
+          setCourses(page.items);
+          setNextCursor(page.nextCursor);
+        }
+      } catch (err) {
+        console.error("Failed to fetch courses:", err);
+        if (!cancelled) {
+          setError("Failed to load courses. Please try again later.");
+        }
+      } finally {
+        if (!cancelled) {
+          setIsLoading(false);
+        }
+      }
+    };
+
+    fetchFirstPage();
+    return () => {
+      cancelled = true;
+    };
+  }, [enrolled, enabled]);
+
+  const loadMore = async () => {
+    if (!nextCursor || isLoadingMore) {
+      return;
+    }
+    try {
+      setIsLoadingMore(true);
+      const page = await getCourseSummaries(nextCursor, COURSE_PAGE_SIZE, enrolled);
+      setCourses(prev => [...prev, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error("Failed to fetch more courses:", err);
+      setError("Failed to load more courses. Please try again.");
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
+  return {
+    courses,
+    setCourses,
+    isLoading,
+    isLoadingMore,
+    hasMore: nextCursor !== null,
+    loadMore,
+    error
+  };
+};
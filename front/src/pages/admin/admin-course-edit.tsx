@@ -3,7 +3,7 @@ import { useParams, useHistory } from "react-router-dom";
 import { Card, CardBody, CardHeader, CardFooter, Button, Input, Textarea, Divider } from "@heroui/react";
 import { Icon } from "@iconify/react";
 import { Layout } from "../../components/layout";
-import { getCourseById, updateCourse as apiUpdateCourse } from "../../api/courses";
+import { getCourseDetail, updateCourse as apiUpdateCourse } from "../../api/courses";
 import { ChapterForm } from "../../components/chapter-form";
 import { Course } from "../../types/course";
 
@@ -39,7 +39,7 @@ export const AdminCourseEdit: React.FC = () => {
     const loadCourse = async () => {
       try {
         setIsLoading(true);
-        const course = await getCourseById(courseId);
+        const course = await getCourseDetail(courseId);
         
         if (course) {
           setCourseData({
@@ -3,37 +3,45 @@ import { Link } from "react-router-dom";
 import { Card, CardBody, CardHeader, CardFooter, Button, Table, TableHeader, TableColumn, TableBody, TableRow, TableCell, Chip, Divider } from "@heroui/react";
 import { Icon } from "@iconify/react";
 import { Layout } from "../../components/layout";
-import { getAllCourses, deleteCourse as apiDeleteCourse } from "../../api/courses";
-import { Course } from "../../types/course";
+import { LoadMoreButton } from "../../components/load-more-button";
+import { deleteCourse as apiDeleteCourse, getCourseDeletionJob } from "../../api/courses";
+import { useCourseSummaries } from "../../hooks/use-course-summaries";
+import { CourseDeletionJob } from "../../types/course";
+
+const DELETION_POLL_INTERVAL_MS = 1000;
 
 export const AdminDashboard: React.FC = () => {
-  const [courses, setCourses] = React.useState<Course[]>([]);
-  const [isLoading, setIsLoading] = React.useState(true);
-  const [error, setError] = React.useState<string | null>(null);
+  const coursePages = useCourseSummaries();
+  const { courses, setCourses, isLoading } = coursePages;
+  const [deletions, setDeletions] = React.useState<Record<string, CourseDeletionJob>>({});
+  // Stats cover the pages loaded so far
+  const more = coursePages.hasMore ? "+" : "";
 
-  React.useEffect(() => {
-    const fetchCourses = async () => {
-      try {
-        setIsLoading(true);
-        setError(null);
-        const coursesData = await getAllCourses();
-        setCourses(coursesData);
-      } catch (err) {
-        console.error("Failed to fetch courses:", err);
-        setError("Failed to load courses. Please try again later.");
-      } finally {
-        setIsLoading(false);
-      }
-    };
-    
-    fetchCourses();
-  }, []);
+  // Poll a deletion job until the background delete finishes
+  const trackDeletion = async (job: CourseDeletionJob) => {
+    let current = job;
+    while (current.status === "pending" || current.status === "running") {
+      setDeletions(prev => ({ ...prev, [current.courseId]: current }));
+      await new Promise(resolve => setTimeout(resolve, DELETION_POLL_INTERVAL_MS));
+      current = await getCourseDeletionJob(current.id);
+    }
+
+    if (current.status === "completed") {
+      setCourses(prev => prev.filter(course => course.id !== current.courseId));
+      setDeletions(prev => {
+        const { [current.courseId]: _, ...rest } = prev;
+        return rest;
+      });
+    } else {
+      setDeletions(prev => ({ ...prev, [current.courseId]: current }));
+    }
+  };
 
   const handleDeleteCourse = async (courseId: string) => {
     if (window.confirm("Are you sure you want to delete this course? This action cannot be undone.")) {
       try {
-        await apiDeleteCourse(courseId);
-        setCourses(courses.filter(course => course.id !== courseId));
+        const job = await apiDeleteCourse(courseId);
+        await trackDeletion(job);
       } catch (err) {
         console.error("Failed to delete course:", err);
         alert("Failed to delete course. Please try again.");
@@ -69,89 +77,103 @@ export const AdminDashboard: React.FC = () => {
               <p>Loading courses...</p>
             </div>
           ) : courses.length > 0 ? (
-            <Table removeWrapper aria-label="Courses table">
-              <TableHeader>
-                <TableColumn>TITLE</TableColumn>
-                <TableColumn>ENROLLMENT CODE</TableColumn>
-                <TableColumn>CHAPTERS</TableColumn>
-                <TableColumn>STATUS</TableColumn>
-                <TableColumn>ACTIONS</TableColumn>
-              </TableHeader>
-              <TableBody>
-                {courses.map((course) => (
-                  <TableRow key={course.id}>
-                    <TableCell>
-                      <div className="flex items-center gap-3">
-                        <div className="w-12 h-12 rounded overflow-hidden">
-                          <img 
-                            src={course.imageUrl} 
-                            alt={course.title} 
-                            className="w-full h-full object-cover"
-                          />
-                        </div>
-                        <div>
-                          <p className="font-medium">{course.title}</p>
-                          <p className="text-default-500 text-small line-clamp-1">
-                            {course.description}
-                          </p>
+            <>
+              <Table removeWrapper aria-label="Courses table">
+                <TableHeader>
+                  <TableColumn>TITLE</TableColumn>
+                  <TableColumn>ENROLLMENT CODE</TableColumn>
+                  <TableColumn>CHAPTERS</TableColumn>
+                  <TableColumn>STATUS</TableColumn>
+                  <TableColumn>ACTIONS</TableColumn>
+                </TableHeader>
+                <TableBody>
+                  {courses.map((course) => (
+                    <TableRow key={course.id}>
+                      <TableCell>
+                        <div className="flex items-center gap-3">
+                          <div className="w-12 h-12 rounded overflow-hidden">
+                            <img 
+                              src={course.imageUrl} 
+                              alt={course.title} 
+                              className="w-full h-full object-cover"
+                            />
+                          </div>
+                          <div>
+                            <p className="font-medium">{course.title}</p>
+                            <p className="text-default-500 text-small line-clamp-1">
+                              {course.description}
+                            </p>
+                          </div>
                         </div>
-                      </div>
-                    </TableCell>
-                    <TableCell>
-                      {course.enrollmentCode ? (
-                        <div className="flex items-center gap-2">
-                          <code className="px-2 py-1 bg-default-100 rounded text-sm font-mono font-semibold">
-                            {course.enrollmentCode}
-                          </code>
+                      </TableCell>
+                      <TableCell>
+                        {course.enrollmentCode ? (
+                          <div className="flex items-center gap-2">
+                            <code className="px-2 py-1 bg-default-100 rounded text-sm font-mono font-semibold">
+                              {course.enrollmentCode}
+                            </code>
+                            <Button
+                              size="sm"
+                              variant="light"
+                              isIconOnly
+                              onPress={() => {
+                                navigator.clipboard.writeText(course.enrollmentCode || "");
+                                alert("Enrollment code copied to clipboard!");
+                              }}
+                            >
+                              <Icon icon="lucide:copy" size={16} />
+                            </Button>
+                          </div>
+                        ) : (
+                          <span className="text-default-400 text-sm">N/A</span>
+                        )}
+                      </TableCell>
+                      <TableCell>{course.chapterCount}</TableCell>
+                      <TableCell>
+                        {deletions[course.id]?.status === "failed" ? (
+                          <Chip color="danger" variant="flat" size="sm">
+                            Delete failed
+                          </Chip>
+                        ) : deletions[course.id] ? (
+                          <Chip color="warning" variant="flat" size="sm">
+                            Deleting...
+                          </Chip>
+                        ) : (
+                          <Chip color="success" variant="flat" size="sm">
+                            Active
+                          </Chip>
+                        )}
+                      </TableCell>
+                      <TableCell>
+                        <div className="flex gap-2">
+                          <Button
+                            as={Link}
+                            to={`/admin/courses/${course.id}/edit`}
+                            size="sm"
+                            variant="flat"
+                            color="primary"
+                            startContent={<Icon icon="lucide:edit" size={16} />}
+                          >
+                            Edit
+                          </Button>
                           <Button
                             size="sm"
-                            variant="light"
-                            isIconOnly
-                            onPress={() => {
-                              navigator.clipboard.writeText(course.enrollmentCode || "");
-                              alert("Enrollment code copied to clipboard!");
-                            }}
+                            variant="flat"
+                            color="danger"
+                            startContent={<Icon icon="lucide:trash" size={16} />}
+                            isDisabled={deletions[course.id] !== undefined && deletions[course.id].status !== "failed"}
+                            onPress={() => handleDeleteCourse(course.id)}
                           >
-                            <Icon icon="lucide:copy" size={16} />
+                            Delete
                           </Button>
                         </div>
-                      ) : (
-                        <span className="text-default-400 text-sm">N/A</span>
-                      )}
-                    </TableCell>
-                    <TableCell>{course.chapters.length}</TableCell>
-                    <TableCell>
-                      <Chip color="success" variant="flat" size="sm">
-                        Active
-                      </Chip>
-                    </TableCell>
-                    <TableCell>
-                      <div className="flex gap-2">
-                        <Button
-                          as={Link}
-                          to={`/admin/courses/${course.id}/edit`}
-                          size="sm"
-                          variant="flat"
-                          color="primary"
-                          startContent={<Icon icon="lucide:edit" size={16} />}
-                        >
-                          Edit
-                        </Button>
-                        <Button
-                          size="sm"
-                          variant="flat"
-                          color="danger"
-                          startContent={<Icon icon="lucide:trash" size={16} />}
-                          onPress={() => handleDeleteCourse(course.id)}
-                        >
-                          Delete
-                        </Button>
-                      </div>
-                    </TableCell>
-                  </TableRow>
-                ))}
-              </TableBody>
-            </Table>
+                      </TableCell>
+                    </TableRow>
+                  ))}
+                </TableBody>
+              </Table>
+              <LoadMoreButton pages={coursePages} />
+            </>
           ) : (
             <div className="flex flex-col items-center justify-center py-12">
               <Icon icon="lucide:book-x" className="text-default-400 mb-4" width={48} height={48} />
@@ -178,12 +200,12 @@ export const AdminDashboard: React.FC = () => {
           <CardBody>
             <div className="grid grid-cols-2 gap-4">
               <div className="p-4 bg-primary-50 rounded-medium">
-                <div className="text-3xl font-bold text-primary mb-1">{courses.length}</div>
+                <div className="text-3xl font-bold text-primary mb-1">{courses.length}{more}</div>
                 <div className="text-default-600">Total Courses</div>
               </div>
               <div className="p-4 bg-secondary-50 rounded-medium">
                 <div className="text-3xl font-bold text-secondary mb-1">
-                  {courses.reduce((total, course) => total + course.chapters.length, 0)}
+                  {courses.reduce((total, course) => total + course.chapterCount, 0)}{more}
                 </div>
                 <div className="text-default-600">Total Chapters</div>
               </div>
@@ -193,9 +215,7 @@ export const AdminDashboard: React.FC = () => {
               </div>
               <div className="p-4 bg-warning-50 rounded-medium">
                 <div className="text-3xl font-bold text-warning mb-1">
-                  {courses.reduce((total, course) => {
-                    return total + course.chapters.reduce((chTotal: number, ch: any) => chTotal + ch.quiz.length, 0);
-                  }, 0)}
+                  {courses.reduce((total, course) => total + course.quizCount, 0)}{more}
                 </div>
                 <div className="text-default-600">Total Quizzes</div>
               </div>
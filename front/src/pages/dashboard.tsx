@@ -4,34 +4,14 @@ import { Icon } from "@iconify/react";
 import { Layout } from "../components/layout";
 import { CourseCard } from "../components/course-card";
 import { useAuth } from "../contexts/auth-context";
-import { getUserCourses } from "../api/courses";
-import { Course } from "../types/course";
+import { LoadMoreButton } from "../components/load-more-button";
+import { useCourseSummaries } from "../hooks/use-course-summaries";
 
 export const Dashboard: React.FC = () => {
   const { user } = useAuth();
   const [selectedTab, setSelectedTab] = React.useState("all");
-  const [courses, setCourses] = React.useState<Course[]>([]);
-  const [enrolledCourses, setEnrolledCourses] = React.useState<Course[]>([]);
-  const [isLoading, setIsLoading] = React.useState(true);
-  
-  React.useEffect(() => {
-    const fetchCourses = async () => {
-      try {
-        setIsLoading(true);
-        const userCourses = await getUserCourses();
-        setCourses(userCourses);
-        setEnrolledCourses(userCourses.filter(course => course.enrolled));
-      } catch (error) {
-        console.error("Failed to fetch courses:", error);
-      } finally {
-        setIsLoading(false);
-      }
-    };
-    
-    if (user) {
-      fetchCourses();
-    }
-  }, [user]);
+  const allCourses = useCourseSummaries({ enabled: Boolean(user) });
+  const enrolledCourses = useCourseSummaries({ enrolled: true, enabled: Boolean(user) });
 
   return (
     <Layout>
@@ -55,16 +35,19 @@ export const Dashboard: React.FC = () => {
             </div>
           }
         >
-          {isLoading ? (
+          {allCourses.isLoading ? (
             <div className="flex justify-center py-12">
               <Spinner size="lg" color="primary" />
             </div>
-          ) : courses.length > 0 ? (
-            <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-              {courses.map((course) => (
-                <CourseCard key={course.id} course={course} />
-              ))}
-            </div>
+          ) : allCourses.courses.length > 0 ? (
+            <>
+              <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
+                {allCourses.courses.map((course) => (
+                  <CourseCard key={course.id} course={course} />
+                ))}
+              </div>
+              <LoadMoreButton pages={allCourses} />
+            </>
           ) : (
             <Card>
               <CardBody className="flex flex-col items-center justify-center py-12">
@@ -83,12 +66,19 @@ export const Dashboard: React.FC = () => {
             </div>
           }
         >
-          {enrolledCourses.length > 0 ? (
-            <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-              {enrolledCourses.map((course) => (
-                <CourseCard key={course.id} course={course} />
-              ))}
+          {enrolledCourses.isLoading ? (
+            <div className="flex justify-center py-12">
+              <Spinner size="lg" color="primary" />
             </div>
+          ) : enrolledCourses.courses.length > 0 ? (
+            <>
+              <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
+                {enrolledCourses.courses.map((course) => (
+                  <CourseCard key={course.id} course={course} />
+                ))}
+              </div>
+              <LoadMoreButton pages={enrolledCourses} />
+            </>
           ) : (
             <Card>
               <CardBody className="flex flex-col items-center justify-center py-12">
@@ -13,17 +13,54 @@ export interface Chapter {
   completed?: boolean;
 }
 
+// Chapters inside a course response carry no body; it comes from the chapter endpoint
+export type ChapterSummary = Omit<Chapter, "content">;
+
 export interface Course {
   id: string;
   title: string;
   description: string;
   imageUrl: string;
-  chapters: Chapter[];
+  chapters: ChapterSummary[];
   progress?: number;
   enrolled?: boolean;
   enrollmentCode?: string;
 }
 
+// Admin view of a course with every chapter body, used by the editor
+export interface CourseDetail extends Omit<Course, "chapters"> {
+  chapters: Chapter[];
+}
+
+export interface CourseSummary {
+  id: string;
+  title: string;
+  description: string;
+  imageUrl: string;
+  chapterCount: number;
+  quizCount: number;
+  progress: number;
+  enrolled: boolean;
+  enrollmentCode?: string | null;
+}
+
+export interface CourseSummaryPage {
+  items: CourseSummary[];
+  nextCursor: string | null;
+}
+
+export interface CourseDeletionJob {
+  id: string;
+  courseId: string;
+  courseTitle: string | null;
+  status: "pending" | "running" | "completed" | "failed";
+  deleted: Record<string, number>;
+  error: string | null;
+  createdAt: string | null;
+  updatedAt: string | null;
+  finishedAt: string | null;
+}
+
 export interface QuizResult {
   score: number;
   passed: boolean;